@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CalendarAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "calendar_app"
+
+    def ready(self):
+        from .signals import connect_window_cache_signals
+        connect_window_cache_signals()
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-17 05:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        (
+            "calendar_app",
+            "0003_remove_calendarnotification_calendar_app_calendarnotification_user_content_type_object_id_notificati",
+        ),
+        ("contenttypes", "0002_remove_content_type_name"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="calendarevent",
+            index=models.Index(fields=["start_datetime"], name="calevent_start_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="calendarevent",
+            index=models.Index(
+                fields=["assigned_to", "start_datetime"],
+                name="calevent_owner_start_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="calendarevent",
+            index=models.Index(
+                fields=["content_type", "object_id"], name="calevent_related_idx"
+            ),
+        ),
+    ]
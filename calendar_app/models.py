@@ -95,6 +95,11 @@ class CalendarEvent(models.Model):
         verbose_name = "Calendar Event"
         verbose_name_plural = "Calendar Events"
         ordering = ['start_datetime']
+        indexes = [
+            models.Index(fields=['start_datetime'], name='calevent_start_idx'),
+            models.Index(fields=['assigned_to', 'start_datetime'], name='calevent_owner_start_idx'),
+            models.Index(fields=['content_type', 'object_id'], name='calevent_related_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.start_datetime.strftime('%Y-%m-%d %H:%M')}"
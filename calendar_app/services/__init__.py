@@ -0,0 +1 @@
+# Calendar event services
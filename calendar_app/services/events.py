@@ -0,0 +1,554 @@
+"""
+Unified calendar event source for the calendar API
+
+Tasks, calls, meetings and custom calendar events are projected onto one
+column set with ``values()`` and combined with ``union()``, so a calendar
+window is a single query that is ordered by start time and limited in the
+database. Owner, creator and account names come from joins in the same
+query, and long descriptions are cut down to the displayed excerpt before
+they leave the database.
+
+Recurring calendar events are read with a second query (every series
+that started before the window ends) and expanded into the occurrences
+inside the window by ``recurrence.expand``. Occurrences are merged into
+the ordered rows and count towards the limit like any other event.
+
+``window_version`` is a cheaper query over the same filters (row count and
+latest ``updated_at`` per source) that the API uses as an ETag, so
+unchanged windows are answered with 304 Not Modified. There is no
+Last-Modified: the latest ``updated_at`` in a window does not move when an
+event is deleted or moved out of it.
+
+Responses are serialized with orjson when it is installed and with the
+standard library json module otherwise.
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import BooleanField, CharField, Count, DateTimeField, F, IntegerField, Max, Q, TextField, Value
+from django.db.models.functions import Substr
+from django.utils import timezone
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from accounts.models import Account
+from tasks.models import Task, Call, Meeting
+from ..models import CalendarEvent
+from . import recurrence
+
+
+logger = logging.getLogger(__name__)
+
+
+# Upper bound on the events returned for one window
+MAX_EVENTS = 5000
+# Part of every version token; bump when the payload format changes so
+# clients do not keep responses in the old format
+PAYLOAD_VERSION = 2
+EXCERPT_LENGTH = 100
+
+# Request ``types[]`` value -> event kind
+EVENT_TYPES = {
+    'tasks': 'task',
+    'calls': 'call',
+    'meetings': 'meeting',
+    'events': 'custom',
+    'custom': 'custom',
+}
+DEFAULT_EVENT_TYPES = ['tasks', 'calls', 'meetings']
+
+# Occurrence override field -> column it replaces
+OCCURRENCE_COLUMNS = {
+    'title': 'event_title',
+    'description': 'event_text',
+    'location': 'event_location',
+    'meeting_url': 'event_meeting_url',
+    'status': 'event_status',
+}
+
+# Common column set of the union. Every source annotates these in this
+# order so the columns of the combined query line up.
+COLUMNS = (
+    'event_kind',
+    'event_id',
+    'event_title',
+    'event_start',
+    'event_end',
+    'event_all_day',
+    'event_status',
+    'event_category',
+    'event_location',
+    'event_meeting_url',
+    'event_phone',
+    'event_duration',
+    'event_text',
+    'owner_first_name',
+    'owner_last_name',
+    'creator_first_name',
+    'creator_last_name',
+    'account_name',
+)
+
+
+def get_task_color(priority):
+    """Get color based on task priority"""
+    colors = {
+        'high': '#dc3545',      # Red
+        'medium': '#fd7e14',    # Orange
+        'low': '#28a745',       # Green
+    }
+    return colors.get(priority, '#6c757d')  # Default gray
+
+
+def get_call_color(status):
+    """Get color based on call status"""
+    colors = {
+        'scheduled': '#0d6efd',     # Blue
+        'in_progress': '#fd7e14',   # Orange
+        'completed': '#28a745',     # Green
+        'cancelled': '#6c757d',     # Gray
+        'no_show': '#dc3545',       # Red
+    }
+    return colors.get(status, '#6c757d')
+
+
+def get_meeting_color(status):
+    """Get color based on meeting status"""
+    colors = {
+        'scheduled': '#0d6efd',     # Blue
+        'in_progress': '#fd7e14',   # Orange
+        'completed': '#28a745',     # Green
+        'cancelled': '#6c757d',     # Gray
+        'postponed': '#ffc107',     # Yellow
+    }
+    return colors.get(status, '#6c757d')
+
+
+def get_custom_event_color(event_type):
+    """Get color based on custom event type"""
+    colors = {
+        'appointment': '#6f42c1',    # Purple
+        'reminder': '#20c997',       # Teal
+        'holiday': '#e83e8c',        # Pink
+        'personal': '#17a2b8',       # Cyan
+        'company': '#007bff',        # Blue
+        'training': '#28a745',       # Green
+        'other': '#6c757d',          # Gray
+    }
+    return colors.get(event_type, '#6c757d')  # Default gray
+
+
+def _null(field):
+    return Value(None, output_field=field)
+
+
+def _excerpt_source(field_name):
+    # One character past the excerpt is enough to know whether it was cut
+    return Substr(field_name, 1, EXCERPT_LENGTH + 1, output_field=TextField())
+
+
+def _project(queryset, kind: str, **columns):
+    """Annotate ``queryset`` with the common column set, NULL where a source has no value"""
+    defaults = {
+        'event_kind': Value(kind, output_field=CharField()),
+        'event_end': _null(DateTimeField()),
+        'event_all_day': Value(False, output_field=BooleanField()),
+        'event_location': _null(CharField()),
+        'event_meeting_url': _null(CharField()),
+        'event_phone': _null(CharField()),
+        'event_duration': _null(IntegerField()),
+        'creator_first_name': _null(CharField()),
+        'creator_last_name': _null(CharField()),
+        'account_name': _null(CharField()),
+    }
+    defaults.update(columns)
+    return queryset.order_by().annotate(**{name: defaults[name] for name in COLUMNS}).values(*COLUMNS)
+
+
+def _task_window(start, end, account_id, user_id):
+    # Tasks are all-day events: compare on whole days of the window
+    day_start = timezone.make_aware(datetime.combine(timezone.localtime(start).date(), time.min))
+    day_end = timezone.make_aware(datetime.combine(timezone.localtime(end).date(), time.min))
+    queryset = Task.objects.filter(due_date__gte=day_start, due_date__lte=day_end)
+    if user_id is not None:
+        queryset = queryset.filter(assigned_to_id=user_id)
+    if account_id is not None:
+        queryset = queryset.filter(content_type=ContentType.objects.get_for_model(Account), object_id=account_id)
+    return queryset
+
+
+def _tasks(start, end, account_id, user_id):
+    return _project(
+        _task_window(start, end, account_id, user_id), 'task',
+        event_id=F('id'),
+        event_title=F('subject'),
+        event_start=F('due_date'),
+        event_all_day=Value(True, output_field=BooleanField()),
+        event_status=F('status'),
+        event_category=F('priority'),
+        event_text=_excerpt_source('description'),
+        owner_first_name=F('assigned_to__first_name'),
+        owner_last_name=F('assigned_to__last_name'),
+    )
+
+
+def _call_window(start, end, account_id, user_id):
+    queryset = Call.objects.filter(scheduled_datetime__gte=start, scheduled_datetime__lte=end)
+    if user_id is not None:
+        queryset = queryset.filter(assigned_to_id=user_id)
+    if account_id is not None:
+        queryset = queryset.filter(related_account_id=account_id)
+    return queryset
+
+
+def _calls(start, end, account_id, user_id):
+    return _project(
+        _call_window(start, end, account_id, user_id), 'call',
+        event_id=F('id'),
+        event_title=F('subject'),
+        event_start=F('scheduled_datetime'),
+        event_status=F('status'),
+        event_category=F('call_type'),
+        event_phone=F('phone_number'),
+        event_duration=F('duration_minutes'),
+        event_text=_excerpt_source('description'),
+        owner_first_name=F('assigned_to__first_name'),
+        owner_last_name=F('assigned_to__last_name'),
+        account_name=F('related_account__name'),
+    )
+
+
+def _meeting_window(start, end, account_id, user_id):
+    queryset = Meeting.objects.filter(start_datetime__gte=start, start_datetime__lte=end)
+    if user_id is not None:
+        queryset = queryset.filter(assigned_to_id=user_id)
+    if account_id is not None:
+        queryset = queryset.filter(related_account_id=account_id)
+    return queryset
+
+
+def _meetings(start, end, account_id, user_id):
+    return _project(
+        _meeting_window(start, end, account_id, user_id), 'meeting',
+        event_id=F('id'),
+        event_title=F('subject'),
+        event_start=F('start_datetime'),
+        event_end=F('end_datetime'),
+        event_status=F('status'),
+        event_category=F('meeting_type'),
+        event_location=F('location'),
+        event_meeting_url=F('meeting_url'),
+        event_text=_excerpt_source('agenda'),
+        owner_first_name=F('assigned_to__first_name'),
+        owner_last_name=F('assigned_to__last_name'),
+        account_name=F('related_account__name'),
+    )
+
+
+def _custom_event_window(start, end, account_id, user_id):
+    # A series that started before the window may have occurrences in it
+    queryset = CalendarEvent.objects.filter(
+        Q(start_datetime__gte=start, start_datetime__lte=end) | Q(is_recurring=True, start_datetime__lte=end)
+    )
+    if user_id is not None:
+        queryset = queryset.filter(assigned_to_id=user_id)
+    if account_id is not None:
+        queryset = queryset.filter(content_type=ContentType.objects.get_for_model(Account), object_id=account_id)
+    return queryset
+
+
+def _custom_event_columns():
+    return {
+        'event_id': F('id'),
+        'event_title': F('title'),
+        'event_start': F('start_datetime'),
+        'event_end': F('end_datetime'),
+        'event_all_day': F('is_all_day'),
+        'event_status': F('status'),
+        'event_category': F('event_type'),
+        'event_location': F('location'),
+        'event_meeting_url': F('meeting_url'),
+        'event_text': _excerpt_source('description'),
+        'owner_first_name': F('assigned_to__first_name'),
+        'owner_last_name': F('assigned_to__last_name'),
+        'creator_first_name': F('created_by__first_name'),
+        'creator_last_name': F('created_by__last_name'),
+    }
+
+
+def _custom_events(start, end, account_id, user_id):
+    queryset = _custom_event_window(start, end, account_id, user_id).filter(is_recurring=False)
+    return _project(queryset, 'custom', **_custom_event_columns())
+
+
+def _recurring_events(start, end, account_id, user_id):
+    """Series that may have occurrences in the window, with their rules"""
+    queryset = _custom_event_window(start, end, account_id, user_id).filter(is_recurring=True)
+    return _project(queryset, 'custom', **_custom_event_columns()).values(*COLUMNS, 'recurrence_rule')
+
+
+WINDOWS = {
+    'task': _task_window,
+    'call': _call_window,
+    'meeting': _meeting_window,
+    'custom': _custom_event_window,
+}
+
+SOURCES = {
+    'task': _tasks,
+    'call': _calls,
+    'meeting': _meetings,
+    'custom': _custom_events,
+}
+
+
+def event_kinds(event_types: Iterable[str]) -> List[str]:
+    """Event kinds for the request's ``types[]`` values, in SOURCES order"""
+    requested = {EVENT_TYPES[t] for t in event_types if t in EVENT_TYPES}
+    return [kind for kind in SOURCES if kind in requested]
+
+
+def _occurrence_rows(series: Dict[str, Any], start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    """Rows of the occurrences of a recurring series starting within [start, end]"""
+    try:
+        occurrences = recurrence.expand(series['recurrence_rule'], series['event_start'], series['event_end'],
+                                        start, end)
+    except recurrence.RecurrenceError as e:
+        logger.warning(f"Calendar event {series['event_id']} has an invalid recurrence rule: {e}")
+        # Shown as a single event, as before recurrence was expanded
+        return [series] if start <= series['event_start'] <= end else []
+
+    rows = []
+    for occurrence in occurrences:
+        row = dict(series, event_start=occurrence.start, event_end=occurrence.end,
+                   occurrence_start=occurrence.original_start)
+        for change, column in OCCURRENCE_COLUMNS.items():
+            if change in occurrence.changes:
+                row[column] = occurrence.changes[change]
+        if 'description' in occurrence.changes and row['event_text']:
+            row['event_text'] = row['event_text'][:EXCERPT_LENGTH + 1]
+        rows.append(row)
+    return rows
+
+
+def event_rows(start: datetime, end: datetime, kinds: Iterable[str], account_id: Optional[int] = None,
+               user_id: Optional[int] = None, limit: int = MAX_EVENTS) -> List[Dict[str, Any]]:
+    """
+    Rows of the requested event kinds starting within [start, end]
+
+    One UNION query, ordered by start time and limited to ``limit`` rows,
+    plus one query for recurring series when custom events are requested.
+    Occurrence rows carry the original start of the occurrence in
+    ``occurrence_start``.
+    """
+    kinds = list(kinds)
+    querysets = [SOURCES[kind](start, end, account_id, user_id) for kind in kinds]
+    if not querysets:
+        return []
+
+    combined = querysets[0].union(*querysets[1:], all=True) if len(querysets) > 1 else querysets[0]
+    rows = list(combined.order_by('event_start', 'event_kind', 'event_id')[:limit])
+    if 'custom' not in kinds:
+        return rows
+
+    occurrences = []
+    for series in _recurring_events(start, end, account_id, user_id):
+        occurrences.extend(_occurrence_rows(series, start, end))
+    if not occurrences:
+        return rows
+
+    if len(rows) >= limit:
+        # Rows after the last one fetched were cut off by the limit; so are
+        # occurrences after it
+        last_start = rows[-1]['event_start']
+        occurrences = [row for row in occurrences if row['event_start'] <= last_start]
+    rows.extend(occurrences)
+    rows.sort(key=lambda row: (row['event_start'], row['event_kind'], row['event_id']))
+    return rows[:limit]
+
+
+def window_version(start: datetime, end: datetime, kinds: Iterable[str], account_id: Optional[int] = None,
+                   user_id: Optional[int] = None) -> str:
+    """
+    Version token of a calendar window
+
+    One UNION query of the row count and latest ``updated_at`` of each
+    source over the same filters as ``event_rows``. Creating, editing,
+    moving or deleting an event in the window changes the token; renaming
+    the user or account an event shows does not.
+    """
+    kinds = list(kinds)
+    querysets = [
+        WINDOWS[kind](start, end, account_id, user_id).order_by()
+        .annotate(version_kind=Value(kind, output_field=CharField()))
+        .values('version_kind')
+        .annotate(rows=Count('pk'), changed=Max('updated_at'))
+        for kind in kinds
+    ]
+    rows = []
+    if querysets:
+        combined = querysets[0].union(*querysets[1:], all=True) if len(querysets) > 1 else querysets[0]
+        rows = sorted((row['version_kind'], row['rows'], row['changed']) for row in combined)
+
+    state = (PAYLOAD_VERSION, MAX_EVENTS, start.isoformat(), end.isoformat(), kinds, account_id, user_id, rows)
+    return hashlib.md5(repr(state).encode('utf-8')).hexdigest()
+
+
+def _excerpt(text: Optional[str]) -> Optional[str]:
+    if text and len(text) > EXCERPT_LENGTH:
+        return text[:EXCERPT_LENGTH] + '...'
+    return text
+
+
+def _full_name(first_name: Optional[str], last_name: Optional[str], missing: str) -> str:
+    if first_name is None and last_name is None:
+        return missing
+    # Same as User.get_full_name()
+    return f'{first_name} {last_name}'.strip()
+
+
+def occurrence_id(pk: int, occurrence_start: datetime) -> str:
+    """Event id of one occurrence of a recurring custom event"""
+    return f"custom_{pk}_{occurrence_start.astimezone(dt_timezone.utc):%Y%m%dT%H%M%SZ}"
+
+
+def to_fullcalendar(row: Dict[str, Any]) -> Dict[str, Any]:
+    """FullCalendar event for a row from ``event_rows``"""
+    kind = row['event_kind']
+    pk = row['event_id']
+    start = row['event_start']
+    assigned_to = _full_name(row['owner_first_name'], row['owner_last_name'], 'Unassigned')
+
+    if kind == 'task':
+        color = get_task_color(row['event_category'])
+        return {
+            'id': f'task_{pk}',
+            'title': f"📋 {row['event_title']}",
+            'start': start.isoformat(),
+            'end': start.isoformat(),
+            'allDay': True,
+            'backgroundColor': color,
+            'borderColor': color,
+            'textColor': '#ffffff',
+            'extendedProps': {
+                'type': 'task',
+                'id': pk,
+                'status': row['event_status'],
+                'priority': row['event_category'],
+                'assigned_to': assigned_to,
+                'description': _excerpt(row['event_text']),
+                'url': f'/tasks/{pk}/'
+            }
+        }
+
+    if kind == 'call':
+        color = get_call_color(row['event_status'])
+        return {
+            'id': f'call_{pk}',
+            'title': f"📞 {row['event_title']}",
+            'start': start.isoformat(),
+            'end': (start + timedelta(minutes=row['event_duration'] or 30)).isoformat(),
+            'backgroundColor': color,
+            'borderColor': color,
+            'textColor': '#ffffff',
+            'extendedProps': {
+                'type': 'call',
+                'id': pk,
+                'status': row['event_status'],
+                'call_type': row['event_category'],
+                'phone_number': row['event_phone'],
+                'assigned_to': assigned_to,
+                'account': row['account_name'] or 'No account',
+                'description': _excerpt(row['event_text']),
+                'url': f'/tasks/calls/{pk}/'
+            }
+        }
+
+    end = row['event_end'] or start + timedelta(hours=1)
+
+    if kind == 'meeting':
+        color = get_meeting_color(row['event_status'])
+        return {
+            'id': f'meeting_{pk}',
+            'title': f"🤝 {row['event_title']}",
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'backgroundColor': color,
+            'borderColor': color,
+            'textColor': '#ffffff',
+            'extendedProps': {
+                'type': 'meeting',
+                'id': pk,
+                'status': row['event_status'],
+                'meeting_type': row['event_category'],
+                'location': row['event_location'],
+                'meeting_url': row['event_meeting_url'],
+                'assigned_to': assigned_to,
+                'account': row['account_name'] or 'No account',
+                'agenda': _excerpt(row['event_text']),
+                'url': f'/tasks/meetings/{pk}/'
+            }
+        }
+
+    color = get_custom_event_color(row['event_category'])
+    event = {
+        'id': f'custom_{pk}',
+        'title': f"📅 {row['event_title']}",
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'allDay': row['event_all_day'],
+        'backgroundColor': color,
+        'borderColor': color,
+        'textColor': '#ffffff',
+        'extendedProps': {
+            'type': 'custom_event',
+            'id': pk,
+            'event_type': row['event_category'],
+            'status': row['event_status'],
+            'location': row['event_location'],
+            'meeting_url': row['event_meeting_url'],
+            'assigned_to': assigned_to,
+            'created_by': _full_name(row['creator_first_name'], row['creator_last_name'], 'Unknown'),
+            'description': _excerpt(row['event_text']),
+            'url': f'/calendar/events/{pk}/'
+        }
+    }
+    occurrence_start = row.get('occurrence_start')
+    if occurrence_start is not None:
+        event['id'] = occurrence_id(pk, occurrence_start)
+        event['extendedProps'].update({
+            'recurring': True,
+            'occurrence_start': occurrence_start.isoformat(),
+        })
+    return event
+
+
+def calendar_events(start: datetime, end: datetime, event_types: Iterable[str] = DEFAULT_EVENT_TYPES,
+                    account_id: Optional[int] = None, user_id: Optional[int] = None,
+                    limit: int = MAX_EVENTS) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    FullCalendar events in a window
+
+    Returns:
+        (events ordered by start, whether more than ``limit`` events matched)
+    """
+    rows = event_rows(start, end, event_kinds(event_types), account_id, user_id, limit + 1)
+    truncated = len(rows) > limit
+    if truncated:
+        logger.warning(f"Calendar window {start} - {end} has more than {limit} events, truncating")
+        rows = rows[:limit]
+    return [to_fullcalendar(row) for row in rows], truncated
+
+
+def dumps(data: Any) -> bytes:
+    """Serialize API payloads to compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,405 @@
+"""
+Free/busy engine for calendar users
+
+Busy time comes from meetings (start to end), calls (scheduled time plus
+``duration_minutes``, 30 minutes when unset) and custom calendar events,
+with recurring events expanded by ``recurrence.expand``. Cancelled and
+postponed items and reminders do not block time.
+
+The intervals of every requested user are read with one UNION query and
+processed in memory with sorted sweeps: merging into busy blocks,
+detecting overlapping (conflicting) items and subtracting busy blocks
+from business hours are each a sort plus a linear pass, so checking 50
+users across a week is one query and an O(n log n) pass. Free slots also
+read the users' business hours (``CalendarView.start_time``/``end_time``,
+``timezone`` and ``show_weekends``) with one more query.
+"""
+import heapq
+import logging
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import BooleanField, CharField, DateTimeField, F, IntegerField, JSONField, Q, Value
+from django.utils import timezone
+
+from accounts.models import Account
+from tasks.models import Call, Meeting
+from ..models import CalendarEvent
+from . import recurrence
+from .events import occurrence_id
+
+
+logger = logging.getLogger(__name__)
+
+
+MAX_USERS = 100
+MAX_WINDOW = timedelta(days=62)
+MAX_SLOTS = 100
+MAX_SLOT_DURATION = timedelta(hours=24)
+# Free slots start on multiples of this many minutes
+SLOT_GRANULARITY_MINUTES = 15
+# Calls and open-ended events that start this long before the window are
+# not read; none is expected to last longer
+LOOKBACK = timedelta(days=1)
+DEFAULT_CALL_MINUTES = 30
+DEFAULT_EVENT_DURATION = timedelta(hours=1)
+
+# Business hours of users without calendar preferences (CalendarView defaults)
+DEFAULT_DAY_START = time(8, 0)
+DEFAULT_DAY_END = time(18, 0)
+
+FREE_STATUSES = {
+    'call': ['cancelled'],
+    'meeting': ['cancelled', 'postponed'],
+    'custom': ['cancelled'],
+}
+FREE_EVENT_TYPES = ['reminder']
+
+COLUMNS = (
+    'busy_kind',
+    'busy_id',
+    'busy_user',
+    'busy_start',
+    'busy_end',
+    'busy_minutes',
+    'busy_all_day',
+    'busy_recurring',
+    'busy_rule',
+)
+
+
+class FreeBusyError(ValueError):
+    """Invalid free/busy query"""
+
+
+class Interval(NamedTuple):
+    """Busy time of one calendar item; ``event_id`` matches the calendar events API"""
+    start: datetime
+    end: datetime
+    event_id: str
+
+
+class Conflict(NamedTuple):
+    """Overlap of two busy items of the same user"""
+    start: datetime
+    end: datetime
+    event_ids: Tuple[str, str]
+
+
+# Bulk fetch
+
+def _null(field):
+    return Value(None, output_field=field)
+
+
+def _project(queryset, kind: str, **columns):
+    defaults = {
+        'busy_kind': Value(kind, output_field=CharField()),
+        'busy_id': F('id'),
+        'busy_user': F('assigned_to_id'),
+        'busy_end': _null(DateTimeField()),
+        'busy_minutes': _null(IntegerField()),
+        'busy_all_day': Value(False, output_field=BooleanField()),
+        'busy_recurring': Value(False, output_field=BooleanField()),
+        'busy_rule': _null(JSONField()),
+    }
+    defaults.update(columns)
+    return queryset.order_by().annotate(**{name: defaults[name] for name in COLUMNS}).values(*COLUMNS)
+
+
+def _meetings(start, end, user_ids, account_id):
+    queryset = Meeting.objects.filter(
+        assigned_to_id__in=user_ids, start_datetime__lt=end, end_datetime__gt=start,
+    ).exclude(status__in=FREE_STATUSES['meeting'])
+    if account_id is not None:
+        queryset = queryset.filter(related_account_id=account_id)
+    return _project(queryset, 'meeting', busy_start=F('start_datetime'), busy_end=F('end_datetime'))
+
+
+def _calls(start, end, user_ids, account_id):
+    queryset = Call.objects.filter(
+        assigned_to_id__in=user_ids, scheduled_datetime__gte=start - LOOKBACK, scheduled_datetime__lt=end,
+    ).exclude(status__in=FREE_STATUSES['call'])
+    if account_id is not None:
+        queryset = queryset.filter(related_account_id=account_id)
+    return _project(queryset, 'call', busy_start=F('scheduled_datetime'), busy_minutes=F('duration_minutes'))
+
+
+def _custom_events(start, end, user_ids, account_id):
+    # An all-day event is busy until the midnight after the day it ends on,
+    # which may be up to a day after its end_datetime; _event_span clips it
+    day_before = start - LOOKBACK
+    queryset = CalendarEvent.objects.filter(
+        Q(is_recurring=True) | Q(end_datetime__gt=start)
+        | Q(end_datetime__isnull=True, start_datetime__gte=day_before)
+        | Q(is_all_day=True, start_datetime__gte=day_before)
+        | Q(is_all_day=True, end_datetime__gt=day_before),
+        assigned_to_id__in=user_ids, start_datetime__lt=end,
+    ).exclude(status__in=FREE_STATUSES['custom']).exclude(event_type__in=FREE_EVENT_TYPES)
+    if account_id is not None:
+        queryset = queryset.filter(content_type=ContentType.objects.get_for_model(Account), object_id=account_id)
+    return _project(
+        queryset, 'custom',
+        busy_start=F('start_datetime'),
+        busy_end=F('end_datetime'),
+        busy_all_day=F('is_all_day'),
+        busy_recurring=F('is_recurring'),
+        busy_rule=F('recurrence_rule'),
+    )
+
+
+def _local_midnight(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _event_span(start: datetime, end: Optional[datetime], all_day: bool) -> Tuple[datetime, datetime]:
+    """Busy span of a custom event (occurrence)"""
+    if all_day:
+        last_day = timezone.localtime(end if end is not None and end > start else start).date()
+        return _local_midnight(timezone.localtime(start).date()), _local_midnight(last_day + timedelta(days=1))
+    if end is None or end <= start:
+        end = start + DEFAULT_EVENT_DURATION
+    return start, end
+
+
+def _row_spans(row, start: datetime, end: datetime) -> List[Tuple[datetime, datetime, str]]:
+    """(start, end, event id) of the busy time of one fetched row"""
+    kind, pk = row['busy_kind'], row['busy_id']
+    if kind == 'meeting':
+        return [(row['busy_start'], row['busy_end'], f'meeting_{pk}')]
+    if kind == 'call':
+        minutes = row['busy_minutes'] or DEFAULT_CALL_MINUTES
+        return [(row['busy_start'], row['busy_start'] + timedelta(minutes=minutes), f'call_{pk}')]
+
+    if not row['busy_recurring']:
+        return [_event_span(row['busy_start'], row['busy_end'], row['busy_all_day']) + (f'custom_{pk}',)]
+    try:
+        occurrences = recurrence.expand(row['busy_rule'], row['busy_start'], row['busy_end'], start - LOOKBACK, end)
+    except recurrence.RecurrenceError as e:
+        logger.warning(f"Calendar event {pk} has an invalid recurrence rule: {e}")
+        return [_event_span(row['busy_start'], row['busy_end'], row['busy_all_day']) + (f'custom_{pk}',)]
+    return [
+        _event_span(occurrence.start, occurrence.end, row['busy_all_day'])
+        + (occurrence_id(pk, occurrence.original_start),)
+        for occurrence in occurrences
+        if occurrence.changes.get('status') not in FREE_STATUSES['custom']
+    ]
+
+
+def _validate_window(start: datetime, end: datetime, user_ids: List[int]) -> None:
+    if end <= start:
+        raise FreeBusyError('end must be after start')
+    if end - start > MAX_WINDOW:
+        raise FreeBusyError(f'The window can span at most {MAX_WINDOW.days} days')
+    if not user_ids:
+        raise FreeBusyError('At least one user is required')
+    if len(user_ids) > MAX_USERS:
+        raise FreeBusyError(f'At most {MAX_USERS} users can be queried at once')
+
+
+def busy_intervals(start: datetime, end: datetime, user_ids: Iterable[int],
+                   account_id: Optional[int] = None) -> Dict[int, List[Interval]]:
+    """
+    Busy items of each user overlapping [start, end), sorted by start
+
+    One UNION query for all users and sources. Every requested user is in
+    the result, with an empty list when they have no busy items.
+    """
+    user_ids = sorted(set(user_ids))
+    _validate_window(start, end, user_ids)
+
+    querysets = [source(start, end, user_ids, account_id) for source in (_meetings, _calls, _custom_events)]
+    rows = querysets[0].union(*querysets[1:], all=True)
+
+    intervals = {user_id: [] for user_id in user_ids}
+    for row in rows:
+        for busy_start, busy_end, event_id in _row_spans(row, start, end):
+            if busy_start < end and busy_end > start:
+                intervals[row['busy_user']].append(Interval(busy_start, busy_end, event_id))
+    for user_intervals in intervals.values():
+        user_intervals.sort()
+    return intervals
+
+
+# Sweeps over sorted intervals
+
+def merge(intervals: Iterable[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+    """Union of intervals as sorted, disjoint (start, end) blocks"""
+    blocks = []
+    for start, end, *_ in sorted(intervals):
+        if blocks and start <= blocks[-1][1]:
+            if end > blocks[-1][1]:
+                blocks[-1] = (blocks[-1][0], end)
+        else:
+            blocks.append((start, end))
+    return blocks
+
+
+def conflicts(intervals: List[Interval]) -> List[Conflict]:
+    """Overlapping pairs among one user's intervals (sorted by start)"""
+    found = []
+    active = []  # heap of (end, event id) of intervals still open
+    for interval in intervals:
+        while active and active[0][0] <= interval.start:
+            heapq.heappop(active)
+        for active_end, event_id in sorted(active):
+            found.append(Conflict(interval.start, min(active_end, interval.end), (event_id, interval.event_id)))
+        heapq.heappush(active, (interval.end, interval.event_id))
+    return found
+
+
+def intersect(first: List[Tuple[datetime, datetime]],
+              second: List[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+    """Intersection of two sorted lists of disjoint blocks"""
+    result = []
+    i = j = 0
+    while i < len(first) and j < len(second):
+        start = max(first[i][0], second[j][0])
+        end = min(first[i][1], second[j][1])
+        if start < end:
+            result.append((start, end))
+        if first[i][1] < second[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def subtract(blocks: List[Tuple[datetime, datetime]],
+             busy: List[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+    """Parts of sorted disjoint ``blocks`` not covered by sorted disjoint ``busy`` blocks"""
+    result = []
+    j = 0
+    for start, end in blocks:
+        while j < len(busy) and busy[j][1] <= start:
+            j += 1
+        k = j
+        while k < len(busy) and busy[k][0] < end:
+            if busy[k][0] > start:
+                result.append((start, busy[k][0]))
+            start = max(start, busy[k][1])
+            k += 1
+        if start < end:
+            result.append((start, end))
+    return result
+
+
+# Queries
+
+def free_busy(start: datetime, end: datetime, user_ids: Iterable[int],
+              account_id: Optional[int] = None) -> Dict[int, Dict[str, list]]:
+    """
+    Merged busy blocks and conflicts of each user in [start, end)
+
+    Returns:
+        {user id: {'busy': [(start, end), ...], 'conflicts': [Conflict, ...]}}
+    """
+    return {
+        user_id: {'busy': merge(intervals), 'conflicts': conflicts(intervals)}
+        for user_id, intervals in busy_intervals(start, end, user_ids, account_id).items()
+    }
+
+
+def busy_users(start: datetime, end: datetime, user_ids: Iterable[int],
+               account_id: Optional[int] = None) -> List[int]:
+    """Users with any busy item overlapping [start, end)"""
+    return [user_id for user_id, intervals in busy_intervals(start, end, user_ids, account_id).items() if intervals]
+
+
+def _zone(name: Optional[str]):
+    if name:
+        try:
+            return ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning(f"Unknown calendar time zone '{name}', using the default")
+    return timezone.get_current_timezone()
+
+
+def _utc(moment: datetime) -> datetime:
+    return moment.astimezone(dt_timezone.utc)
+
+
+def business_hours(start: datetime, end: datetime, user_ids: Iterable[int]) -> Dict[int, List[Tuple[datetime, datetime]]]:
+    """
+    Business hours of each user within [start, end) as sorted blocks
+
+    Hours, time zone and weekends come from the user's calendar
+    preferences, read with one query; users without preferences get the
+    CalendarView defaults in the site time zone.
+    """
+    user_ids = sorted(set(user_ids))
+    preferences = {
+        row['id']: row for row in User.objects.filter(id__in=user_ids).values(
+            'id',
+            day_start=F('calendar_preferences__start_time'),
+            day_end=F('calendar_preferences__end_time'),
+            zone=F('calendar_preferences__timezone'),
+            weekends=F('calendar_preferences__show_weekends'),
+        )
+    }
+
+    hours = {}
+    for user_id in user_ids:
+        row = preferences.get(user_id, {})
+        day_start = row.get('day_start') or DEFAULT_DAY_START
+        day_end = row.get('day_end') or DEFAULT_DAY_END
+        weekends = row.get('weekends') is not False
+        zone = _zone(row.get('zone'))
+
+        blocks = []
+        day = timezone.localtime(start, zone).date()
+        last_day = timezone.localtime(end, zone).date()
+        while day_start < day_end and day <= last_day:
+            if weekends or day.weekday() < 5:
+                block_start = max(_utc(timezone.make_aware(datetime.combine(day, day_start), zone)), start)
+                block_end = min(_utc(timezone.make_aware(datetime.combine(day, day_end), zone)), end)
+                if block_start < block_end:
+                    blocks.append((block_start, block_end))
+            day += timedelta(days=1)
+        hours[user_id] = blocks
+    return hours
+
+
+def _slot_start(moment: datetime) -> datetime:
+    """``moment`` rounded up to the slot granularity"""
+    moment = moment.replace(second=0, microsecond=0) + (
+        timedelta(minutes=1) if moment.second or moment.microsecond else timedelta()
+    )
+    remainder = moment.minute % SLOT_GRANULARITY_MINUTES
+    return moment + timedelta(minutes=SLOT_GRANULARITY_MINUTES - remainder) if remainder else moment
+
+
+def free_slots(start: datetime, end: datetime, user_ids: Iterable[int], duration: timedelta,
+               count: int = 5, account_id: Optional[int] = None) -> List[Tuple[datetime, datetime]]:
+    """
+    First ``count`` slots of length ``duration`` in [start, end) when every user is free
+
+    Slots lie within the business hours of all users, start on multiples
+    of SLOT_GRANULARITY_MINUTES and do not overlap each other.
+    """
+    user_ids = sorted(set(user_ids))
+    if not timedelta() < duration <= MAX_SLOT_DURATION:
+        raise FreeBusyError(f'duration must be between 1 and {MAX_SLOT_DURATION // timedelta(minutes=1)} minutes')
+    if not 1 <= count <= MAX_SLOTS:
+        raise FreeBusyError(f'count must be between 1 and {MAX_SLOTS}')
+
+    intervals = busy_intervals(start, end, user_ids, account_id)
+    hours = business_hours(start, end, user_ids)
+
+    available = hours[user_ids[0]]
+    for user_id in user_ids[1:]:
+        available = intersect(available, hours[user_id])
+    busy = merge(interval for user_intervals in intervals.values() for interval in user_intervals)
+
+    slots = []
+    for free_start, free_end in subtract(available, busy):
+        slot_start = _slot_start(free_start)
+        while slot_start + duration <= free_end and len(slots) < count:
+            slots.append((slot_start, slot_start + duration))
+            slot_start = _slot_start(slot_start + duration)
+        if len(slots) >= count:
+            break
+    return slots
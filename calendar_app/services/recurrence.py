@@ -0,0 +1,442 @@
+"""
+Recurrence expansion for ``CalendarEvent.recurrence_rule``
+
+Occurrences are generated only inside the requested window. The period
+(day, week, month or year) containing the window start is computed
+arithmetically from the series start, and generation stops at the window
+end, so a month view of a daily series that has run for years produces
+about 30 candidates instead of walking the whole series.
+
+Rule format (keys are case-insensitive and follow the RFC 5545 RRULE
+parts)::
+
+    {
+        "freq": "WEEKLY",                 # DAILY, WEEKLY, MONTHLY or YEARLY
+        "interval": 2,                    # default 1
+        "byday": ["MO", "TH"],            # WEEKLY; default: weekday of the start
+        "bymonthday": [1, -1],            # MONTHLY/YEARLY; negative counts from month end
+        "bymonth": [3, 9],                # YEARLY; default: month of the start
+        "count": 10,                      # optional
+        "until": "2027-06-30",            # optional, inclusive
+        "exdate": ["2026-11-04T09:00:00Z", "2026-12-24"],
+        "overrides": {
+            "2026-11-11T09:00:00Z": {"start": "2026-11-12T09:00:00Z", "title": "Moved standup"}
+        }
+    }
+
+An RFC 5545 string is accepted instead of the separate parts, e.g.
+``{"rrule": "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH", "exdate": [...]}``.
+Parts outside RULE_KEYS, ordinal BYDAY values ("1MO"), BY* parts with a
+frequency they are not expanded for (see BY_PART_FREQUENCIES) and a WKST
+other than MO raise RecurrenceError rather than being ignored.
+
+Occurrences are computed in local wall-clock time (TIME_ZONE), so a 09:00
+series stays at 09:00 across DST changes. The series start is always the
+first occurrence. COUNT includes excluded dates, as in RFC 5545.
+``exdate`` entries are occurrence starts, or dates excluding every
+occurrence on that day. ``overrides`` are keyed on the original occurrence
+start and may change OVERRIDE_FIELDS; an occurrence moved into the window
+from outside it is included.
+
+Parsed rules, the end of COUNT-limited series and expanded windows are
+memoized per process, keyed on the rule itself.
+"""
+import calendar
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterator, List, Mapping, Optional, Tuple
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+OVERRIDE_FIELDS = ('start', 'end', 'title', 'description', 'location', 'meeting_url', 'status')
+RULE_KEYS = ('freq', 'interval', 'byday', 'bymonthday', 'bymonth', 'count', 'until', 'wkst', 'exdate', 'overrides')
+# Frequencies each BY* part is expanded for; anywhere else it is rejected
+BY_PART_FREQUENCIES = {
+    'byday': ('WEEKLY',),
+    'bymonthday': ('MONTHLY', 'YEARLY'),
+    'bymonth': ('YEARLY',),
+}
+
+# Safety limits for malformed or extreme rules
+MAX_OCCURRENCES_PER_WINDOW = 1000
+MAX_COUNT = 10000
+CACHE_SIZE = 1024
+
+
+class RecurrenceError(ValueError):
+    """Invalid recurrence rule"""
+    pass
+
+
+@dataclass(frozen=True)
+class Rule:
+    """Parsed, hashable recurrence rule"""
+    freq: str
+    interval: int = 1
+    byday: Tuple[int, ...] = ()
+    bymonthday: Tuple[int, ...] = ()
+    bymonth: Tuple[int, ...] = ()
+    count: Optional[int] = None
+    until: Optional[datetime] = None
+    exdates: FrozenSet[datetime] = frozenset()
+    exdays: FrozenSet[date] = frozenset()
+    # (original start, ((field, value), ...)) pairs
+    overrides: Tuple[Tuple[datetime, Tuple[Tuple[str, Any], ...]], ...] = ()
+
+
+@dataclass(frozen=True)
+class Occurrence:
+    """One occurrence of a series"""
+    start: datetime
+    end: Optional[datetime]
+    original_start: datetime
+    changes: Dict[str, Any] = field(default_factory=dict, hash=False, compare=False)
+
+
+# Parsing
+
+def _parse_moment(value: Any, end_of_day: bool = False) -> datetime:
+    """Aware datetime from an ISO datetime or date string"""
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        text = str(value).strip()
+        try:
+            moment = parse_datetime(text) if 'T' in text or ' ' in text else None
+            day = parse_date(text) if moment is None else None
+        except ValueError:
+            raise RecurrenceError(f"Invalid date or datetime '{value}'")
+        if moment is None:
+            if day is None:
+                raise RecurrenceError(f"Invalid date or datetime '{value}'")
+            moment = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _split_rrule(text: str) -> Dict[str, Any]:
+    """'FREQ=WEEKLY;BYDAY=MO,TH' -> {'freq': 'WEEKLY', 'byday': ['MO', 'TH']}"""
+    parts = {}
+    for part in text.replace('RRULE:', '').split(';'):
+        if not part.strip():
+            continue
+        key, _, value = part.partition('=')
+        key = key.strip().lower()
+        parts[key] = value.split(',') if key in ('byday', 'bymonthday', 'bymonth') else value
+    return parts
+
+
+def _int_list(values, low: int, high: int, name: str, allow_negative: bool = False) -> Tuple[int, ...]:
+    if isinstance(values, (str, int)):
+        values = [values]
+    result = []
+    for value in values:
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            raise RecurrenceError(f"Invalid {name} value '{value}'")
+        if not (low <= abs(number) <= high) or (number < 0 and not allow_negative):
+            raise RecurrenceError(f"{name} value {number} out of range")
+        result.append(number)
+    return tuple(sorted(set(result)))
+
+
+def _override_value(key: str, value: Any) -> Any:
+    if key in ('start', 'end'):
+        if value is None and key == 'end':
+            return None
+        if not isinstance(value, str):
+            raise RecurrenceError(f"Override {key} must be a date or datetime string")
+        return _parse_moment(value)
+    if not isinstance(value, str):
+        raise RecurrenceError(f"Override {key} must be a string")
+    return value
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_canonical(canonical: str) -> Rule:
+    data = {str(key).lower(): value for key, value in json.loads(canonical).items()}
+    if 'rrule' in data:
+        data = {**_split_rrule(str(data.pop('rrule'))), **data}
+
+    unknown = set(data) - set(RULE_KEYS)
+    if unknown:
+        raise RecurrenceError(f"Unsupported recurrence parts: {', '.join(sorted(unknown))}")
+
+    freq = str(data.get('freq', '')).upper()
+    if freq not in FREQUENCIES:
+        raise RecurrenceError(f"Unsupported frequency '{data.get('freq')}'")
+    for part, frequencies in BY_PART_FREQUENCIES.items():
+        if data.get(part) and freq not in frequencies:
+            raise RecurrenceError(f"{part} is not supported with {freq} recurrence")
+    if str(data.get('wkst') or 'MO').strip().upper() != 'MO':
+        raise RecurrenceError('Only weeks starting on Monday (WKST=MO) are supported')
+
+    try:
+        interval = int(data['interval']) if data.get('interval') not in (None, '') else 1
+        count = int(data['count']) if data.get('count') not in (None, '') else None
+    except (TypeError, ValueError):
+        raise RecurrenceError('interval and count must be integers')
+    if interval < 1 or (count is not None and not 1 <= count <= MAX_COUNT):
+        raise RecurrenceError(f'interval must be positive and count between 1 and {MAX_COUNT}')
+
+    byday = data.get('byday') or ()
+    if isinstance(byday, str):
+        byday = byday.split(',')
+    try:
+        weekdays = tuple(sorted({WEEKDAYS.index(str(day).strip().upper()) for day in byday}))
+    except ValueError:
+        raise RecurrenceError(f"Invalid byday {byday}; ordinal weekdays are not supported")
+
+    until = _parse_moment(data['until'], end_of_day=True) if data.get('until') else None
+
+    exdate = data.get('exdate') or ()
+    if isinstance(exdate, str):
+        exdate = exdate.split(',')
+    exdates, exdays = set(), set()
+    for value in exdate:
+        text = str(value).strip()
+        if 'T' in text or ' ' in text:
+            exdates.add(_parse_moment(text))
+        else:
+            try:
+                day = parse_date(text)
+            except ValueError:
+                day = None
+            if day is None:
+                raise RecurrenceError(f"Invalid exdate '{value}'")
+            exdays.add(day)
+
+    if not isinstance(data.get('overrides') or {}, Mapping):
+        raise RecurrenceError('overrides must map occurrence starts to changes')
+    overrides = []
+    for original, changes in (data.get('overrides') or {}).items():
+        if not isinstance(changes, Mapping):
+            raise RecurrenceError(f"Override for '{original}' must be an object")
+        unknown = set(changes) - set(OVERRIDE_FIELDS)
+        if unknown:
+            raise RecurrenceError(f"Unsupported override fields: {', '.join(sorted(unknown))}")
+        values = {key: _override_value(key, value) for key, value in changes.items()}
+        overrides.append((_parse_moment(original), tuple(sorted(values.items()))))
+
+    return Rule(
+        freq=freq,
+        interval=interval,
+        byday=weekdays,
+        bymonthday=_int_list(data.get('bymonthday') or (), 1, 31, 'bymonthday', allow_negative=True),
+        bymonth=_int_list(data.get('bymonth') or (), 1, 12, 'bymonth'),
+        count=count,
+        until=until,
+        exdates=frozenset(exdates),
+        exdays=frozenset(exdays),
+        overrides=tuple(sorted(overrides)),
+    )
+
+
+def parse_rule(data: Any) -> Rule:
+    """Parse and validate ``CalendarEvent.recurrence_rule``; raises RecurrenceError"""
+    if isinstance(data, Rule):
+        return data
+    if isinstance(data, str):
+        data = {'rrule': data}
+    if not isinstance(data, Mapping):
+        raise RecurrenceError('Recurrence rule must be an object or an RRULE string')
+    try:
+        canonical = json.dumps(data, sort_keys=True, default=str)
+    except (TypeError, ValueError) as e:
+        raise RecurrenceError(f'Recurrence rule is not serializable: {e}')
+    return _parse_canonical(canonical)
+
+
+# Candidate generation (local naive datetimes)
+
+def _local(moment: datetime) -> datetime:
+    return timezone.localtime(moment).replace(tzinfo=None)
+
+
+def _aware(local: datetime) -> datetime:
+    return timezone.make_aware(local)
+
+
+def _month_days(year: int, month: int, monthdays: Tuple[int, ...]) -> List[int]:
+    """Valid days of the month, resolving negative days; impossible days are skipped"""
+    last = calendar.monthrange(year, month)[1]
+    days = {day if day > 0 else last + day + 1 for day in monthdays}
+    return sorted(day for day in days if 1 <= day <= last)
+
+
+def _period_index(rule: Rule, first: datetime, moment: datetime) -> int:
+    """Index of the period (in units of ``interval``) containing ``moment``"""
+    if rule.freq == 'DAILY':
+        units = (moment.date() - first.date()).days
+    elif rule.freq == 'WEEKLY':
+        units = (moment.date() - first.date() + timedelta(days=first.weekday() - moment.weekday())).days // 7
+    elif rule.freq == 'MONTHLY':
+        units = (moment.year - first.year) * 12 + moment.month - first.month
+    else:
+        units = moment.year - first.year
+    return max(0, units // rule.interval)
+
+
+def _period(rule: Rule, first: datetime, index: int) -> Tuple[datetime, List[datetime]]:
+    """(start of the period, sorted candidate starts in it) for period ``index``"""
+    step = index * rule.interval
+    at = first.time()
+
+    if rule.freq == 'DAILY':
+        day = first.date() + timedelta(days=step)
+        return datetime.combine(day, time.min), [datetime.combine(day, at)]
+
+    if rule.freq == 'WEEKLY':
+        week = first.date() - timedelta(days=first.weekday()) + timedelta(weeks=step)
+        weekdays = rule.byday or (first.weekday(),)
+        return datetime.combine(week, time.min), [
+            datetime.combine(week + timedelta(days=weekday), at) for weekday in weekdays
+        ]
+
+    if rule.freq == 'MONTHLY':
+        year, month = divmod(first.year * 12 + first.month - 1 + step, 12)
+        month += 1
+        monthdays = rule.bymonthday or (first.day,)
+        return datetime(year, month, 1), [
+            datetime.combine(date(year, month, day), at) for day in _month_days(year, month, monthdays)
+        ]
+
+    year = first.year + step
+    months = rule.bymonth or (first.month,)
+    monthdays = rule.bymonthday or (first.day,)
+    return datetime(year, 1, 1), [
+        datetime.combine(date(year, month, day), at)
+        for month in months
+        for day in _month_days(year, month, monthdays)
+    ]
+
+
+def _candidates(rule: Rule, first: datetime, from_index: int = 0,
+                stop: datetime = datetime.max) -> Iterator[datetime]:
+    """
+    Candidate starts in ascending order from period ``from_index`` on,
+    never before the series start, ending with the last period that
+    begins by ``stop``
+    """
+    if from_index == 0:
+        # The series start is always the first occurrence
+        yield first
+    index = from_index
+    while True:
+        try:
+            period_start, starts = _period(rule, first, index)
+        except (OverflowError, ValueError):
+            # Past year 9999
+            return
+        if period_start > stop:
+            return
+        for start in starts:
+            if start > first:
+                yield start
+        index += 1
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _count_limit(rule: Rule, first: datetime) -> datetime:
+    """Local start of the COUNT-th occurrence; O(count) once per rule"""
+    for number, start in enumerate(_candidates(rule, first), 1):
+        if number == rule.count:
+            return start
+    return datetime.max
+
+
+def _last_start(rule: Rule, first: datetime) -> datetime:
+    """Latest possible local start of the series"""
+    limit = datetime.max
+    if rule.until is not None:
+        limit = _local(rule.until)
+    if rule.count is not None:
+        limit = min(limit, _count_limit(rule, first))
+    return limit
+
+
+def _excluded(rule: Rule, start: datetime) -> bool:
+    return start in rule.exdates or timezone.localtime(start).date() in rule.exdays
+
+
+def _generate(rule: Rule, first: datetime, window_start: datetime, window_end: datetime) -> Iterator[datetime]:
+    """Local starts of the series within [window_start, window_end], before exclusions"""
+    last = min(_last_start(rule, first), window_end)
+    if window_start > last:
+        return
+
+    from_index = _period_index(rule, first, window_start)
+    # Step back one period: a period can begin before the window but have
+    # candidates inside it (e.g. a week starting before the window start)
+    from_index = max(0, from_index - 1)
+    for start in _candidates(rule, first, from_index, stop=last):
+        if start > last:
+            return
+        if start >= window_start:
+            yield start
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _expand(rule: Rule, start: datetime, duration: Optional[timedelta],
+            window_start: datetime, window_end: datetime) -> Tuple[Occurrence, ...]:
+    first = _local(start)
+    local_window_start = _local(window_start)
+    local_window_end = _local(window_end)
+    overrides = {original: dict(changes) for original, changes in rule.overrides}
+
+    occurrences = []
+    for local_start in _generate(rule, first, local_window_start, local_window_end):
+        original = _aware(local_start)
+        if _excluded(rule, original):
+            continue
+        occurrence = _occurrence(original, duration, overrides.get(original))
+        if window_start <= occurrence.start <= window_end:
+            occurrences.append(occurrence)
+        if len(occurrences) >= MAX_OCCURRENCES_PER_WINDOW:
+            break
+
+    # Occurrences moved into the window from outside it
+    for original, changes in overrides.items():
+        if window_start <= original <= window_end or 'start' not in changes:
+            continue
+        if not window_start <= changes['start'] <= window_end or _excluded(rule, original):
+            continue
+        local_original = _local(original)
+        if any(s == local_original for s in _generate(rule, first, local_original, local_original)):
+            occurrences.append(_occurrence(original, duration, changes))
+
+    occurrences.sort(key=lambda occurrence: (occurrence.start, occurrence.original_start))
+    return tuple(occurrences)
+
+
+def _occurrence(original: datetime, duration: Optional[timedelta], changes: Optional[Dict[str, Any]]) -> Occurrence:
+    changes = changes or {}
+    start = changes.get('start') or original
+    end = changes.get('end') or (start + duration if duration is not None else None)
+    return Occurrence(start=start, end=end, original_start=original, changes=changes)
+
+
+def expand(rule: Any, start: datetime, end: Optional[datetime],
+           window_start: datetime, window_end: datetime) -> Tuple[Occurrence, ...]:
+    """
+    Occurrences of a series starting within [window_start, window_end]
+
+    Args:
+        rule: ``recurrence_rule`` value (or a parsed Rule)
+        start, end: Start and end of the first occurrence (end may be None)
+        window_start, window_end: Aware window bounds
+
+    Returns:
+        Occurrences ordered by start, at most MAX_OCCURRENCES_PER_WINDOW.
+        Raises RecurrenceError for an invalid rule.
+    """
+    duration = end - start if end is not None and end > start else None
+    return _expand(parse_rule(rule), start, duration, window_start, window_end)
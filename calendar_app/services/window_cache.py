@@ -0,0 +1,164 @@
+"""
+Response cache for calendar windows
+
+Serialized ``calendar_events_api`` responses are kept in the Django cache,
+keyed on the normalized request (window, event kinds, account and user
+filters). A window cached for one user serves every other user asking for
+the same window and filters.
+
+Invalidation is per day. Each calendar day has a generation token in the
+cache and a window's key includes the tokens of every day it spans, read
+with one ``get_many``. Saving or deleting a task, call, meeting or
+calendar event replaces the tokens of the days its old and new time
+ranges cover (see calendar_app.signals), so exactly the cached windows
+overlapping those days stop matching and windows elsewhere stay cached.
+Saving or deleting a recurring event invalidates every window.
+Orphaned entries expire after CACHE_TIMEOUT and day tokens after
+TOKEN_TIMEOUT. Windows longer than MAX_INVALIDATION_DAYS are not cached.
+
+Writes that bypass model signals (``QuerySet.update``, ``bulk_create``)
+are only picked up when entries expire, unless the writer calls
+``invalidate_all()``. Renaming a user or account does not invalidate
+windows either.
+
+Invalidation only reaches other workers through a shared cache backend.
+With a per-process cache (LocMemCache) a write would leave every other
+process serving the old window and ETag, so caching is off unless the
+backend is shared. ``settings.CALENDAR_WINDOW_CACHE`` set to True or False
+overrides the detection.
+"""
+import hashlib
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils import timezone
+
+from .events import MAX_EVENTS, PAYLOAD_VERSION
+
+
+CACHE_PREFIX = 'calendar:window'
+CACHE_TIMEOUT = 300
+# Outlives every entry keyed on a token; an expired token is recreated
+# with a fresh value, so it only ever causes a miss
+TOKEN_TIMEOUT = CACHE_TIMEOUT * 12
+GLOBAL_GENERATION_KEY = f'{CACHE_PREFIX}:generation'
+# Ranges longer than this invalidate every window instead of day by day,
+# and windows longer than this are not cached
+MAX_INVALIDATION_DAYS = 400
+
+
+def enabled() -> bool:
+    """Whether windows are cached: only with a cache shared by all workers, unless configured"""
+    configured = getattr(settings, 'CALENDAR_WINDOW_CACHE', None)
+    if configured is not None:
+        return bool(configured)
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def _day_key(day: date) -> str:
+    return f'{CACHE_PREFIX}:day:{day.isoformat()}'
+
+
+def _days(start: datetime, end: datetime) -> List[date]:
+    """Local calendar days from ``start`` to ``end``, inclusive"""
+    first = timezone.localtime(start).date()
+    last = timezone.localtime(end).date()
+    return [first + timedelta(days=n) for n in range((last - first).days + 1)]
+
+
+def _new_token() -> str:
+    return uuid.uuid4().hex
+
+
+def _generations(keys: List[str]) -> Dict[str, str]:
+    """Current generation token of each key, creating missing ones"""
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # A key that was never set or was evicted gets a fresh random token,
+        # so it can never match a key computed before the eviction. add()
+        # keeps a token a concurrent request created first.
+        fresh = {key: _new_token() for key in missing}
+        for key, token in fresh.items():
+            cache.add(key, token, timeout=TOKEN_TIMEOUT)
+        stored = cache.get_many(missing)
+        found.update({key: stored.get(key, token) for key, token in fresh.items()})
+    return found
+
+
+def window_key(start: datetime, end: datetime, kinds: Iterable[str], account_id: Optional[int] = None,
+               user_id: Optional[int] = None) -> Optional[str]:
+    """
+    Cache key of a window at the current generations of the days it spans
+
+    None when caching is disabled and for windows longer than
+    MAX_INVALIDATION_DAYS, which are not cached.
+    """
+    if not enabled() or (end - start).days > MAX_INVALIDATION_DAYS:
+        return None
+    keys = [GLOBAL_GENERATION_KEY] + [_day_key(day) for day in _days(start, end)]
+    generations = _generations(keys)
+    state = (
+        PAYLOAD_VERSION,
+        MAX_EVENTS,
+        start.astimezone(dt_timezone.utc).isoformat(),
+        end.astimezone(dt_timezone.utc).isoformat(),
+        sorted(kinds),
+        account_id,
+        user_id,
+        [generations[key] for key in keys],
+    )
+    return f'{CACHE_PREFIX}:{hashlib.md5(repr(state).encode("utf-8")).hexdigest()}'
+
+
+def get(key: str) -> Optional[Dict[str, Any]]:
+    return cache.get(key)
+
+
+def store(key: str, body: bytes, truncated: bool, etag: Optional[str]) -> None:
+    cache.set(key, {
+        'body': body,
+        'truncated': truncated,
+        'etag': etag,
+    }, CACHE_TIMEOUT)
+
+
+def _bump(keys: List[str]) -> None:
+    cache.set_many({key: _new_token() for key in keys}, timeout=TOKEN_TIMEOUT)
+
+
+def invalidate_ranges(ranges: Iterable[tuple]) -> None:
+    """
+    Evict the cached windows overlapping any (start, end) range
+
+    Runs once the current transaction commits, so a window computed from
+    the old rows cannot be cached under the new generations.
+    """
+    if not enabled():
+        return
+    days = set()
+    for start, end in ranges:
+        if start is None:
+            continue
+        end = end if end is not None and end > start else start
+        if (end - start).days > MAX_INVALIDATION_DAYS:
+            invalidate_all()
+            return
+        days.update(_days(start, end))
+
+    if days:
+        keys = [_day_key(day) for day in sorted(days)]
+        transaction.on_commit(lambda: _bump(keys))
+
+
+def invalidate_all() -> None:
+    """Evict every cached window once the current transaction commits"""
+    if not enabled():
+        return
+    transaction.on_commit(lambda: _bump([GLOBAL_GENERATION_KEY]))
@@ -0,0 +1,77 @@
+"""
+Signal handlers for the calendar app
+"""
+from datetime import timedelta
+
+from django.db.models.signals import pre_save, post_save, post_delete
+
+from tasks.models import Task, Call, Meeting
+from .models import CalendarEvent
+from .services import window_cache
+
+
+def _task_range(task):
+    return task.due_date, task.due_date
+
+
+def _call_range(call):
+    start = call.scheduled_datetime
+    return start, start + timedelta(minutes=call.duration_minutes or 30) if start else None
+
+
+def _meeting_range(meeting):
+    return meeting.start_datetime, meeting.end_datetime
+
+
+def _custom_event_range(event):
+    if event.is_recurring:
+        # Occurrences can fall on any day after the start
+        return None
+    return event.start_datetime, event.end_datetime
+
+
+# Model -> (fields the time range is computed from, range function).
+# A range function returns None when the event has no bounded range.
+EVENT_RANGES = {
+    Task: (('due_date',), _task_range),
+    Call: (('scheduled_datetime', 'duration_minutes'), _call_range),
+    Meeting: (('start_datetime', 'end_datetime'), _meeting_range),
+    CalendarEvent: (('start_datetime', 'end_datetime', 'is_recurring'), _custom_event_range),
+}
+
+
+def _remember_old_range(sender, instance, raw=False, **kwargs):
+    """Keep the stored time range so post_save can evict its windows too"""
+    instance._calendar_old_range = (None, None)
+    if raw or instance.pk is None:
+        return
+    fields, range_of = EVENT_RANGES[sender]
+    old = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    if old:
+        instance._calendar_old_range = range_of(sender(**old))
+
+
+def _invalidate(ranges):
+    if any(time_range is None for time_range in ranges):
+        window_cache.invalidate_all()
+    else:
+        window_cache.invalidate_ranges(ranges)
+
+
+def _invalidate_saved(sender, instance, **kwargs):
+    _, range_of = EVENT_RANGES[sender]
+    _invalidate([range_of(instance), getattr(instance, '_calendar_old_range', (None, None))])
+
+
+def _invalidate_deleted(sender, instance, **kwargs):
+    _, range_of = EVENT_RANGES[sender]
+    _invalidate([range_of(instance)])
+
+
+def connect_window_cache_signals():
+    """Evict cached calendar windows overlapping events that are saved or deleted"""
+    for model in EVENT_RANGES:
+        label = model._meta.label_lower
+        pre_save.connect(_remember_old_range, sender=model, dispatch_uid=f'calendar_window_{label}_pre_save')
+        post_save.connect(_invalidate_saved, sender=model, dispatch_uid=f'calendar_window_{label}_save')
+        post_delete.connect(_invalidate_deleted, sender=model, dispatch_uid=f'calendar_window_{label}_delete')
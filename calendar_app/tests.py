@@ -1,3 +1,388 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import Account
+from tasks.models import Call, Meeting, Task
+
+from .models import CalendarEvent
+from .services import freebusy, recurrence, window_cache
+from .services.events import get_call_color, get_custom_event_color, get_meeting_color, get_task_color
+
+
+KINDS = ['meetings', 'events']
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+def excerpt(text):
+    return text[:100] + '...' if text and len(text) > 100 else text
+
+
+def legacy_event(item):
+    """The event the calendar API built per object before it was rewritten as one UNION query"""
+    assigned_to = item.assigned_to.get_full_name() if item.assigned_to else 'Unassigned'
+    if isinstance(item, Task):
+        return {
+            'id': f'task_{item.id}', 'title': f'📋 {item.subject}',
+            'start': item.due_date.isoformat(), 'end': item.due_date.isoformat(), 'allDay': True,
+            'backgroundColor': get_task_color(item.priority), 'borderColor': get_task_color(item.priority),
+            'textColor': '#ffffff',
+            'extendedProps': {
+                'type': 'task', 'id': item.id, 'status': item.status, 'priority': item.priority,
+                'assigned_to': assigned_to, 'description': excerpt(item.description), 'url': f'/tasks/{item.id}/',
+            },
+        }
+    account = item.related_account.name if getattr(item, 'related_account', None) else 'No account'
+    if isinstance(item, Call):
+        return {
+            'id': f'call_{item.id}', 'title': f'📞 {item.subject}',
+            'start': item.scheduled_datetime.isoformat(),
+            'end': (item.scheduled_datetime + timedelta(minutes=item.duration_minutes or 30)).isoformat(),
+            'backgroundColor': get_call_color(item.status), 'borderColor': get_call_color(item.status),
+            'textColor': '#ffffff',
+            'extendedProps': {
+                'type': 'call', 'id': item.id, 'status': item.status, 'call_type': item.call_type,
+                'phone_number': item.phone_number, 'assigned_to': assigned_to, 'account': account,
+                'description': excerpt(item.description), 'url': f'/tasks/calls/{item.id}/',
+            },
+        }
+    end = item.end_datetime or item.start_datetime + timedelta(hours=1)
+    if isinstance(item, Meeting):
+        return {
+            'id': f'meeting_{item.id}', 'title': f'🤝 {item.subject}',
+            'start': item.start_datetime.isoformat(), 'end': end.isoformat(),
+            'backgroundColor': get_meeting_color(item.status), 'borderColor': get_meeting_color(item.status),
+            'textColor': '#ffffff',
+            'extendedProps': {
+                'type': 'meeting', 'id': item.id, 'status': item.status, 'meeting_type': item.meeting_type,
+                'location': item.location, 'meeting_url': item.meeting_url, 'assigned_to': assigned_to,
+                'account': account, 'agenda': excerpt(item.agenda), 'url': f'/tasks/meetings/{item.id}/',
+            },
+        }
+    return {
+        'id': f'custom_{item.id}', 'title': f'📅 {item.title}',
+        'start': item.start_datetime.isoformat(), 'end': end.isoformat(), 'allDay': item.is_all_day,
+        'backgroundColor': get_custom_event_color(item.event_type),
+        'borderColor': get_custom_event_color(item.event_type), 'textColor': '#ffffff',
+        'extendedProps': {
+            'type': 'custom_event', 'id': item.id, 'event_type': item.event_type, 'status': item.status,
+            'location': item.location, 'meeting_url': item.meeting_url, 'assigned_to': assigned_to,
+            'created_by': item.created_by.get_full_name() if item.created_by else 'Unknown',
+            'description': excerpt(item.description), 'url': f'/calendar/events/{item.id}/',
+        },
+    }
+
+
+def starts(occurrences):
+    return [occurrence.start for occurrence in occurrences]
+
+
+class RecurrenceTests(TestCase):
+    def expand(self, rule, start, window_start, window_end, duration=timedelta(hours=1)):
+        return recurrence.expand(rule, start, start + duration, window_start, window_end)
+
+    def test_weekly_interval_counts_periods_from_the_week_of_the_start(self):
+        # Thursday 1 January: the series runs in the weeks of 29 Dec, 12 Jan, 26 Jan, ...
+        rule = {'freq': 'WEEKLY', 'interval': 2, 'byday': ['MO', 'TH']}
+
+        occurrences = self.expand(rule, utc(2026, 1, 1, 9), utc(2026, 3, 1), utc(2026, 3, 31, 23, 59))
+
+        self.assertEqual(starts(occurrences), [
+            utc(2026, 3, 9, 9), utc(2026, 3, 12, 9), utc(2026, 3, 23, 9), utc(2026, 3, 26, 9),
+        ])
+
+    def test_negative_month_day_counts_from_month_end(self):
+        rule = {'freq': 'MONTHLY', 'bymonthday': [-1]}
+
+        occurrences = self.expand(rule, utc(2026, 1, 31, 9), utc(2026, 2, 1), utc(2026, 4, 30, 23, 59))
+
+        self.assertEqual(starts(occurrences), [utc(2026, 2, 28, 9), utc(2026, 3, 31, 9), utc(2026, 4, 30, 9)])
+
+    def test_count_includes_excluded_dates(self):
+        rule = {'rrule': 'FREQ=DAILY;COUNT=5', 'exdate': ['2026-01-03', '2026-01-04T09:00:00Z']}
+
+        occurrences = self.expand(rule, utc(2026, 1, 1, 9), utc(2026, 1, 1), utc(2026, 1, 31))
+
+        self.assertEqual(starts(occurrences), [utc(2026, 1, 1, 9), utc(2026, 1, 2, 9), utc(2026, 1, 5, 9)])
+
+    def test_override_moved_into_the_window_is_included(self):
+        rule = {'freq': 'WEEKLY', 'overrides': {
+            '2026-01-12T09:00:00Z': {'start': '2026-01-20T14:00:00Z', 'title': 'Moved'},
+            '2026-01-19T09:00:00Z': {'start': '2026-01-27T09:00:00Z'},
+        }}
+
+        occurrences = self.expand(rule, utc(2026, 1, 5, 9), utc(2026, 1, 19), utc(2026, 1, 25, 23, 59))
+
+        self.assertEqual(starts(occurrences), [utc(2026, 1, 20, 14)])
+        moved = occurrences[0]
+        self.assertEqual(moved.original_start, utc(2026, 1, 12, 9))
+        self.assertEqual(moved.end, utc(2026, 1, 20, 15))
+        self.assertEqual(moved.changes['title'], 'Moved')
+
+    def test_until_date_includes_that_whole_day(self):
+        occurrences = self.expand({'freq': 'DAILY', 'until': '2026-01-03'}, utc(2026, 1, 1, 9),
+                                  utc(2026, 1, 1), utc(2026, 1, 31))
+
+        self.assertEqual(starts(occurrences), [utc(2026, 1, 1, 9), utc(2026, 1, 2, 9), utc(2026, 1, 3, 9)])
+
+    def test_invalid_rule_is_rejected(self):
+        for rule in ({'freq': 'HOURLY'}, {'freq': 'DAILY', 'interval': 0}, 'FREQ=WEEKLY;BYDAY=XX'):
+            with self.subTest(rule=rule), self.assertRaises(recurrence.RecurrenceError):
+                recurrence.parse_rule(rule)
+
+    def test_unsupported_parts_are_rejected_instead_of_ignored(self):
+        rules = [
+            'FREQ=MONTHLY;BYDAY=1MO',
+            'FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR',
+            'FREQ=WEEKLY;BYMONTHDAY=1',
+            'FREQ=MONTHLY;BYMONTH=3',
+            'FREQ=MONTHLY;BYDAY=MO;BYSETPOS=1',
+            'FREQ=DAILY;BYHOUR=9,17',
+            'FREQ=WEEKLY;WKST=SU;INTERVAL=2',
+        ]
+        for rule in rules:
+            with self.subTest(rule=rule), self.assertRaises(recurrence.RecurrenceError):
+                recurrence.parse_rule(rule)
+
+        self.assertEqual(recurrence.parse_rule('FREQ=WEEKLY;WKST=MO;BYDAY=TU').byday, (1,))
+
+    def test_override_values_are_type_checked(self):
+        overrides = [
+            {'title': ['x']},
+            {'description': {'text': 'x'}},
+            {'status': None},
+            {'start': 5},
+            {'start': None},
+            {'end': ['2026-01-12T10:00:00Z']},
+        ]
+        for changes in overrides:
+            rule = {'freq': 'WEEKLY', 'overrides': {'2026-01-12T09:00:00Z': changes}}
+            with self.subTest(changes=changes), self.assertRaises(recurrence.RecurrenceError):
+                recurrence.parse_rule(rule)
+
+    def test_unsupported_rule_falls_back_to_the_master_event(self):
+        user = User.objects.create_user('planner')
+        CalendarEvent.objects.create(
+            title='Standup', start_datetime=utc(2026, 3, 2, 9), end_datetime=utc(2026, 3, 2, 10),
+            created_by=user, assigned_to=user, is_recurring=True,
+            recurrence_rule={'freq': 'WEEKLY', 'overrides': {'2026-03-09T09:00:00Z': {'title': ['x']}}},
+        )
+
+        busy = freebusy.free_busy(utc(2026, 3, 1), utc(2026, 3, 31), [user.id])[user.id]['busy']
+
+        self.assertEqual(busy, [(utc(2026, 3, 2, 9), utc(2026, 3, 2, 10))])
+
+
+@override_settings(CALENDAR_WINDOW_CACHE=True)
+class WindowCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidation_only_changes_windows_overlapping_the_range(self):
+        march = (utc(2026, 3, 1), utc(2026, 3, 8))
+        april = (utc(2026, 4, 1), utc(2026, 4, 8))
+        march_key = window_cache.window_key(*march, KINDS)
+        april_key = window_cache.window_key(*april, KINDS)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            window_cache.invalidate_ranges([(utc(2026, 3, 3, 9), utc(2026, 3, 3, 10))])
+
+        self.assertNotEqual(window_cache.window_key(*march, KINDS), march_key)
+        self.assertEqual(window_cache.window_key(*april, KINDS), april_key)
+
+    def test_invalidate_all_changes_every_window(self):
+        key = window_cache.window_key(utc(2026, 3, 1), utc(2026, 3, 8), KINDS)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            window_cache.invalidate_all()
+
+        self.assertNotEqual(window_cache.window_key(utc(2026, 3, 1), utc(2026, 3, 8), KINDS), key)
+
+    def test_long_windows_are_not_cached(self):
+        start = utc(2026, 1, 1)
+
+        self.assertIsNone(window_cache.window_key(start, start + timedelta(days=365 * 100), KINDS))
+        self.assertIsNone(cache.get(f'{window_cache.CACHE_PREFIX}:day:2026-01-01'))
+        self.assertIsNotNone(window_cache.window_key(
+            start, start + timedelta(days=window_cache.MAX_INVALIDATION_DAYS), KINDS
+        ))
+
+    @override_settings(CALENDAR_WINDOW_CACHE=None)
+    def test_per_process_cache_is_not_used(self):
+        self.assertFalse(window_cache.enabled())
+        self.assertIsNone(window_cache.window_key(utc(2026, 3, 1), utc(2026, 3, 8), KINDS))
+
+
+class FreeBusySweepTests(TestCase):
+    def test_merge_joins_overlapping_and_touching_intervals(self):
+        blocks = freebusy.merge([
+            (utc(2026, 3, 2, 11), utc(2026, 3, 2, 12)),
+            (utc(2026, 3, 2, 9), utc(2026, 3, 2, 10)),
+            (utc(2026, 3, 2, 10), utc(2026, 3, 2, 10, 30)),
+            (utc(2026, 3, 2, 9, 15), utc(2026, 3, 2, 9, 45)),
+        ])
+
+        self.assertEqual(blocks, [(utc(2026, 3, 2, 9), utc(2026, 3, 2, 10, 30)),
+                                  (utc(2026, 3, 2, 11), utc(2026, 3, 2, 12))])
+
+    def test_conflicts_pair_every_overlap(self):
+        intervals = [
+            freebusy.Interval(utc(2026, 3, 2, 9), utc(2026, 3, 2, 11), 'a'),
+            freebusy.Interval(utc(2026, 3, 2, 10), utc(2026, 3, 2, 12), 'b'),
+            freebusy.Interval(utc(2026, 3, 2, 10, 30), utc(2026, 3, 2, 10, 45), 'c'),
+            freebusy.Interval(utc(2026, 3, 2, 12), utc(2026, 3, 2, 13), 'd'),
+        ]
+
+        self.assertEqual(freebusy.conflicts(intervals), [
+            freebusy.Conflict(utc(2026, 3, 2, 10), utc(2026, 3, 2, 11), ('a', 'b')),
+            freebusy.Conflict(utc(2026, 3, 2, 10, 30), utc(2026, 3, 2, 10, 45), ('a', 'c')),
+            freebusy.Conflict(utc(2026, 3, 2, 10, 30), utc(2026, 3, 2, 10, 45), ('b', 'c')),
+        ])
+
+    def test_intersect_and_subtract(self):
+        hours = [(utc(2026, 3, 2, 8), utc(2026, 3, 2, 18))]
+        other_hours = [(utc(2026, 3, 2, 6), utc(2026, 3, 2, 9)), (utc(2026, 3, 2, 10), utc(2026, 3, 2, 20))]
+        busy = [(utc(2026, 3, 2, 7), utc(2026, 3, 2, 8, 30)), (utc(2026, 3, 2, 12), utc(2026, 3, 2, 13))]
+
+        available = freebusy.intersect(hours, other_hours)
+
+        self.assertEqual(available, [(utc(2026, 3, 2, 8), utc(2026, 3, 2, 9)),
+                                     (utc(2026, 3, 2, 10), utc(2026, 3, 2, 18))])
+        self.assertEqual(freebusy.subtract(available, busy), [
+            (utc(2026, 3, 2, 8, 30), utc(2026, 3, 2, 9)),
+            (utc(2026, 3, 2, 10), utc(2026, 3, 2, 12)),
+            (utc(2026, 3, 2, 13), utc(2026, 3, 2, 18)),
+        ])
+
+
+class FreeBusyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('planner')
+
+    def event(self, start, end, **fields):
+        return CalendarEvent.objects.create(title='Event', start_datetime=start, end_datetime=end,
+                                            created_by=self.user, assigned_to=self.user, **fields)
+
+    def test_all_day_event_ending_at_its_own_start_blocks_the_day(self):
+        # Monday 2 March, stored with end == start
+        self.event(utc(2026, 3, 2), utc(2026, 3, 2), is_all_day=True)
+
+        busy = freebusy.free_busy(utc(2026, 3, 2, 8), utc(2026, 3, 2, 18), [self.user.id])[self.user.id]['busy']
+        slots = freebusy.free_slots(utc(2026, 3, 2), utc(2026, 3, 4), [self.user.id], timedelta(minutes=30), 1)
+
+        self.assertEqual(busy, [(utc(2026, 3, 2), utc(2026, 3, 3))])
+        self.assertEqual(slots, [(utc(2026, 3, 3, 8), utc(2026, 3, 3, 8, 30))])
+
+    def test_all_day_event_ending_at_midnight_of_its_last_day_blocks_that_day(self):
+        self.event(utc(2026, 2, 28), utc(2026, 3, 2), is_all_day=True)
+
+        self.assertEqual(freebusy.busy_users(utc(2026, 3, 2, 8), utc(2026, 3, 2, 18), [self.user.id]), [self.user.id])
+
+    def test_slots_stay_on_the_granularity(self):
+        slots = freebusy.free_slots(utc(2026, 3, 2), utc(2026, 3, 3), [self.user.id], timedelta(minutes=20), 3)
+
+        self.assertEqual([slot_start for slot_start, _ in slots],
+                         [utc(2026, 3, 2, 8), utc(2026, 3, 2, 8, 30), utc(2026, 3, 2, 9)])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class CalendarEventsAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('planner', first_name='Pat', last_name='Lee')
+        self.other = User.objects.create_user('other')
+        self.account = Account.objects.create(name='Acme')
+        self.meeting = self.create_meeting(utc(2026, 3, 2, 10), related_account=self.account,
+                                           agenda='x' * 150, location='Room 1')
+
+    def create_meeting(self, start, **fields):
+        fields.setdefault('assigned_to', self.user)
+        return Meeting.objects.create(subject='Review', start_datetime=start, end_datetime=start + timedelta(hours=1),
+                                      **fields)
+
+    def get(self, **params):
+        query = {'start': '2026-03-01T00:00:00Z', 'end': '2026-03-08T00:00:00Z', 'types[]': ['meetings']}
+        query.update(params)
+        headers = {key: query.pop(key) for key in list(query) if key.startswith('HTTP_')}
+        return self.client.get(reverse('calendar_app:calendar_events_api'), query, **headers)
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [event['id'] for event in response.json()]
+
+    def test_payload_matches_the_per_object_format(self):
+        items = [
+            self.meeting,
+            Task.objects.create(subject='Follow up', due_date=utc(2026, 3, 3, 12), assigned_to=self.user,
+                                description='Call back'),
+            Call.objects.create(subject='Intro', phone_number='+4512345678', scheduled_datetime=utc(2026, 3, 4, 9),
+                                assigned_to=self.user, related_account=self.account),
+            CalendarEvent.objects.create(title='Offsite', start_datetime=utc(2026, 3, 5), is_all_day=True,
+                                         event_type='company', created_by=self.other, assigned_to=self.user,
+                                         description='y' * 101),
+        ]
+        Meeting.objects.create(subject='Later', start_datetime=utc(2026, 4, 1), end_datetime=utc(2026, 4, 1, 1),
+                               assigned_to=self.user)
+
+        response = self.get(**{'types[]': ['tasks', 'calls', 'meetings', 'events']})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.json(), key=lambda event: event['id']),
+                         sorted((legacy_event(item) for item in items), key=lambda event: event['id']))
+
+    def test_account_and_user_filters(self):
+        other_meeting = self.create_meeting(utc(2026, 3, 3, 10), assigned_to=self.other)
+
+        self.assertEqual(self.ids(self.get()), [f'meeting_{self.meeting.pk}', f'meeting_{other_meeting.pk}'])
+        self.assertEqual(self.ids(self.get(account_id=self.account.pk)), [f'meeting_{self.meeting.pk}'])
+        self.assertEqual(self.ids(self.get(user_id=self.other.pk)), [f'meeting_{other_meeting.pk}'])
+        self.assertEqual(self.ids(self.get(user_id=self.other.pk, account_id=self.account.pk)), [])
+
+    def test_invalid_parameters_are_rejected(self):
+        for params in ({'start': ''}, {'end': 'tomorrow'}, {'user_id': 'me'}, {'account_id': '1.5'}):
+            with self.subTest(params=params):
+                response = self.get(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Invalid date format or id'})
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.get()
+
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_deleting_an_event_changes_the_etag(self):
+        response = self.get()
+        self.assertNotIn('Last-Modified', response)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.meeting.delete()
+
+        for headers in ({'HTTP_IF_NONE_MATCH': response['ETag']},
+                        {'HTTP_IF_MODIFIED_SINCE': 'Wed, 01 Jan 2031 00:00:00 GMT'}):
+            with self.subTest(headers=headers):
+                stale = self.get(**headers)
+                self.assertEqual(stale.status_code, 200)
+                self.assertEqual(stale.json(), [])
+
+    @override_settings(CALENDAR_WINDOW_CACHE=True)
+    def test_saving_a_meeting_invalidates_the_cached_window(self):
+        first = self.get()
+        with self.assertNumQueries(0):
+            cached = self.get()
+        self.assertEqual((cached.content, cached['ETag']), (first.content, first['ETag']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.meeting.subject = 'Renamed'
+            self.meeting.save()
+
+        response = self.get(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['title'], '🤝 Renamed')
+        self.assertNotEqual(response['ETag'], first['ETag'])
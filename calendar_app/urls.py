@@ -31,4 +31,6 @@ urlpatterns = [
     # API endpoints
     path('api/events/', views.calendar_events_api, name='calendar_events_api'),
     path('api/counts/', views.calendar_event_counts_api, name='calendar_counts_api'),
+    path('api/freebusy/', views.calendar_freebusy_api, name='calendar_freebusy_api'),
+    path('api/free-slots/', views.calendar_free_slots_api, name='calendar_free_slots_api'),
 ]
@@ -1,10 +1,11 @@
 from django.shortcuts import render
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import TemplateView
-from django.http import JsonResponse
-from django.db.models import Q
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.http import HttpResponse, JsonResponse
 from django.utils import timezone
-from django.contrib.contenttypes.models import ContentType
 from datetime import datetime, timedelta
 import json
 
@@ -12,6 +13,13 @@ from tasks.models import Task, Call, Meeting
 from accounts.models import Account
 from django.contrib.auth.models import User
 
+from .services import freebusy, window_cache
+from .services.events import DEFAULT_EVENT_TYPES, calendar_events, dumps, event_kinds, window_version
+
+
+# Event kinds counted by calendar_event_counts_api
+COUNTED_KINDS = ['task', 'call', 'meeting']
+
 
 class CalendarView(LoginRequiredMixin, TemplateView):
     template_name = 'calendar_app/calendar.html'
@@ -177,278 +185,136 @@ class CalendarQuickCreateView(LoginRequiredMixin, TemplateView):
             return redirect('calendar_app:calendar')
 
 
+def _parse_window_bound(value):
+    """Parse a start/end parameter; naive values are in the current time zone"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _optional_id(value):
+    return int(value) if value else None
+
+
+def _events_params(request):
+    """(start, end, event types, account id, user id) of an events API request"""
+    start_datetime = _parse_window_bound(request.GET.get('start'))
+    end_datetime = _parse_window_bound(request.GET.get('end'))
+    account_id = _optional_id(request.GET.get('account_id'))
+    user_id = _optional_id(request.GET.get('user_id'))
+    event_types = request.GET.getlist('types[]') or DEFAULT_EVENT_TYPES
+    return start_datetime, end_datetime, event_types, account_id, user_id
+
+
+def _counts_params(request):
+    """(start date, end date, whole-day range start, range end) of a counts API request"""
+    # Default to current month if no dates provided
+    today = datetime.now().date()
+    start_date = request.GET.get('start', str(today.replace(day=1)))
+    end_date = request.GET.get('end', str(today.replace(day=28) + timedelta(days=4)))
+    
+    start_datetime = datetime.fromisoformat(start_date)
+    end_datetime = datetime.fromisoformat(end_date)
+    
+    # Whole-day bounds compared on the raw columns so the indexes are usable
+    range_start = timezone.make_aware(datetime.combine(start_datetime.date(), datetime.min.time()))
+    range_end = timezone.make_aware(datetime.combine(end_datetime.date() + timedelta(days=1), datetime.min.time()))
+    return start_date, end_date, range_start, range_end
+
+
+def _memoized_version(request, compute):
+    """ETag of the request, computed once for condition() and the view"""
+    if not hasattr(request, '_calendar_version'):
+        try:
+            request._calendar_version = compute(request)
+        except (ValueError, AttributeError):
+            # Invalid parameters: no validator, the view answers 400
+            request._calendar_version = None
+    return request._calendar_version
+
+
+def _events_version(request):
+    start_datetime, end_datetime, event_types, account_id, user_id = _events_params(request)
+    kinds = event_kinds(event_types)
+    
+    # A cached response carries its version, so a hit needs no query at all.
+    # The key and entry are kept on the request for the view.
+    key = window_cache.window_key(start_datetime, end_datetime, kinds, account_id, user_id)
+    cached = window_cache.get(key) if key is not None else None
+    request._calendar_window = (key, cached)
+    if cached is not None:
+        return cached['etag']
+    return window_version(start_datetime, end_datetime, kinds, account_id, user_id)
+
+
+def _counts_version(request):
+    _, _, range_start, range_end = _counts_params(request)
+    return window_version(range_start, range_end, COUNTED_KINDS)
+
+
+def _events_etag(request):
+    return _memoized_version(request, _events_version)
+
+
+def _counts_etag(request):
+    return _memoized_version(request, _counts_version)
+
+
+# Clients must revalidate every time. There is no Last-Modified: the latest
+# updated_at in a window does not advance when an event is deleted or moved
+# out of it, so only the ETag can tell a changed window apart.
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_events_etag)
 def calendar_events_api(request):
     """API endpoint for calendar events"""
     import logging
     logger = logging.getLogger(__name__)
     
-    start_date = request.GET.get('start')
-    end_date = request.GET.get('end')
-    account_id = request.GET.get('account_id')
-    user_id = request.GET.get('user_id')
-    event_types = request.GET.getlist('types[]') or ['tasks', 'calls', 'meetings']
-    
-    logger.info(f"Calendar API called with: start={start_date}, end={end_date}, account={account_id}, user={user_id}, types={event_types}")
-    
-    events = []
-    
-    # Parse dates
     try:
-        start_datetime = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-        end_datetime = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-        logger.info(f"Parsed dates: {start_datetime} to {end_datetime}")
+        start_datetime, end_datetime, event_types, account_id, user_id = _events_params(request)
     except (ValueError, AttributeError) as e:
-        logger.error(f"Date parsing error: {e}")
-        return JsonResponse({'error': 'Invalid date format'}, status=400)
+        logger.error(f"Invalid calendar API parameters: {e}")
+        return JsonResponse({'error': 'Invalid date format or id'}, status=400)
     
-    # Base filters for account
-    account_filter = Q()
-    if account_id:
-        try:
-            account = Account.objects.get(id=account_id)
-            account_filter = Q(related_account=account)  # For Call and Meeting
-        except Account.DoesNotExist:
-            account_filter = Q(pk=None)  # No results
-    
-    # Base filters for user
-    user_filter = Q()
-    if user_id:
-        try:
-            user = User.objects.get(id=user_id)
-            user_filter = Q(assigned_to=user)
-        except User.DoesNotExist:
-            user_filter = Q(pk=None)  # No results
+    key, cached = getattr(request, '_calendar_window', (None, None))
+    if cached is not None:
+        body, truncated = cached['body'], cached['truncated']
+    else:
+        events, truncated = calendar_events(start_datetime, end_datetime, event_types, account_id, user_id)
+        body = dumps(events)
+        if key is not None:
+            window_cache.store(key, body, truncated, _memoized_version(request, _events_version))
     
-    # Get Tasks
-    if 'tasks' in event_types:
-        task_filters = user_filter & (
-            Q(due_date__gte=start_datetime.date()) & 
-            Q(due_date__lte=end_datetime.date())
-        )
-        
-        # For tasks, handle account filtering with generic foreign key
-        if account_id:
-            try:
-                account = Account.objects.get(id=account_id)
-                account_content_type = ContentType.objects.get_for_model(Account)
-                task_filters &= Q(content_type=account_content_type, object_id=account.id)
-            except Account.DoesNotExist:
-                task_filters &= Q(pk=None)  # No results
-        
-        tasks = Task.objects.filter(task_filters).select_related('assigned_to')
-        
-        for task in tasks:
-            events.append({
-                'id': f'task_{task.id}',
-                'title': f'📋 {task.subject}',
-                'start': task.due_date.isoformat(),
-                'end': task.due_date.isoformat(),
-                'allDay': True,
-                'backgroundColor': get_task_color(task.priority),
-                'borderColor': get_task_color(task.priority),
-                'textColor': '#ffffff',
-                'extendedProps': {
-                    'type': 'task',
-                    'id': task.id,
-                    'status': task.status,
-                    'priority': task.priority,
-                    'assigned_to': task.assigned_to.get_full_name() if task.assigned_to else 'Unassigned',
-                    'description': task.description[:100] + '...' if len(task.description) > 100 else task.description,
-                    'url': f'/tasks/{task.id}/'
-                }
-            })
-    
-    # Get Calls
-    if 'calls' in event_types:
-        call_filters = user_filter & account_filter & (
-            Q(scheduled_datetime__gte=start_datetime) & 
-            Q(scheduled_datetime__lte=end_datetime)
-        )
-        
-        calls = Call.objects.filter(call_filters).select_related('assigned_to', 'related_account')
-        
-        for call in calls:
-            events.append({
-                'id': f'call_{call.id}',
-                'title': f'📞 {call.subject}',
-                'start': call.scheduled_datetime.isoformat(),
-                'end': (call.scheduled_datetime + timedelta(minutes=call.duration_minutes or 30)).isoformat(),
-                'backgroundColor': get_call_color(call.status),
-                'borderColor': get_call_color(call.status),
-                'textColor': '#ffffff',
-                'extendedProps': {
-                    'type': 'call',
-                    'id': call.id,
-                    'status': call.status,
-                    'call_type': call.call_type,
-                    'phone_number': call.phone_number,
-                    'assigned_to': call.assigned_to.get_full_name() if call.assigned_to else 'Unassigned',
-                    'account': call.related_account.name if call.related_account else 'No account',
-                    'description': call.description[:100] + '...' if len(call.description) > 100 else call.description,
-                    'url': f'/tasks/calls/{call.id}/'
-                }
-            })
-    
-    # Get Meetings
-    if 'meetings' in event_types:
-        meeting_filters = user_filter & account_filter & (
-            Q(start_datetime__gte=start_datetime) & 
-            Q(start_datetime__lte=end_datetime)
-        )
-        
-        meetings = Meeting.objects.filter(meeting_filters).select_related('assigned_to', 'related_account')
-        
-        for meeting in meetings:
-            end_time = meeting.end_datetime or (meeting.start_datetime + timedelta(hours=1))
-            
-            events.append({
-                'id': f'meeting_{meeting.id}',
-                'title': f'🤝 {meeting.subject}',
-                'start': meeting.start_datetime.isoformat(),
-                'end': end_time.isoformat(),
-                'backgroundColor': get_meeting_color(meeting.status),
-                'borderColor': get_meeting_color(meeting.status),
-                'textColor': '#ffffff',
-                'extendedProps': {
-                    'type': 'meeting',
-                    'id': meeting.id,
-                    'status': meeting.status,
-                    'meeting_type': meeting.meeting_type,
-                    'location': meeting.location,
-                    'meeting_url': meeting.meeting_url,
-                    'assigned_to': meeting.assigned_to.get_full_name() if meeting.assigned_to else 'Unassigned',
-                    'account': meeting.related_account.name if meeting.related_account else 'No account',
-                    'agenda': meeting.agenda[:100] + '...' if meeting.agenda and len(meeting.agenda) > 100 else meeting.agenda,
-                    'url': f'/tasks/meetings/{meeting.id}/'
-                }
-            })
-    
-    # Get Custom Calendar Events
-    if 'events' in event_types or 'custom' in event_types:
-        from .models import CalendarEvent
-        
-        custom_event_filters = user_filter & (
-            Q(start_datetime__gte=start_datetime) & 
-            Q(start_datetime__lte=end_datetime)
-        )
-        
-        # For custom events, handle account filtering with generic foreign key
-        if account_id:
-            try:
-                account = Account.objects.get(id=account_id)
-                account_content_type = ContentType.objects.get_for_model(Account)
-                custom_event_filters &= Q(content_type=account_content_type, object_id=account.id)
-            except Account.DoesNotExist:
-                custom_event_filters &= Q(pk=None)  # No results
-        
-        custom_events = CalendarEvent.objects.filter(custom_event_filters).select_related('assigned_to', 'created_by')
-        
-        for custom_event in custom_events:
-            end_time = custom_event.end_datetime or (custom_event.start_datetime + timedelta(hours=1))
-            
-            events.append({
-                'id': f'custom_{custom_event.id}',
-                'title': f'📅 {custom_event.title}',
-                'start': custom_event.start_datetime.isoformat(),
-                'end': end_time.isoformat(),
-                'allDay': custom_event.is_all_day,
-                'backgroundColor': get_custom_event_color(custom_event.event_type),
-                'borderColor': get_custom_event_color(custom_event.event_type),
-                'textColor': '#ffffff',
-                'extendedProps': {
-                    'type': 'custom_event',
-                    'id': custom_event.id,
-                    'event_type': custom_event.event_type,
-                    'status': custom_event.status,
-                    'location': custom_event.location,
-                    'meeting_url': custom_event.meeting_url,
-                    'assigned_to': custom_event.assigned_to.get_full_name() if custom_event.assigned_to else 'Unassigned',
-                    'created_by': custom_event.created_by.get_full_name() if custom_event.created_by else 'Unknown',
-                    'description': custom_event.description[:100] + '...' if len(custom_event.description) > 100 else custom_event.description,
-                    'url': f'/calendar/events/{custom_event.id}/'
-                }
-            })
-
-    logger.info(f"Returning {len(events)} events")
-    return JsonResponse(events, safe=False)
-
-
-def get_task_color(priority):
-    """Get color based on task priority"""
-    colors = {
-        'high': '#dc3545',      # Red
-        'medium': '#fd7e14',    # Orange
-        'low': '#28a745',       # Green
-    }
-    return colors.get(priority, '#6c757d')  # Default gray
-
-
-def get_call_color(status):
-    """Get color based on call status"""
-    colors = {
-        'scheduled': '#0d6efd',     # Blue
-        'in_progress': '#fd7e14',   # Orange
-        'completed': '#28a745',     # Green
-        'cancelled': '#6c757d',     # Gray
-        'no_show': '#dc3545',       # Red
-    }
-    return colors.get(status, '#6c757d')
-
-
-def get_meeting_color(status):
-    """Get color based on meeting status"""
-    colors = {
-        'scheduled': '#0d6efd',     # Blue
-        'in_progress': '#fd7e14',   # Orange
-        'completed': '#28a745',     # Green
-        'cancelled': '#6c757d',     # Gray
-        'postponed': '#ffc107',     # Yellow
-    }
-    return colors.get(status, '#6c757d')
-
-
-def get_custom_event_color(event_type):
-    """Get color based on custom event type"""
-    colors = {
-        'appointment': '#6f42c1',    # Purple
-        'reminder': '#20c997',       # Teal
-        'holiday': '#e83e8c',        # Pink
-        'personal': '#17a2b8',       # Cyan
-        'company': '#007bff',        # Blue
-        'training': '#28a745',       # Green
-        'other': '#6c757d',          # Gray
-    }
-    return colors.get(event_type, '#6c757d')  # Default gray
+    response = HttpResponse(body, content_type='application/json')
+    if truncated:
+        response['X-Calendar-Truncated'] = 'true'
+    return response
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_counts_etag)
 def calendar_event_counts_api(request):
     """API endpoint for event counts by date range"""
-    from datetime import datetime, timedelta
-    from django.db.models import Count
-    import json
-    
-    # Default to current month if no dates provided
-    today = datetime.now().date()
-    start_date = request.GET.get('start', str(today.replace(day=1)))
-    end_date = request.GET.get('end', str(today.replace(day=28) + timedelta(days=4)))
-    
     try:
-        start_datetime = datetime.fromisoformat(start_date)
-        end_datetime = datetime.fromisoformat(end_date)
+        start_date, end_date, range_start, range_end = _counts_params(request)
     except ValueError:
         return JsonResponse({'error': 'Invalid date format'}, status=400)
     
     # Count events by type
     tasks_count = Task.objects.filter(
-        due_date__range=[start_datetime.date(), end_datetime.date()]
+        due_date__gte=range_start,
+        due_date__lt=range_end
     ).count()
     
     calls_count = Call.objects.filter(
-        scheduled_datetime__date__range=[start_datetime.date(), end_datetime.date()]
+        scheduled_datetime__gte=range_start,
+        scheduled_datetime__lt=range_end
     ).count()
     
     meetings_count = Meeting.objects.filter(
-        start_datetime__date__range=[start_datetime.date(), end_datetime.date()]
+        start_datetime__gte=range_start,
+        start_datetime__lt=range_end
     ).count()
     
     return JsonResponse({
@@ -461,3 +327,64 @@ def calendar_event_counts_api(request):
             'end': end_date
         }
     })
+
+
+def _freebusy_params(request):
+    """(start, end, user ids, account id) of a free/busy API request; defaults to the current user"""
+    start_datetime = _parse_window_bound(request.GET.get('start'))
+    end_datetime = _parse_window_bound(request.GET.get('end'))
+    user_ids = [int(user_id) for user_id in request.GET.getlist('user_ids[]')] or [request.user.id]
+    account_id = _optional_id(request.GET.get('account_id'))
+    return start_datetime, end_datetime, user_ids, account_id
+
+
+def _span(start, end):
+    return {'start': start.isoformat(), 'end': end.isoformat()}
+
+
+@login_required
+def calendar_freebusy_api(request):
+    """API endpoint for busy times and double bookings of users"""
+    try:
+        start_datetime, end_datetime, user_ids, account_id = _freebusy_params(request)
+        users = freebusy.free_busy(start_datetime, end_datetime, user_ids, account_id)
+    except freebusy.FreeBusyError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid date format or id'}, status=400)
+    
+    return JsonResponse({
+        'start': start_datetime.isoformat(),
+        'end': end_datetime.isoformat(),
+        'busy_users': [user_id for user_id, user in users.items() if user['busy']],
+        'users': {
+            str(user_id): {
+                'busy': [_span(start, end) for start, end in user['busy']],
+                'conflicts': [
+                    dict(_span(conflict.start, conflict.end), events=list(conflict.event_ids))
+                    for conflict in user['conflicts']
+                ],
+            }
+            for user_id, user in users.items()
+        },
+    })
+
+
+@login_required
+def calendar_free_slots_api(request):
+    """API endpoint for the next free slots shared by users within their business hours"""
+    try:
+        start_datetime, end_datetime, user_ids, account_id = _freebusy_params(request)
+        duration = timedelta(minutes=int(request.GET.get('duration', 30)))
+        count = int(request.GET.get('count', 5))
+        slots = freebusy.free_slots(start_datetime, end_datetime, user_ids, duration, count, account_id)
+    except freebusy.FreeBusyError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid date format or id'}, status=400)
+    
+    return JsonResponse({
+        'users': sorted(set(user_ids)),
+        'duration': int(duration.total_seconds() // 60),
+        'slots': [_span(start, end) for start, end in slots],
+    })
@@ -0,0 +1,16 @@
+"""
+Celery application for background jobs
+
+Start a worker with: celery -A crm_system worker -l info
+Start the scheduler with: celery -A crm_system beat -l info
+"""
+import os
+
+from celery import Celery
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'crm_system.settings')
+
+app = Celery('crm_system')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -164,12 +164,38 @@ CELERY_RESULT_BACKEND = "redis://localhost:6379"
 CELERY_ACCEPT_CONTENT = ["application/json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
+CELERY_BEAT_SCHEDULE = {
+    # Keeps the dashboard rollup within dashboard.services.rollups.MAX_ROLLUP_AGE
+    "refresh-daily-metrics": {
+        "task": "dashboard.tasks.refresh_daily_metrics",
+        "schedule": 600.0,
+    },
+    # Corrects KPI counter drift from bulk_create and QuerySet.update
+    "reconcile-counters": {
+        "task": "dashboard.tasks.reconcile_counters",
+        "schedule": 3600.0,
+    },
+}
 
 # CVR API Configuration for Lead Scoring
 # Get your API key from https://cvrapi.dk/
 CVR_API_KEY = "44243385"  # Using user CVR number for testing (replace with actual API key)
 # CVR_API_KEY = "your-cvr-api-key-here"
 
+# CVR lookup cache (seconds): in-process LRU backed by the CVRCacheEntry table
+CVR_CACHE = {
+    'TTL': 86400,
+    'NEGATIVE_TTL': 3600,
+    'STALE_WHILE_REVALIDATE': 7 * 86400,
+    'MEMORY_SIZE': 2048,
+}
+
+# Bulk CVR enrichment: concurrent lookups and API request rate
+CVR_ENRICHMENT = {
+    'MAX_WORKERS': 8,
+    'RATE_LIMIT_PER_SECOND': 5,
+}
+
 # Lead Scoring Configuration
 LEAD_SCORING = {
     'ICP_CRITERIA': {
@@ -189,3 +215,7 @@ LEAD_SCORING = {
         'MAX_SCORE': 12
     }
 }
+
+# Calendar window response cache: None caches only with a cache backend
+# shared by all workers (not LocMemCache); True or False forces it
+CALENDAR_WINDOW_CACHE = None
@@ -0,0 +1,293 @@
+"""
+Benchmark the dashboard, calendar and lead endpoints at several data scales
+
+Usage: python manage.py benchmark_endpoints --scales 1k 10k --output bench.json
+
+For each scale the synthetic dataset of ``seed_load_test_data`` is
+(re)generated with a fixed seed and anchor date, the daily rollups are
+rebuilt, and every endpoint is requested through the Django test client as
+a seeded sales user. Per endpoint the report records wall time, number of
+queries and time spent in queries over ``--repeat`` runs (after
+``--warmup`` untimed runs).
+
+The report is JSON with stable key order, so two runs (e.g. on two
+commits) can be compared with any JSON diff tool. Caches are cleared
+before every request unless ``--warm-cache`` is given, so the numbers
+reflect the work done by the view rather than cache hits.
+
+Seeded data is deleted at the end unless ``--keep-data`` is given;
+``--no-seed`` benchmarks whatever data is already in the database.
+"""
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError, OutputWrapper
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Account
+from calendar_app.models import CalendarEvent
+from contacts.models import Contact
+from dashboard.management.commands.seed_load_test_data import OWNER_PREFIX, clear_seed_data, parse_scale
+from dashboard.services.charts import CHART_BUILDERS
+from dashboard.services.counters import reconcile
+from leads.models import Lead, FunnelStageHistory
+from opportunities.models import Opportunity
+from tasks.models import Task, Call, Meeting
+
+
+DATASET_MODELS = {
+    'users': User,
+    'accounts': Account,
+    'contacts': Contact,
+    'leads': Lead,
+    'funnel_history': FunnelStageHistory,
+    'opportunities': Opportunity,
+    'tasks': Task,
+    'calls': Call,
+    'meetings': Meeting,
+    'calendar_events': CalendarEvent,
+}
+
+
+def endpoints(anchor, user, lead_id):
+    """(name, url, query params) for every benchmarked endpoint"""
+    # A month view as requested by the calendar page: the visible grid spans
+    # about six weeks around the month
+    month_start = timezone.make_aware(datetime.combine(anchor.replace(day=1), datetime.min.time()))
+    window = {
+        'start': (month_start - timedelta(days=7)).isoformat(),
+        'end': (month_start + timedelta(days=42)).isoformat(),
+    }
+
+    rows = [
+        ('dashboard', reverse('dashboard:home'), {}),
+        ('reports', reverse('dashboard:reports'), {}),
+        ('analytics', reverse('dashboard:analytics'), {}),
+    ]
+    rows += [
+        (f'analytics_data:{chart_type}', reverse('dashboard:analytics_data'), {'type': chart_type})
+        for chart_type in CHART_BUILDERS
+    ]
+    rows += [
+        ('analytics_batch', reverse('dashboard:analytics_batch'), {'types': ','.join(CHART_BUILDERS)}),
+        ('calendar_events_api', reverse('calendar_app:calendar_events_api'), window),
+        ('calendar_events_api:user', reverse('calendar_app:calendar_events_api'), {**window, 'user_id': user.pk}),
+        ('calendar_counts_api', reverse('calendar_app:calendar_counts_api'), window),
+        ('lead_list', reverse('leads:list'), {}),
+        ('lead_list:page_last', reverse('leads:list'), {'page': 'last'}),
+        ('api_score_stats', reverse('leads:api_score_stats'), {}),
+        ('api_icp_config', reverse('leads:api_icp_config'), {}),
+    ]
+    if lead_id:
+        rows.append(('api_score_lead', reverse('leads:api_score_lead', args=[lead_id]), {}))
+    return rows
+
+
+def git_revision():
+    """Current commit of the working tree, if it is a git checkout"""
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def summarize(values):
+    """min/median/mean/max of a list of milliseconds, rounded for diffing"""
+    return {
+        'min': round(min(values), 3),
+        'median': round(statistics.median(values), 3),
+        'mean': round(statistics.fmean(values), 3),
+        'max': round(max(values), 3),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark dashboard, calendar and lead endpoints at several data scales and write a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales',
+            nargs='+',
+            default=['1k'],
+            help='Dataset sizes in leads, e.g. 1k 10k 100k (default: 1k)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timed requests per endpoint (default: 5)'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=1,
+            help='Untimed requests per endpoint before measuring (default: 1)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the generated data (default: 42)'
+        )
+        parser.add_argument(
+            '--anchor-date',
+            default=None,
+            help='Anchor date (YYYY-MM-DD) of the generated data (default: today)'
+        )
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Write the JSON report to this file instead of stdout'
+        )
+        parser.add_argument(
+            '--warm-cache',
+            action='store_true',
+            help='Keep caches between requests to measure cached responses'
+        )
+        parser.add_argument(
+            '--no-seed',
+            action='store_true',
+            help='Benchmark the existing data once instead of seeding each scale'
+        )
+        parser.add_argument(
+            '--keep-data',
+            action='store_true',
+            help='Leave the last seeded dataset in the database'
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] <= 0 or options['warmup'] < 0:
+            raise CommandError('--repeat must be positive and --warmup non-negative')
+
+        scales = [None] if options['no_seed'] else [parse_scale(scale) for scale in options['scales']]
+        # Progress goes to stderr so the report can be piped from stdout
+        self.log = self.stdout if options['output'] else OutputWrapper(sys.stderr)
+
+        runs = []
+        try:
+            for scale in scales:
+                if scale is not None:
+                    self._seed(scale, options)
+                runs.append(self._run(scale, options))
+        finally:
+            if not options['no_seed'] and not options['keep_data']:
+                self.log.write('Deleting seeded data...')
+                clear_seed_data()
+                reconcile()
+                cache.clear()
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'git_revision': git_revision(),
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'seed': options['seed'],
+                'anchor_date': options['anchor_date'],
+                'repeat': options['repeat'],
+                'warmup': options['warmup'],
+                'warm_cache': options['warm_cache'],
+            },
+            'runs': runs,
+        }
+        output = json.dumps(report, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def _seed(self, scale, options):
+        self.log.write(f'\nSeeding {scale} leads...')
+        call_command(
+            'seed_load_test_data',
+            scale=str(scale),
+            seed=options['seed'],
+            anchor_date=options['anchor_date'],
+            clear=True,
+            stdout=self.log,
+        )
+        call_command('refresh_daily_metrics', full=True, stdout=self.log)
+
+    def _user(self):
+        """A seeded sales user, or the first superuser for --no-seed runs"""
+        user = (
+            User.objects.filter(username__startswith=OWNER_PREFIX).order_by('pk').first()
+            or User.objects.filter(is_superuser=True).order_by('pk').first()
+        )
+        if user is None:
+            raise CommandError('No user to benchmark as; seed data or create a superuser first')
+        return user
+
+    def _run(self, scale, options):
+        user = self._user()
+        client = Client()
+        client.force_login(user)
+
+        anchor = timezone.localdate()
+        if options['anchor_date']:
+            anchor = datetime.strptime(options['anchor_date'], '%Y-%m-%d').date()
+        lead_id = Lead.objects.order_by('pk').values_list('pk', flat=True).first()
+
+        dataset = {name: model.objects.count() for name, model in DATASET_MODELS.items()}
+        self.log.write(f"\nBenchmarking {dataset['leads']} leads as {user.username}...")
+
+        results = []
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name, url, params in endpoints(anchor, user, lead_id):
+                result = self._measure(client, url, params, options)
+                results.append({'name': name, 'url': url, 'params': params, **result})
+                self.log.write(
+                    f"  {name:<36} {result['status']:>3}  {result['queries']['max']:>4} queries  "
+                    f"{result['wall_ms']['median']:>9.2f} ms"
+                )
+
+        return {'scale': scale, 'dataset': dataset, 'endpoints': results}
+
+    def _measure(self, client, url, params, options):
+        """Wall time, query count and query time of ``repeat`` requests to ``url``"""
+        for _ in range(options['warmup']):
+            if not options['warm_cache']:
+                cache.clear()
+            client.get(url, params)
+
+        wall_ms, query_ms, query_counts = [], [], []
+        for _ in range(options['repeat']):
+            if not options['warm_cache']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                response = client.get(url, params)
+                wall_ms.append((time.perf_counter() - start) * 1000)
+            query_counts.append(len(ctx.captured_queries))
+            query_ms.append(sum(float(query['time']) for query in ctx.captured_queries) * 1000)
+
+        return {
+            'status': response.status_code,
+            'bytes': len(response.content),
+            'wall_ms': summarize(wall_ms),
+            'queries': {'min': min(query_counts), 'max': max(query_counts)},
+            'query_ms': summarize(query_ms),
+        }
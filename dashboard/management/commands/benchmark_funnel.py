@@ -0,0 +1,137 @@
+"""
+Benchmark the funnel aggregation engine against the per-stage query approach
+
+Usage: python manage.py benchmark_funnel --sizes 10000 100000 1000000
+"""
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum, Q
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from leads.models import Lead
+from dashboard.services.funnel import compute_funnel, FUNNEL_STAGES
+
+
+class _Rollback(Exception):
+    """Raised to discard the synthetic leads after a benchmark run"""
+    pass
+
+
+def per_stage_funnel(period_days=30):
+    """Original implementation: one count and one sum query per funnel stage"""
+    cutoff_date = timezone.now() - timedelta(days=period_days)
+    stage_counts = {}
+    stage_values = {}
+
+    for stage in FUNNEL_STAGES:
+        stage_counts[stage] = Lead.objects.filter(
+            Q(**{f'{stage}_at__gte': cutoff_date}) |
+            Q(**{f'{stage}_at__isnull': False}, funnel_stage=stage)
+        ).count()
+
+        value = Lead.objects.filter(
+            funnel_stage=stage,
+            estimated_value__isnull=False
+        ).aggregate(total=Sum('estimated_value'))['total'] or 0
+        stage_values[stage] = float(value)
+
+    return {'stage_counts': stage_counts, 'stage_values': stage_values}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark funnel conversion queries at different lead volumes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[10000, 100000, 1000000],
+            help='Number of synthetic leads to benchmark with (default: 10000 100000 1000000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Number of timed runs per implementation (default: 5)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='bulk_create batch size when seeding (default: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self._seed_leads(size, rng, options['batch_size'])
+                    self._report(size, options['repeat'])
+                    raise _Rollback()
+            except _Rollback:
+                pass
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (synthetic leads rolled back)'))
+
+    def _seed_leads(self, size, rng, batch_size):
+        """Bulk insert synthetic leads spread across the funnel"""
+        self.stdout.write(f'\nSeeding {size} synthetic leads...')
+        now = timezone.now()
+        weights = [0.4, 0.25, 0.15, 0.1, 0.1]
+        batch = []
+
+        for i in range(size):
+            stage = rng.choices(FUNNEL_STAGES, weights=weights)[0]
+            timestamps = {}
+            for stage_name in FUNNEL_STAGES[:FUNNEL_STAGES.index(stage) + 1]:
+                timestamps[f'{stage_name}_at'] = now - timedelta(days=rng.randint(0, 120))
+
+            batch.append(Lead(
+                first_name='Bench',
+                last_name=f'Lead{i}',
+                company=f'Bench Company {i}',
+                email=f'bench{i}@example.com',
+                funnel_stage=stage,
+                estimated_value=Decimal(rng.randint(5000, 250000)) if rng.random() < 0.5 else None,
+                **timestamps
+            ))
+            if len(batch) >= batch_size:
+                Lead.objects.bulk_create(batch)
+                batch = []
+
+        if batch:
+            Lead.objects.bulk_create(batch)
+
+    def _measure(self, func, repeat):
+        """Return (query count, best wall time in ms) for ``func``"""
+        timings = []
+        query_count = 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - start) * 1000)
+            query_count = len(ctx.captured_queries)
+        return query_count, min(timings)
+
+    def _report(self, size, repeat):
+        total = Lead.objects.count()
+        rows = [
+            ('per-stage queries', lambda: per_stage_funnel(30)),
+            ('single-pass (leads)', lambda: compute_funnel(30)),
+            ('single-pass (history)', lambda: compute_funnel(30, source='history')),
+        ]
+
+        self.stdout.write(f'Results for {size} synthetic leads ({total} total):')
+        for label, func in rows:
+            queries, best_ms = self._measure(func, repeat)
+            self.stdout.write(f'  {label:<24} {queries:>3} queries  {best_ms:>10.2f} ms')
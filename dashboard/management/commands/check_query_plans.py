@@ -0,0 +1,60 @@
+"""
+Management command to verify that hot dashboard, calendar and scoring
+queries are served by an index rather than a full table scan.
+
+Usage: python manage.py check_query_plans [--show-plans]
+
+Runs the code paths catalogued in dashboard.services.query_plans, EXPLAINs
+every query they execute and fails with a non-zero exit status when any
+plan contains a full scan. On PostgreSQL sequential scans are disabled for
+the check so the result reflects whether an index is usable at all, not
+what the planner prefers for a small development table. The same check
+runs in dashboard.tests.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from dashboard.services.query_plans import check_plans
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot dashboard, calendar and scoring queries and fail on full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--show-plans',
+            action='store_true',
+            help='Print the full query plan for every query'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'Query plan checks are not supported on {connection.vendor}')
+
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            results = check_plans()
+            # Nothing the checked code paths wrote is kept
+            transaction.set_rollback(True)
+
+        failures = set()
+        for result in results:
+            if result.full_scans:
+                failures.add((result.area, result.label))
+                self.stdout.write(self.style.ERROR(
+                    f'[{result.area}] {result.label}: full scan of {", ".join(result.full_scans)}'
+                ))
+            else:
+                self.stdout.write(f'[{result.area}] {result.label}: ok')
+
+            if options['show_plans'] or result.full_scans:
+                self.stdout.write(f'    {result.sql}')
+                for line in result.plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+        if failures:
+            raise CommandError(f'{len(failures)} code paths use a full table scan')
+
+        self.stdout.write(self.style.SUCCESS('All hot queries are index-backed'))
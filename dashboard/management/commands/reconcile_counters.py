@@ -0,0 +1,26 @@
+"""
+Management command to recount the dashboard KPI counters
+Usage: python manage.py reconcile_counters
+"""
+from django.core.management.base import BaseCommand
+
+from dashboard.services import counters
+
+
+class Command(BaseCommand):
+    help = 'Recount the incremental KPI counters from their source tables'
+
+    def handle(self, *args, **options):
+        results = counters.reconcile()
+
+        drifted = 0
+        for name, (stored, actual) in results.items():
+            if stored != actual:
+                drifted += 1
+                self.stdout.write(self.style.WARNING(f'{name}: {stored} -> {actual}'))
+            else:
+                self.stdout.write(f'{name}: {actual}')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Reconciled {len(results)} counters ({drifted} corrected)')
+        )
@@ -0,0 +1,43 @@
+"""
+Management command to maintain the DailyMetric rollup table
+Usage:
+    python manage.py refresh_daily_metrics          # refresh changed days only
+    python manage.py refresh_daily_metrics --full   # rebuild the whole rollup
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard.services import rollups
+
+
+class Command(BaseCommand):
+    help = 'Refresh the per-day dashboard metrics rollup'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Rebuild the rollup from scratch (backfill all days)'
+        )
+        parser.add_argument(
+            '--lookback-days',
+            type=int,
+            default=1,
+            help='Trailing days to always recompute in incremental mode (default: 1)'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        if options['full']:
+            self.stdout.write('Backfilling daily metrics...')
+            written = rollups.backfill()
+        else:
+            self.stdout.write('Refreshing changed days...')
+            written = rollups.refresh_incremental(options['lookback_days'])
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(f'Wrote {written} daily metric rows in {elapsed:.2f}s')
+        )
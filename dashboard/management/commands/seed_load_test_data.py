@@ -0,0 +1,465 @@
+"""
+Generate a production-size synthetic dataset for performance work
+
+Usage: python manage.py seed_load_test_data --scale 100k --seed 42
+
+``--scale`` is the number of leads (1k, 100k, 1M, ...). Everything else is
+generated in proportion:
+
+- owners (sales users): 1 per 20k leads, at least 3 and at most 50
+- accounts: 1 per 10 leads, with 3 contacts each
+- opportunities: 1 per 20 leads, on random accounts
+- calls, meetings and tasks: 0.5, 0.2 and 0.3 per lead, spread from one
+  year back to 90 days ahead of the anchor date so calendar windows are busy
+- funnel history: one row per stage each lead has passed
+
+Rows are written with ``bulk_create`` in chunks, each chunk in its own
+transaction, and only account and contact ids are kept in memory. With the
+same ``--seed`` and ``--anchor-date`` the generated data is identical.
+
+Seeded rows use the SEED_DOMAIN in emails and websites and ``seed_owner_``
+usernames; ``--clear`` removes them before generating. The dashboard KPI
+counters are reconciled and the score statistics and calendar caches
+invalidated at the end because ``bulk_create`` bypasses the signals that
+maintain them; run ``refresh_daily_metrics`` to rebuild the daily rollups.
+"""
+import random
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import Account
+from calendar_app.services import window_cache
+from contacts.models import Contact
+from dashboard.services.counters import reconcile
+from leads.models import Lead, FunnelStageHistory
+from leads.services import score_stats
+from opportunities.models import Opportunity
+from tasks.models import Task, Call, Meeting
+
+
+SEED_DOMAIN = 'loadtest.example'
+OWNER_PREFIX = 'seed_owner_'
+
+FIRST_NAMES = [
+    'Anna', 'Lars', 'Mette', 'Søren', 'Camilla', 'Jens', 'Louise', 'Mikkel', 'Sofie', 'Rasmus',
+    'Emma', 'Frederik', 'Ida', 'Christian', 'Julie', 'Martin', 'Sarah', 'Thomas', 'Maria', 'Peter',
+]
+LAST_NAMES = [
+    'Jensen', 'Nielsen', 'Hansen', 'Pedersen', 'Andersen', 'Christensen', 'Larsen', 'Sørensen',
+    'Rasmussen', 'Jørgensen', 'Petersen', 'Madsen', 'Kristensen', 'Olsen', 'Thomsen', 'Poulsen',
+]
+COMPANY_WORDS = ['Nordic', 'Dansk', 'Blue', 'Green', 'Smart', 'Nova', 'Viking', 'Polar', 'Urban', 'Coastal']
+COMPANY_SUFFIXES = ['ApS', 'A/S', 'Group', 'Solutions', 'Retail', 'Software', 'Logistics', 'Foods']
+TITLES = [
+    'Sales Manager', 'CEO', 'CTO', 'Head of Marketing', 'Developer', 'Director of Operations',
+    'Consultant', 'VP Sales', 'Accountant', 'Project Coordinator', 'Senior Director', 'Intern',
+]
+INDUSTRIES = ['Software', 'Retail', 'FMCG', 'SaaS', 'Construction', 'Logistics', 'Healthcare', 'Finance']
+CITIES = ['Copenhagen', 'København K', 'Aarhus C', 'Odense', 'Aalborg', 'Esbjerg', 'Vejle', 'Randers']
+EMPLOYEE_COUNTS = [None, 5, 25, 80, 150, 250, 600, 2000]
+
+# Share of leads whose current funnel stage is each stage
+FUNNEL_WEIGHTS = {
+    'form_submitted': 45,
+    'meeting_booked': 20,
+    'meeting_held': 14,
+    'pilot_signed': 8,
+    'deal_closed': 7,
+    'churned': 6,
+}
+OPEN_STAGES = ['form_submitted', 'meeting_booked', 'meeting_held', 'pilot_signed', 'deal_closed']
+STAGE_TIMESTAMPS = {
+    'form_submitted': 'form_submitted_at',
+    'meeting_booked': 'meeting_booked_at',
+    'meeting_held': 'meeting_held_at',
+    'pilot_signed': 'pilot_signed_at',
+    'deal_closed': 'deal_closed_at',
+    'churned': 'churned_at',
+}
+
+HISTORY_DAYS = 365
+FUTURE_DAYS = 90
+
+
+def parse_scale(value: str) -> int:
+    """'1k' -> 1000, '2.5M' -> 2500000, '500' -> 500"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([kKmM]?)\s*', value)
+    if not match:
+        raise CommandError(f"Invalid --scale '{value}', expected e.g. 1000, 100k or 1M")
+    number, suffix = match.groups()
+    return int(float(number) * {'': 1, 'k': 1_000, 'm': 1_000_000}[suffix.lower()])
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the given created_at/updated_at instead of stamping now()"""
+    patched = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                patched.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in patched:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def clear_seed_data():
+    """Delete everything previously generated by this command"""
+    with transaction.atomic():
+        # Tasks, calls and meetings cascade from their owners, contacts and
+        # opportunities from their accounts
+        Lead.objects.filter(email__endswith=f'@{SEED_DOMAIN}').delete()
+        Account.objects.filter(website__endswith=SEED_DOMAIN).delete()
+        User.objects.filter(username__startswith=OWNER_PREFIX).delete()
+
+
+class Command(BaseCommand):
+    help = 'Generate a scalable, reproducible synthetic CRM dataset for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            default='1k',
+            help='Number of leads, e.g. 1000, 100k or 1M; related objects scale with it (default: 1k)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed (default: 42)'
+        )
+        parser.add_argument(
+            '--anchor-date',
+            default=None,
+            help='Date (YYYY-MM-DD) the generated history ends at (default: today)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows per bulk_create chunk (default: 5000)'
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete previously seeded data first'
+        )
+
+    def handle(self, *args, **options):
+        leads_total = parse_scale(options['scale'])
+        self.batch_size = options['batch_size']
+        if leads_total <= 0 or self.batch_size <= 0:
+            raise CommandError('--scale and --batch-size must be positive')
+
+        self.rng = random.Random(options['seed'])
+        self.anchor = self._anchor(options['anchor_date'])
+        self.lead_content_type = ContentType.objects.get_for_model(Lead)
+
+        if options['clear']:
+            self._clear()
+
+        counts = {
+            'owners': min(50, max(3, leads_total // 20_000)),
+            'accounts': max(1, leads_total // 10),
+            'opportunities': max(1, leads_total // 20),
+        }
+        self.stdout.write(
+            f"Seeding {leads_total} leads (seed {options['seed']}, anchor {self.anchor.date()}) "
+            f"in chunks of {self.batch_size}"
+        )
+
+        started = time.perf_counter()
+        with explicit_timestamps(Account, Contact, Lead, Opportunity, Task, Call, Meeting, FunnelStageHistory):
+            self.owner_ids = self._create_owners(counts['owners'])
+            self.account_ids, self.contact_ids = self._create_accounts(counts['accounts'])
+            self._create_opportunities(counts['opportunities'])
+            totals = self._create_leads(leads_total)
+
+        reconcile()
+        score_stats.invalidate()
+        window_cache.invalidate_all()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['owners']} owners, {len(self.account_ids)} accounts, "
+            f"{len(self.contact_ids)} contacts, {counts['opportunities']} opportunities, "
+            f"{leads_total} leads, {totals['history']} funnel history rows, {totals['calls']} calls, "
+            f"{totals['meetings']} meetings and {totals['tasks']} tasks in {elapsed:.1f}s"
+        ))
+        self.stdout.write("Run 'python manage.py refresh_daily_metrics' to rebuild the daily rollups")
+
+    # Helpers
+
+    def _anchor(self, value):
+        if value:
+            try:
+                date = datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--anchor-date must be YYYY-MM-DD')
+        else:
+            date = timezone.localdate()
+        return timezone.make_aware(datetime.combine(date, datetime.min.time()))
+
+    def _past(self, days=HISTORY_DAYS):
+        """Random moment in the ``days`` before the anchor"""
+        return self.anchor - timedelta(seconds=self.rng.randrange(days * 86400))
+
+    def _around(self):
+        """Random moment between HISTORY_DAYS before and FUTURE_DAYS after the anchor"""
+        offset = self.rng.randrange(-HISTORY_DAYS * 86400, FUTURE_DAYS * 86400)
+        # Snap to the quarter hour within working hours, like real appointments
+        moment = self.anchor + timedelta(seconds=offset)
+        return moment.replace(hour=8 + moment.hour % 9, minute=moment.minute // 15 * 15, second=0, microsecond=0)
+
+    def _phone(self):
+        return f'+45 {self.rng.randrange(20000000, 99999999)}'
+
+    def _company(self, n):
+        return f'{self.rng.choice(COMPANY_WORDS)} {self.rng.choice(COMPANY_SUFFIXES)} {n}'
+
+    def _chunks(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(self.batch_size, total - start)
+
+    def _bulk_create(self, model, objects):
+        """Insert one chunk and return the created rows' ids"""
+        with transaction.atomic():
+            created = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        return [obj.pk for obj in created]
+
+    # Generators
+
+    def _clear(self):
+        self.stdout.write('Deleting previously seeded data...')
+        clear_seed_data()
+
+    def _create_owners(self, count):
+        owners = []
+        for i in range(count):
+            owner = User(
+                username=f'{OWNER_PREFIX}{i}',
+                email=f'owner{i}@{SEED_DOMAIN}',
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+            )
+            owner.set_unusable_password()
+            owners.append(owner)
+        User.objects.bulk_create(owners, ignore_conflicts=True)
+        return list(User.objects.filter(username__startswith=OWNER_PREFIX).order_by('pk').values_list('pk', flat=True))
+
+    def _create_accounts(self, total):
+        account_ids, contact_ids = [], []
+        industries = [key for key, _ in Account.INDUSTRIES]
+
+        for start, size in self._chunks(total):
+            accounts = []
+            for n in range(start, start + size):
+                created = self._past()
+                accounts.append(Account(
+                    name=self._company(n),
+                    account_type=self.rng.choice(['customer', 'customer', 'prospect', 'partner']),
+                    industry=self.rng.choice(industries),
+                    website=f'https://account{n}.{SEED_DOMAIN}',
+                    phone=self._phone(),
+                    email=f'info{n}@{SEED_DOMAIN}',
+                    billing_city=self.rng.choice(CITIES),
+                    billing_country='Denmark',
+                    annual_revenue=Decimal(self.rng.randrange(100, 50_000)) * 1000,
+                    employees=self.rng.choice(EMPLOYEE_COUNTS),
+                    assigned_to_id=self.rng.choice(self.owner_ids),
+                    created_at=created,
+                    updated_at=created,
+                ))
+            new_ids = self._bulk_create(Account, accounts)
+            account_ids.extend(new_ids)
+
+            contacts = []
+            for account_id in new_ids:
+                for _ in range(3):
+                    created = self._past()
+                    first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+                    contacts.append(Contact(
+                        first_name=first,
+                        last_name=last,
+                        title=self.rng.choice(TITLES),
+                        email=f'{first.lower()}.{last.lower()}.{account_id}.{len(contacts)}@{SEED_DOMAIN}',
+                        phone=self._phone(),
+                        mailing_city=self.rng.choice(CITIES),
+                        account_id=account_id,
+                        assigned_to_id=self.rng.choice(self.owner_ids),
+                        created_at=created,
+                        updated_at=created,
+                    ))
+            contact_ids.extend(self._bulk_create(Contact, contacts))
+
+        self.stdout.write(f'  {len(account_ids)} accounts, {len(contact_ids)} contacts')
+        return account_ids, contact_ids
+
+    def _create_opportunities(self, total):
+        stages = [key for key, _ in Opportunity.SALES_STAGE]
+        sources = [key for key, _ in Opportunity.LEAD_SOURCE]
+
+        for start, size in self._chunks(total):
+            opportunities = []
+            for n in range(start, start + size):
+                created = self._past()
+                stage = self.rng.choice(stages)
+                opportunities.append(Opportunity(
+                    name=f'Opportunity {n}',
+                    account_id=self.rng.choice(self.account_ids),
+                    contact_id=self.rng.choice(self.contact_ids),
+                    amount=Decimal(self.rng.randrange(5, 500)) * 1000,
+                    sales_stage=stage,
+                    probability={'closed_won': 100, 'closed_lost': 0}.get(stage, self.rng.randrange(10, 90, 10)),
+                    expected_close_date=(created + timedelta(days=self.rng.randrange(14, 180))).date(),
+                    opportunity_type=self.rng.choice(['existing_business', 'new_business']),
+                    lead_source=self.rng.choice(sources),
+                    assigned_to_id=self.rng.choice(self.owner_ids),
+                    created_at=created,
+                    updated_at=created,
+                ))
+            self._bulk_create(Opportunity, opportunities)
+
+        self.stdout.write(f'  {total} opportunities')
+
+    def _lead(self, n):
+        created = self._past()
+        stage = self.rng.choices(list(FUNNEL_WEIGHTS), weights=list(FUNNEL_WEIGHTS.values()))[0]
+        first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+        lead = Lead(
+            first_name=first,
+            last_name=last,
+            title=self.rng.choice(TITLES),
+            company=self._company(n),
+            email=f'lead{n}@{SEED_DOMAIN}',
+            phone=self._phone(),
+            city=self.rng.choice(CITIES),
+            country='Denmark',
+            lead_source=self.rng.choice(Lead.LEAD_SOURCE)[0],
+            status=self.rng.choice(['new', 'assigned', 'in_process']),
+            industry=self.rng.choice(INDUSTRIES),
+            employees=self.rng.choice(EMPLOYEE_COUNTS),
+            funnel_stage=stage,
+            assigned_to_id=self.rng.choice(self.owner_ids),
+            created_at=created,
+        )
+
+        # Walk the lead through the funnel up to its current stage
+        passed = OPEN_STAGES[:OPEN_STAGES.index(stage) + 1] if stage != 'churned' else \
+            OPEN_STAGES[:self.rng.randrange(1, 4)] + ['churned']
+        moment = created
+        transitions = []
+        for previous, current in zip([None] + passed, passed):
+            if previous is not None:
+                moment = min(moment + timedelta(hours=self.rng.randrange(1, 24 * 30)), self.anchor)
+            setattr(lead, STAGE_TIMESTAMPS[current], moment)
+            transitions.append((previous, current, moment))
+
+        lead.funnel_stage_updated_at = lead.updated_at = moment
+        return lead, transitions
+
+    def _create_leads(self, total):
+        totals = {'history': 0, 'calls': 0, 'meetings': 0, 'tasks': 0}
+
+        for start, size in self._chunks(total):
+            leads, transitions = [], []
+            for n in range(start, start + size):
+                lead, lead_transitions = self._lead(n)
+                leads.append(lead)
+                transitions.append(lead_transitions)
+            lead_ids = self._bulk_create(Lead, leads)
+
+            history = [
+                FunnelStageHistory(
+                    lead_id=lead_id, from_stage=previous, to_stage=current, changed_at=moment,
+                    changed_by_id=self.rng.choice(self.owner_ids)
+                )
+                for lead_id, lead_transitions in zip(lead_ids, transitions)
+                for previous, current, moment in lead_transitions
+            ]
+            totals['history'] += len(self._bulk_create(FunnelStageHistory, history))
+            totals['calls'] += len(self._bulk_create(Call, self._calls(lead_ids, 0.5)))
+            totals['meetings'] += len(self._bulk_create(Meeting, self._meetings(lead_ids, 0.2)))
+            totals['tasks'] += len(self._bulk_create(Task, self._tasks(lead_ids, 0.3)))
+
+            self.stdout.write(f'  {start + size}/{total} leads')
+
+        return totals
+
+    def _sample(self, ids, ratio):
+        """Pick round(len(ids) * ratio) ids, with repeats, for related activities"""
+        return [self.rng.choice(ids) for _ in range(round(len(ids) * ratio))]
+
+    def _calls(self, lead_ids, ratio):
+        calls = []
+        for lead_id in self._sample(lead_ids, ratio):
+            scheduled = self._around()
+            done = scheduled < self.anchor
+            calls.append(Call(
+                subject=f'Call with lead {lead_id}',
+                call_type=self.rng.choice(['outbound', 'outbound', 'inbound']),
+                status=self.rng.choice(['completed', 'no_answer', 'left_message']) if done else 'planned',
+                call_result=self.rng.choice(['interested', 'callback_requested', 'voicemail']) if done else '',
+                phone_number=self._phone(),
+                duration_minutes=self.rng.randrange(5, 45),
+                scheduled_datetime=scheduled,
+                related_lead_id=lead_id,
+                related_account_id=self.rng.choice(self.account_ids),
+                assigned_to_id=self.rng.choice(self.owner_ids),
+                created_at=min(scheduled, self.anchor),
+                updated_at=min(scheduled, self.anchor),
+            ))
+        return calls
+
+    def _meetings(self, lead_ids, ratio):
+        meetings = []
+        for lead_id in self._sample(lead_ids, ratio):
+            start = self._around()
+            duration = self.rng.choice([30, 45, 60, 90])
+            meetings.append(Meeting(
+                subject=f'Meeting with lead {lead_id}',
+                meeting_type=self.rng.choice(['sales_meeting', 'demo', 'follow_up', 'negotiation']),
+                status='completed' if start < self.anchor else 'planned',
+                location=self.rng.choice(['Online', 'Customer office', 'Our office']),
+                start_datetime=start,
+                end_datetime=start + timedelta(minutes=duration),
+                duration_minutes=duration,
+                primary_contact_id=self.rng.choice(self.contact_ids),
+                related_lead_id=lead_id,
+                related_account_id=self.rng.choice(self.account_ids),
+                assigned_to_id=self.rng.choice(self.owner_ids),
+                created_at=min(start, self.anchor),
+                updated_at=min(start, self.anchor),
+            ))
+        return meetings
+
+    def _tasks(self, lead_ids, ratio):
+        tasks = []
+        for lead_id in self._sample(lead_ids, ratio):
+            due = self._around()
+            tasks.append(Task(
+                subject=f'Follow up lead {lead_id}',
+                status=self.rng.choice(['completed', 'completed', 'deferred']) if due < self.anchor
+                else self.rng.choice(['not_started', 'in_progress']),
+                priority=self.rng.choice(['low', 'medium', 'medium', 'high']),
+                task_type=self.rng.choice(['call', 'email', 'task', 'demo']),
+                due_date=due,
+                content_type=self.lead_content_type,
+                object_id=lead_id,
+                assigned_to_id=self.rng.choice(self.owner_ids),
+                created_at=min(due, self.anchor),
+                updated_at=min(due, self.anchor),
+            ))
+        return tasks
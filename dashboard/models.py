@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class UserProfile(models.Model):
@@ -72,3 +73,40 @@ class ActivityLog(models.Model):
     
     def __str__(self):
         return f"{self.user} {self.action} {self.object_type} {self.object_name}"
+
+
+class DailyMetric(models.Model):
+    """Materialized per-day, per-user rollup of dashboard metrics"""
+    date = models.DateField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='daily_metrics')
+    
+    leads_created = models.PositiveIntegerField(default=0)
+    funnel_transitions = models.PositiveIntegerField(default=0)
+    deals_won = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    calls = models.PositiveIntegerField(default=0)
+    meetings = models.PositiveIntegerField(default=0)
+    tasks = models.PositiveIntegerField(default=0)
+    
+    refreshed_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-date']
+        unique_together = ['date', 'user']
+    
+    def __str__(self):
+        return f"{self.date} - {self.user or 'Unassigned'}"
+
+
+class MetricCounter(models.Model):
+    """Incrementally maintained row count used for O(1) KPI tiles"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return f"{self.name}: {self.value}"
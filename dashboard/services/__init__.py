@@ -0,0 +1 @@
+# Dashboard analytics services
@@ -0,0 +1,228 @@
+"""
+Chart payload builders for the analytics page
+
+Each chart type served by ``dashboard:analytics_data`` has a builder here.
+Builders receive a ChartContext that memoizes querysets shared between
+charts, so a batch request computes e.g. the Opportunity-by-stage grouping
+once for both ``sales_pipeline`` and ``deals_by_stage``.
+"""
+from datetime import datetime, time, timedelta
+from typing import Dict, Any, Callable, Iterable, Mapping, Optional
+
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from leads.models import Lead
+from opportunities.models import Opportunity
+from tasks.models import Task, Call, Meeting
+
+from . import rollups
+from .funnel import compute_funnel
+from .timeseries import revenue_series, activity_series
+
+
+CLOSED_STAGES = ['closed_won', 'closed_lost']
+
+
+class ChartContext:
+    """Per-request memo of intermediate results shared between charts"""
+
+    def __init__(self):
+        self._cache = {}
+
+    def memoize(self, key, factory: Callable[[], Any]) -> Any:
+        """Return the cached value for ``key``, computing it on first use"""
+        if key not in self._cache:
+            self._cache[key] = factory()
+        return self._cache[key]
+
+    def opportunities_by_stage(self):
+        """Count and total amount per sales stage (all stages)"""
+        return self.memoize('opportunities_by_stage', lambda: list(
+            Opportunity.objects.values('sales_stage').annotate(
+                count=Count('id'),
+                total_amount=Sum('amount')
+            ).order_by()
+        ))
+
+
+def _period(params: Mapping[str, Any], default: int = 30) -> int:
+    """Parse the ``period`` parameter (days)"""
+    return int(params.get('period', default))
+
+
+def sales_pipeline_chart(ctx: ChartContext, params: Mapping[str, Any]):
+    return [
+        row for row in ctx.opportunities_by_stage()
+        if row['sales_stage'] not in CLOSED_STAGES
+    ]
+
+
+def monthly_revenue_chart(ctx: ChartContext, params: Mapping[str, Any]):
+    series = rollups.monthly_revenue(12) if rollups.rollup_available() else revenue_series('month', 12)
+    return [
+        {'month': point['start'].strftime('%b %Y'), 'revenue': point['revenue']}
+        for point in series
+    ]
+
+
+def activity_breakdown_chart(ctx: ChartContext, params: Mapping[str, Any]):
+    start_of_month = timezone.now().replace(day=1)
+    return {
+        'calls': Call.objects.filter(created_at__gte=start_of_month).count(),
+        'meetings': Meeting.objects.filter(created_at__gte=start_of_month).count(),
+        'tasks': Task.objects.filter(created_at__gte=start_of_month).count(),
+    }
+
+
+def lead_sources_chart(ctx: ChartContext, params: Mapping[str, Any]):
+    return list(Lead.objects.values('lead_source').annotate(
+        count=Count('id')
+    ).order_by('-count'))
+
+
+def deals_by_stage_chart(ctx: ChartContext, params: Mapping[str, Any]):
+    return [
+        {'sales_stage': row['sales_stage'], 'count': row['count']}
+        for row in ctx.opportunities_by_stage()
+    ]
+
+
+def call_outcomes_chart(ctx: ChartContext, params: Mapping[str, Any]):
+    return list(Call.objects.exclude(call_result='').values('call_result').annotate(
+        count=Count('id')
+    ).order_by('-count'))
+
+
+def meeting_types_chart(ctx: ChartContext, params: Mapping[str, Any]):
+    return list(Meeting.objects.values('meeting_type').annotate(
+        count=Count('id')
+    ).order_by())
+
+
+def weekly_activities_chart(ctx: ChartContext, params: Mapping[str, Any]):
+    return [
+        {
+            'day': point['start'].strftime('%a'),
+            'calls': point['calls'],
+            'meetings': point['meetings'],
+            'tasks': point['tasks']
+        }
+        for point in activity_series('day', 7)
+    ]
+
+
+def funnel_conversion_chart(ctx: ChartContext, params: Mapping[str, Any]):
+    period_days = _period(params)
+    source = 'history' if params.get('source') == 'history' else 'leads'
+    funnel_data = ctx.memoize(
+        ('funnel', period_days, source),
+        lambda: compute_funnel(period_days, source=source)
+    )
+
+    return {
+        'stages': [stage.replace('_', ' ').title() for stage in funnel_data['funnel_stages']],
+        'counts': [funnel_data['stage_counts'][stage] for stage in funnel_data['funnel_stages']],
+        'values': [funnel_data['stage_values'][stage] for stage in funnel_data['funnel_stages']],
+        'conversions': funnel_data['conversions']
+    }
+
+
+def activity_heatmap_chart(ctx: ChartContext, params: Mapping[str, Any]):
+    """Upcoming scheduled activities per day for the next N days"""
+    period_days = _period(params)
+
+    start_date = timezone.now().date()
+    end_date = start_date + timedelta(days=period_days)
+
+    # Compare raw datetimes (not __date) so the scheduling indexes are usable
+    range_start = timezone.make_aware(datetime.combine(start_date, time.min))
+    range_end = range_start + timedelta(days=period_days + 1)
+
+    daily_activities = {}
+    sources = [
+        (Task, 'due_date'),
+        (Call, 'scheduled_datetime'),
+        (Meeting, 'start_datetime'),
+    ]
+    for model, field in sources:
+        rows = model.objects.filter(
+            **{f'{field}__gte': range_start, f'{field}__lt': range_end}
+        ).values(f'{field}__date').annotate(count=Count('id')).order_by()
+
+        for row in rows:
+            date_key = row[f'{field}__date']
+            daily_activities[date_key] = daily_activities.get(date_key, 0) + row['count']
+
+    daily_data = []
+    max_value = 0
+
+    for i in range(period_days):
+        current_date = start_date + timedelta(days=i)
+        activity_count = daily_activities.get(current_date, 0)
+        max_value = max(max_value, activity_count)
+
+        daily_data.append({
+            'date': current_date.isoformat(),
+            'count': activity_count,
+            'day_name': current_date.strftime('%a'),
+            'day_number': current_date.day,
+            'month_name': current_date.strftime('%b'),
+            'is_weekend': current_date.weekday() >= 5
+        })
+
+    return {
+        'daily_data': daily_data,
+        'max_value': max_value if max_value > 0 else 1,
+        'period_days': period_days,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat()
+    }
+
+
+CHART_BUILDERS: Dict[str, Callable[[ChartContext, Mapping[str, Any]], Any]] = {
+    'sales_pipeline': sales_pipeline_chart,
+    'monthly_revenue': monthly_revenue_chart,
+    'activity_breakdown': activity_breakdown_chart,
+    'lead_sources': lead_sources_chart,
+    'deals_by_stage': deals_by_stage_chart,
+    'call_outcomes': call_outcomes_chart,
+    'meeting_types': meeting_types_chart,
+    'weekly_activities': weekly_activities_chart,
+    'funnel_conversion': funnel_conversion_chart,
+    'activity_heatmap': activity_heatmap_chart,
+}
+
+
+def build_chart(chart_type: str, params: Mapping[str, Any],
+                ctx: Optional[ChartContext] = None) -> Any:
+    """Build the payload for one chart type (empty list for unknown types)"""
+    builder = CHART_BUILDERS.get(chart_type)
+    if builder is None:
+        return []
+    return builder(ctx or ChartContext(), params)
+
+
+def build_charts(chart_types: Iterable[str], params: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Build several chart payloads sharing one ChartContext
+
+    ``params`` holds parameters common to all charts. A parameter prefixed
+    with the chart type (e.g. ``funnel_conversion.period``) overrides the
+    common value for that chart only.
+    """
+    ctx = ChartContext()
+    payloads = {}
+
+    for chart_type in chart_types:
+        chart_params = {
+            key: value for key, value in params.items() if '.' not in key
+        }
+        prefix = f'{chart_type}.'
+        for key, value in params.items():
+            if key.startswith(prefix):
+                chart_params[key[len(prefix):]] = value
+
+        payloads[chart_type] = build_chart(chart_type, chart_params, ctx)
+
+    return payloads
@@ -0,0 +1,131 @@
+"""
+Incremental KPI counters
+
+Row counts for the dashboard KPI tiles are kept in MetricCounter rows and
+updated from model signals (see dashboard.signals), so reading a tile is a
+single indexed lookup regardless of table size. Bulk operations that bypass
+signals (bulk_create, QuerySet.update) are corrected by ``reconcile()``,
+exposed as the ``reconcile_counters`` management command and run hourly
+by Celery beat (dashboard.tasks.reconcile_counters).
+"""
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from accounts.models import Account
+from contacts.models import Contact
+from leads.models import Lead
+from opportunities.models import Opportunity
+from tasks.models import Task, Call, Meeting
+
+from ..models import MetricCounter
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CounterSpec:
+    """A counter over ``model`` rows, optionally restricted by one field"""
+    name: str
+    model: type
+    field: Optional[str] = None
+    values: Tuple[str, ...] = ()
+    exclude: bool = False
+
+    def matches(self, value) -> bool:
+        """Whether a row with ``field == value`` belongs to the counter"""
+        if self.field is None:
+            return True
+        return (value in self.values) != self.exclude
+
+    def as_q(self) -> Q:
+        """Equivalent queryset filter, used when reconciling"""
+        if self.field is None:
+            return Q()
+        q = Q(**{f'{self.field}__in': self.values})
+        return ~q if self.exclude else q
+
+
+CLOSED_STAGES = ('closed_won', 'closed_lost')
+
+COUNTERS: List[CounterSpec] = [
+    CounterSpec('accounts', Account),
+    CounterSpec('contacts', Contact),
+    CounterSpec('leads', Lead),
+    CounterSpec('leads_converted', Lead, 'status', ('converted',)),
+    CounterSpec('opportunities_open', Opportunity, 'sales_stage', CLOSED_STAGES, exclude=True),
+    CounterSpec('calls', Call),
+    CounterSpec('meetings', Meeting),
+    CounterSpec('tasks', Task),
+]
+
+COUNTERS_BY_NAME = {spec.name: spec for spec in COUNTERS}
+
+
+def specs_for_model(model) -> List[CounterSpec]:
+    return [spec for spec in COUNTERS if spec.model is model]
+
+
+def tracked_fields(model) -> List[str]:
+    """Fields whose transitions move rows in or out of a counter"""
+    return sorted({spec.field for spec in specs_for_model(model) if spec.field})
+
+
+def apply_deltas(deltas: Dict[str, int]) -> None:
+    """Add the given deltas to their counters with F() updates"""
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+        updated = MetricCounter.objects.filter(name=name).update(value=F('value') + delta)
+        if not updated:
+            # Counter not initialised yet: seed it from the table, which
+            # already includes the change that triggered this delta.
+            _recount(COUNTERS_BY_NAME[name])
+
+
+def _count(spec: CounterSpec) -> int:
+    return spec.model.objects.filter(spec.as_q()).order_by().count()
+
+
+def _recount(spec: CounterSpec) -> int:
+    value = _count(spec)
+    MetricCounter.objects.update_or_create(name=spec.name, defaults={'value': value})
+    return value
+
+
+def get_counts(names: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """
+    Current value of each counter in one query
+
+    Counters that were never initialised are counted once and stored.
+    """
+    names = list(names or COUNTERS_BY_NAME)
+    values = dict(MetricCounter.objects.filter(name__in=names).values_list('name', 'value'))
+
+    for name in names:
+        if name not in values:
+            values[name] = _recount(COUNTERS_BY_NAME[name])
+    return values
+
+
+def reconcile() -> Dict[str, Tuple[int, int]]:
+    """
+    Recount every counter from its table
+
+    Returns {name: (stored value, actual value)} so callers can report drift.
+    """
+    stored = dict(MetricCounter.objects.values_list('name', 'value'))
+    result = {}
+
+    with transaction.atomic():
+        for spec in COUNTERS:
+            actual = _recount(spec)
+            result[spec.name] = (stored.get(spec.name, 0), actual)
+            if stored.get(spec.name) != actual:
+                logger.info(f"Counter {spec.name} reconciled: {stored.get(spec.name)} -> {actual}")
+
+    return result
@@ -0,0 +1,117 @@
+"""
+Funnel aggregation engine for the analytics dashboard
+
+Computes stage counts, stage values and stage-to-stage conversions for the
+sales funnel with a single conditional-aggregation query instead of one
+count/sum pair per stage.
+"""
+from datetime import timedelta
+from typing import Dict, Any, List, Optional
+
+from django.db.models import Count, Sum, Q
+from django.utils import timezone
+
+from leads.models import Lead, FunnelStageHistory
+
+
+FUNNEL_STAGES = [
+    'form_submitted',
+    'meeting_booked',
+    'meeting_held',
+    'pilot_signed',
+    'deal_closed'
+]
+
+
+def _stage_reached_filter(stage: str, cutoff_date) -> Q:
+    """Leads that reached ``stage`` in the period, or currently sit in it"""
+    return (
+        Q(**{f'{stage}_at__gte': cutoff_date}) |
+        Q(**{f'{stage}_at__isnull': False}, funnel_stage=stage)
+    )
+
+
+def _build_conversions(stage_counts: Dict[str, int], stages: List[str]) -> Dict[str, float]:
+    """Calculate conversion rates between consecutive stages"""
+    conversions = {}
+    for current_stage, next_stage in zip(stages, stages[1:]):
+        current_count = stage_counts[current_stage]
+        next_count = stage_counts[next_stage]
+
+        conversion_rate = (next_count / current_count * 100) if current_count > 0 else 0
+        conversions[f'{current_stage}_to_{next_stage}'] = round(conversion_rate, 1)
+    return conversions
+
+
+def _aggregate_from_leads(cutoff_date, stages: List[str]) -> Dict[str, Any]:
+    """Stage counts and values from the Lead timestamp columns in one query"""
+    aggregates = {}
+    for stage in stages:
+        aggregates[f'{stage}__count'] = Count('id', filter=_stage_reached_filter(stage, cutoff_date))
+        aggregates[f'{stage}__value'] = Sum(
+            'estimated_value',
+            filter=Q(funnel_stage=stage, estimated_value__isnull=False)
+        )
+
+    row = Lead.objects.order_by().aggregate(**aggregates)
+
+    stage_counts = {stage: row[f'{stage}__count'] or 0 for stage in stages}
+    stage_values = {stage: float(row[f'{stage}__value'] or 0) for stage in stages}
+    return {'stage_counts': stage_counts, 'stage_values': stage_values}
+
+
+def _aggregate_from_history(cutoff_date, stages: List[str]) -> Dict[str, Any]:
+    """
+    Stage counts from FunnelStageHistory transitions in the period.
+
+    Counts distinct leads that entered each stage. Values still come from the
+    current funnel position of the lead since history rows carry no amounts.
+    """
+    aggregates = {}
+    for stage in stages:
+        aggregates[f'{stage}__count'] = Count(
+            'lead_id',
+            distinct=True,
+            filter=Q(to_stage=stage)
+        )
+
+    row = FunnelStageHistory.objects.filter(
+        changed_at__gte=cutoff_date
+    ).order_by().aggregate(**aggregates)
+    stage_counts = {stage: row[f'{stage}__count'] or 0 for stage in stages}
+
+    value_row = Lead.objects.order_by().aggregate(**{
+        f'{stage}__value': Sum('estimated_value', filter=Q(funnel_stage=stage, estimated_value__isnull=False))
+        for stage in stages
+    })
+    stage_values = {stage: float(value_row[f'{stage}__value'] or 0) for stage in stages}
+    return {'stage_counts': stage_counts, 'stage_values': stage_values}
+
+
+def compute_funnel(period_days: int = 30, source: str = 'leads',
+                   stages: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Compute funnel stage counts, values and conversions
+
+    Args:
+        period_days: Look-back window for stage entry timestamps
+        source: 'leads' to read the Lead ``*_at`` columns (one query) or
+            'history' to count transitions recorded in FunnelStageHistory
+        stages: Ordered funnel stages (defaults to FUNNEL_STAGES)
+
+    Returns:
+        Dict with stage_counts, stage_values, conversions and funnel_stages
+    """
+    stages = list(stages or FUNNEL_STAGES)
+    cutoff_date = timezone.now() - timedelta(days=period_days)
+
+    if source == 'history':
+        data = _aggregate_from_history(cutoff_date, stages)
+    elif source == 'leads':
+        data = _aggregate_from_leads(cutoff_date, stages)
+    else:
+        raise ValueError(f"Unknown funnel source: {source}")
+
+    data['conversions'] = _build_conversions(data['stage_counts'], stages)
+    data['funnel_stages'] = stages
+    return data
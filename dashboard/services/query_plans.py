@@ -0,0 +1,180 @@
+"""
+Query plan checks for the hot dashboard, calendar and scoring paths
+
+Each catalogued entry runs the real service function (or view) that
+serves a page or API. Every SELECT it executes is captured and EXPLAINed,
+so the catalogue follows the code instead of copying its querysets.
+
+A plan passes when it reads no table with a full scan, except the tables
+an entry lists in ``whole_table``. Those are aggregates that read the
+whole table by design, like the funnel counts over every lead. Listing
+the tables keeps any other scan in the same code path failing.
+
+Used by dashboard.tests and the ``check_query_plans`` management command.
+"""
+import re
+from datetime import timedelta
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import RequestFactory
+from django.utils import timezone
+
+from calendar_app.services import freebusy
+from calendar_app.services.events import calendar_events, event_kinds, window_version
+from leads.models import Lead
+from leads.services import db_scoring, score_stats, scoring_jobs
+from leads.services.batching import keyset_batches
+from leads.services.icp_config import active_criteria
+
+from . import charts, counters, rollups
+from .funnel import compute_funnel
+from .timeseries import activity_series, revenue_series
+
+
+SQLITE_FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)\s*$')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+ALL_EVENT_TYPES = ['tasks', 'calls', 'meetings', 'events']
+
+
+class HotQuery(NamedTuple):
+    area: str
+    label: str
+    run: Callable[[], object]
+    whole_table: Tuple[str, ...] = ()
+
+
+class PlanResult(NamedTuple):
+    area: str
+    label: str
+    sql: str
+    plan: str
+    full_scans: List[str]
+
+
+def _view_context(view_class, user: User) -> None:
+    """Build a view's context and evaluate the querysets the template would"""
+    request = RequestFactory().get('/')
+    request.user = user
+    view = view_class()
+    view.setup(request)
+    for value in view.get_context_data().values():
+        if isinstance(value, QuerySet):
+            list(value)
+
+
+def hot_queries(user: User, account_id: int) -> List[HotQuery]:
+    """Every catalogued code path, bound to a user and account to filter on"""
+    from ..views import AnalyticsView, DashboardView
+
+    now = timezone.now()
+    window_start = now - timedelta(days=31)
+    window_end = now + timedelta(days=31)
+    kinds = event_kinds(ALL_EVENT_TYPES)
+
+    return [
+        # Dashboard
+        HotQuery('dashboard', 'dashboard page', lambda: _view_context(DashboardView, user)),
+        HotQuery('dashboard', 'analytics page', lambda: _view_context(AnalyticsView, user),
+                 whole_table=('leads_lead', 'opportunities_opportunity')),
+        HotQuery('dashboard', 'kpi counters', counters.get_counts),
+        HotQuery('dashboard', 'rollup freshness', rollups.rollup_available),
+        HotQuery('dashboard', 'rollup totals', lambda: rollups.totals(window_start.date())),
+        HotQuery('dashboard', 'rollup monthly revenue', lambda: rollups.monthly_revenue(12)),
+        HotQuery('dashboard', 'revenue series', lambda: revenue_series('month', 12)),
+        HotQuery('dashboard', 'activity series', lambda: activity_series('day', 7)),
+        HotQuery('dashboard', 'activity heatmap', lambda: charts.build_chart('activity_heatmap', {})),
+        HotQuery('dashboard', 'activity breakdown', lambda: charts.build_chart('activity_breakdown', {})),
+        HotQuery('dashboard', 'funnel aggregate', lambda: compute_funnel(30, source='leads'),
+                 whole_table=('leads_lead',)),
+        HotQuery('dashboard', 'funnel from history', lambda: compute_funnel(30, source='history'),
+                 whole_table=('leads_lead',)),
+
+        # Calendar
+        HotQuery('calendar', 'events union', lambda: calendar_events(window_start, window_end, ALL_EVENT_TYPES)),
+        HotQuery('calendar', 'user events union', lambda: calendar_events(
+            window_start, window_end, ALL_EVENT_TYPES, user_id=user.id
+        )),
+        HotQuery('calendar', 'account events union', lambda: calendar_events(
+            window_start, window_end, ALL_EVENT_TYPES, account_id=account_id
+        )),
+        HotQuery('calendar', 'window version', lambda: window_version(window_start, window_end, kinds)),
+        HotQuery('calendar', 'free/busy', lambda: freebusy.free_busy(now, now + timedelta(days=7), [user.id])),
+
+        # Lead scoring
+        HotQuery('scoring', 'unscored leads batch', lambda: next(
+            keyset_batches(scoring_jobs.candidate_leads(), 50), None
+        )),
+        HotQuery('scoring', 'score statistics', score_stats.compute_statistics),
+        HotQuery('scoring', 'leads needing a CVR fetch', lambda: list(
+            db_scoring.needs_cvr_fetch(Lead.objects.all())[:50]
+        )),
+        HotQuery('scoring', 'stale leads', lambda: list(
+            db_scoring.stale_leads(active_criteria().fingerprint())[:50]
+        ), whole_table=('leads_lead',)),
+    ]
+
+
+def captured_selects(run: Callable[[], object]) -> List[Tuple[str, Sequence]]:
+    """(sql, params) of every SELECT executed by ``run``"""
+    queries = []
+
+    def record(execute, sql, params, many, context):
+        queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(record):
+        run()
+    return [
+        (sql, params) for sql, params in queries
+        if sql.lstrip('( ').upper().startswith(('SELECT', 'WITH'))
+    ]
+
+
+def explain(sql: str, params: Sequence) -> str:
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN {sql}', params)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return '\n'.join(row[-1] for row in cursor.fetchall())
+
+
+def full_scans(plan: str) -> List[str]:
+    """Tables read with a full scan according to an EXPLAIN plan"""
+    if connection.vendor == 'postgresql':
+        return POSTGRES_FULL_SCAN.findall(plan)
+
+    tables = []
+    for line in plan.splitlines():
+        match = SQLITE_FULL_SCAN.search(line)
+        if match:
+            tables.append(match.group(1))
+    return tables
+
+
+def check_plans(user: Optional[User] = None, account_id: Optional[int] = None) -> List[PlanResult]:
+    """
+    EXPLAIN every query of every catalogued code path
+
+    ``full_scans`` of each result lists the scanned tables the entry does
+    not allow. Run on PostgreSQL with sequential scans disabled, so a
+    result reflects whether an index is usable at all.
+    """
+    user = user or User.objects.order_by('pk').first() or User(pk=0)
+    account_id = account_id or 0
+
+    # Counters that were never initialised are recounted from their tables on
+    # first use; the hot path only reads them
+    counters.get_counts()
+
+    results = []
+    for entry in hot_queries(user, account_id):
+        for sql, params in captured_selects(entry.run):
+            plan = explain(sql, params)
+            scanned = [table for table in full_scans(plan) if table not in entry.whole_table]
+            results.append(PlanResult(entry.area, entry.label, sql, plan, scanned))
+    return results
@@ -0,0 +1,248 @@
+"""
+Daily metrics rollup for the dashboard
+
+Maintains DailyMetric rows (one per day and user) so dashboard totals are
+read from a small pre-aggregated table instead of scanning the Lead,
+Opportunity and activity tables on every page view.
+
+``refresh_incremental`` is run every few minutes by Celery beat (see
+dashboard.tasks). The dashboard falls back to live queries when the
+rollup is older than MAX_ROLLUP_AGE, e.g. when beat is not running.
+"""
+import logging
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, Sum, Max, Min
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from leads.models import Lead, FunnelStageHistory
+from opportunities.models import Opportunity
+from tasks.models import Task, Call, Meeting
+
+from ..models import DailyMetric
+from .timeseries import bucket_starts
+
+
+logger = logging.getLogger(__name__)
+
+
+# Older rollups are not served; the dashboard falls back to live queries
+MAX_ROLLUP_AGE = timedelta(hours=1)
+
+METRIC_FIELDS = ['leads_created', 'funnel_transitions', 'deals_won', 'revenue', 'calls', 'meetings', 'tasks']
+
+
+def _day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def _metric_sources():
+    """
+    (metric, queryset, date field, user field, aggregates) for each source.
+
+    Leads and activities are counted on the day they were created. Deals
+    are attributed to the day they were last updated, which is how the
+    dashboard has always dated closed-won opportunities. That day moves
+    when a deal is edited, so ``stale_deal_days`` finds the day it moved
+    from.
+    """
+    return [
+        ('leads_created', Lead.objects.all(), 'created_at', 'assigned_to',
+         {'leads_created': Count('id')}),
+        ('funnel_transitions', FunnelStageHistory.objects.all(), 'changed_at', 'lead__assigned_to',
+         {'funnel_transitions': Count('id')}),
+        ('deals_won', Opportunity.objects.filter(sales_stage='closed_won'), 'updated_at', 'assigned_to',
+         {'deals_won': Count('id'), 'revenue': Sum('amount')}),
+        ('calls', Call.objects.all(), 'created_at', 'assigned_to',
+         {'calls': Count('id')}),
+        ('meetings', Meeting.objects.all(), 'created_at', 'assigned_to',
+         {'meetings': Count('id')}),
+        ('tasks', Task.objects.all(), 'created_at', 'assigned_to',
+         {'tasks': Count('id')}),
+    ]
+
+
+def _contiguous_ranges(days: Iterable[date]) -> List[Tuple[date, date]]:
+    """Collapse a set of days into inclusive (first, last) ranges"""
+    ranges = []
+    for day in sorted(set(days)):
+        if ranges and day == ranges[-1][1] + timedelta(days=1):
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+
+def _date_range(first: date, last: date) -> List[date]:
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+def _compute_range(first: date, last: date) -> Dict[Tuple[date, Optional[int]], Dict[str, Any]]:
+    """Aggregate every metric per (day, user) for an inclusive day range"""
+    range_start = _day_start(first)
+    range_end = _day_start(last + timedelta(days=1))
+    rows = {}
+
+    for _metric, queryset, date_field, user_field, aggregates in _metric_sources():
+        grouped = queryset.filter(**{
+            f'{date_field}__gte': range_start,
+            f'{date_field}__lt': range_end,
+        }).annotate(
+            day=TruncDate(date_field)
+        ).values('day', user_field).annotate(**aggregates).order_by()
+
+        for row in grouped:
+            key = (row['day'], row[user_field])
+            metrics = rows.setdefault(key, {})
+            for name in aggregates:
+                metrics[name] = row[name] or 0
+
+    return rows
+
+
+def refresh_days(days: Iterable[date]) -> int:
+    """
+    Recompute the rollup rows for the given days
+
+    Returns the number of DailyMetric rows written.
+    """
+    written = 0
+    now = timezone.now()
+
+    for first, last in _contiguous_ranges(days):
+        computed = _compute_range(first, last)
+        # An empty row records the refresh on days without any activity
+        computed.setdefault((last, None), {})
+        objects = [
+            DailyMetric(date=day, user_id=user_id, refreshed_at=now, **metrics)
+            for (day, user_id), metrics in computed.items()
+        ]
+
+        with transaction.atomic():
+            DailyMetric.objects.filter(date__gte=first, date__lte=last).delete()
+            DailyMetric.objects.bulk_create(objects, batch_size=1000)
+
+        written += len(objects)
+        logger.info(f"Refreshed daily metrics {first} to {last}: {len(objects)} rows")
+
+    return written
+
+
+def backfill() -> int:
+    """Rebuild the whole rollup from the earliest recorded activity to today"""
+    earliest = []
+    for _metric, queryset, date_field, _user_field, _aggregates in _metric_sources():
+        value = queryset.order_by().aggregate(first=Min(date_field))['first']
+        if value:
+            earliest.append(timezone.localtime(value).date())
+
+    today = timezone.localdate()
+    if not earliest:
+        DailyMetric.objects.all().delete()
+        return 0
+
+    with transaction.atomic():
+        DailyMetric.objects.all().delete()
+        return refresh_days(_date_range(min(earliest), today))
+
+
+def changed_days(since: datetime) -> set:
+    """Days whose rollup rows are affected by rows modified after ``since``"""
+    days = set()
+    sources = [
+        (Lead.objects.filter(updated_at__gte=since), 'created_at'),
+        (FunnelStageHistory.objects.filter(changed_at__gte=since), 'changed_at'),
+        (Opportunity.objects.filter(updated_at__gte=since), 'updated_at'),
+        (Call.objects.filter(updated_at__gte=since), 'created_at'),
+        (Meeting.objects.filter(updated_at__gte=since), 'created_at'),
+        (Task.objects.filter(updated_at__gte=since), 'created_at'),
+    ]
+    for queryset, date_field in sources:
+        days.update(
+            queryset.annotate(day=TruncDate(date_field)).values_list('day', flat=True).distinct().order_by()
+        )
+    return days
+
+
+def stale_deal_days() -> set:
+    """
+    Days whose rolled-up deals differ from the closed-won opportunities
+
+    Deals are dated by ``updated_at``, so editing a won deal or moving it
+    out of closed_won leaves it on a day ``changed_days`` cannot see. One
+    grouped query per table compares deals and revenue per day.
+    """
+    live = {
+        row['day']: (row['deals'], row['revenue'] or 0)
+        for row in Opportunity.objects.filter(sales_stage='closed_won').annotate(
+            day=TruncDate('updated_at')
+        ).values('day').annotate(deals=Count('id'), revenue=Sum('amount')).order_by()
+    }
+    rolled = {
+        row['date']: (row['deals'], row['revenue'] or 0)
+        for row in DailyMetric.objects.filter(deals_won__gt=0).values('date').annotate(
+            deals=Sum('deals_won'), revenue=Sum('revenue')
+        ).order_by()
+    }
+    return {day for day in live.keys() | rolled.keys() if live.get(day, (0, 0)) != rolled.get(day, (0, 0))}
+
+
+def refresh_incremental(lookback_days: int = 1) -> int:
+    """
+    Refresh only the days touched since the last refresh
+
+    Also recomputes the trailing ``lookback_days`` so today's row stays
+    current, and the days whose deals no longer match (``stale_deal_days``).
+    Falls back to a full backfill when the rollup is empty. Other rows
+    deleted since the last run are only reconciled by a full backfill.
+    """
+    watermark = DailyMetric.objects.aggregate(last=Max('refreshed_at'))['last']
+    if watermark is None:
+        return backfill()
+
+    today = timezone.localdate()
+    days = changed_days(watermark) | stale_deal_days()
+    days.update(today - timedelta(days=i) for i in range(lookback_days))
+    return refresh_days(days)
+
+
+def rollup_available() -> bool:
+    """True when the rollup has been refreshed within MAX_ROLLUP_AGE"""
+    last = DailyMetric.objects.aggregate(last=Max('refreshed_at'))['last']
+    return last is not None and last >= timezone.now() - MAX_ROLLUP_AGE
+
+
+def totals(start: date, end: Optional[date] = None, user=None) -> Dict[str, Any]:
+    """Sum every metric over an inclusive date range, optionally for one user"""
+    queryset = DailyMetric.objects.filter(date__gte=start)
+    if end is not None:
+        queryset = queryset.filter(date__lte=end)
+    if user is not None:
+        queryset = queryset.filter(user=user)
+
+    row = queryset.order_by().aggregate(**{name: Sum(name) for name in METRIC_FIELDS})
+    result = {name: row[name] or 0 for name in METRIC_FIELDS}
+    result['revenue'] = Decimal(result['revenue'])
+    return result
+
+
+def monthly_revenue(periods: int = 12) -> List[Dict[str, Any]]:
+    """Revenue per calendar month from the rollup, oldest first"""
+    starts = bucket_starts('month', periods)
+    rows = DailyMetric.objects.filter(date__gte=starts[0]).annotate(
+        month=TruncMonth('date')
+    ).values('month').annotate(revenue=Sum('revenue'), deals=Sum('deals_won')).order_by()
+    by_month = {row['month']: row for row in rows}
+
+    return [
+        {
+            'start': start,
+            'revenue': float(by_month[start]['revenue'] or 0) if start in by_month else 0.0,
+            'deals': (by_month[start]['deals'] or 0) if start in by_month else 0,
+        }
+        for start in starts
+    ]
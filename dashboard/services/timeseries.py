@@ -0,0 +1,143 @@
+"""
+Calendar-aligned time-series service for dashboard charts
+
+Groups rows into day/week/month buckets with TruncDay/TruncWeek/TruncMonth so
+each series is a single grouped query. Buckets with no rows are zero-filled
+in Python.
+"""
+from datetime import datetime, timedelta, date
+from typing import Dict, Any, List, Optional
+
+from django.db.models import Count, Sum, Value, CharField
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+from django.utils import timezone
+
+from opportunities.models import Opportunity
+from tasks.models import Task, Call, Meeting
+
+
+TRUNC_FUNCTIONS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+# Activity series sources: (label, model, timestamp field)
+ACTIVITY_SOURCES = [
+    ('calls', Call, 'created_at'),
+    ('meetings', Meeting, 'created_at'),
+    ('tasks', Task, 'created_at'),
+]
+
+
+def _bucket_key(value) -> date:
+    """Normalize a truncated datetime/date returned by the database to a date"""
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.date()
+    return value
+
+
+def bucket_starts(granularity: str, periods: int, now: Optional[datetime] = None) -> List[date]:
+    """
+    Return the start date of the last ``periods`` buckets, oldest first.
+
+    Weeks start on Monday and months on the 1st, matching the database
+    truncation functions.
+    """
+    if granularity not in TRUNC_FUNCTIONS:
+        raise ValueError(f"Unknown granularity: {granularity}")
+
+    today = timezone.localtime(now or timezone.now()).date()
+    starts = []
+
+    if granularity == 'day':
+        starts = [today - timedelta(days=i) for i in range(periods)]
+    elif granularity == 'week':
+        monday = today - timedelta(days=today.weekday())
+        starts = [monday - timedelta(weeks=i) for i in range(periods)]
+    else:
+        year, month = today.year, today.month
+        for _ in range(periods):
+            starts.append(date(year, month, 1))
+            month -= 1
+            if month == 0:
+                year, month = year - 1, 12
+
+    starts.reverse()
+    return starts
+
+
+def _range_start(starts: List[date]) -> datetime:
+    """Aware datetime for the beginning of the first bucket"""
+    return timezone.make_aware(datetime.combine(starts[0], datetime.min.time()))
+
+
+def revenue_series(granularity: str = 'month', periods: int = 12,
+                   now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Closed-won revenue and deal count per bucket in one grouped query
+
+    Returns a list of {'start': date, 'revenue': float, 'deals': int},
+    oldest bucket first.
+    """
+    starts = bucket_starts(granularity, periods, now)
+    trunc = TRUNC_FUNCTIONS[granularity]
+
+    rows = Opportunity.objects.filter(
+        sales_stage='closed_won',
+        updated_at__gte=_range_start(starts)
+    ).annotate(
+        bucket=trunc('updated_at')
+    ).values('bucket').annotate(
+        revenue=Sum('amount'),
+        deals=Count('id')
+    ).order_by('bucket')
+
+    by_bucket = {_bucket_key(row['bucket']): row for row in rows}
+
+    series = []
+    for start in starts:
+        row = by_bucket.get(start)
+        series.append({
+            'start': start,
+            'revenue': float(row['revenue'] or 0) if row else 0.0,
+            'deals': row['deals'] if row else 0,
+        })
+    return series
+
+
+def activity_series(granularity: str = 'day', periods: int = 7,
+                    now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Calls, meetings and tasks created per bucket
+
+    The per-model grouped queries are combined with UNION ALL so the whole
+    series is fetched in a single round-trip. Returns a list of
+    {'start': date, 'calls': int, 'meetings': int, 'tasks': int}.
+    """
+    starts = bucket_starts(granularity, periods, now)
+    trunc = TRUNC_FUNCTIONS[granularity]
+    range_start = _range_start(starts)
+
+    querysets = [
+        model.objects.filter(**{f'{field}__gte': range_start}).annotate(
+            bucket=trunc(field),
+            source=Value(label, output_field=CharField())
+        ).values('bucket', 'source').annotate(count=Count('id')).order_by()
+        for label, model, field in ACTIVITY_SOURCES
+    ]
+    combined = querysets[0].union(*querysets[1:], all=True)
+
+    counts = {}
+    for row in combined:
+        counts[(_bucket_key(row['bucket']), row['source'])] = row['count']
+
+    series = []
+    for start in starts:
+        point = {'start': start}
+        for label, _model, _field in ACTIVITY_SOURCES:
+            point[label] = counts.get((start, label), 0)
+        series.append(point)
+    return series
@@ -0,0 +1,80 @@
+"""
+Signal handlers keeping the dashboard KPI counters current
+"""
+from collections import Counter
+
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete
+
+from .services.counters import COUNTERS, specs_for_model, tracked_fields, apply_deltas
+
+
+_UNKNOWN = object()
+
+
+def _snapshot(sender, instance, **kwargs):
+    """Remember the loaded value of each tracked field"""
+    instance._counter_snapshot = {
+        field: instance.__dict__.get(field, _UNKNOWN)
+        for field in tracked_fields(sender)
+    }
+
+
+def _fill_unknown_snapshot(sender, instance, **kwargs):
+    """Load original values that were deferred when the instance was fetched, before saving or deleting"""
+    snapshot = getattr(instance, '_counter_snapshot', {})
+    missing = [field for field, value in snapshot.items() if value is _UNKNOWN]
+    if not missing or instance.pk is None or instance._state.adding:
+        return
+
+    row = sender._default_manager.filter(pk=instance.pk).values(*missing).first()
+    if row:
+        snapshot.update(row)
+
+
+def _on_save(sender, instance, created, **kwargs):
+    deltas = Counter()
+    snapshot = getattr(instance, '_counter_snapshot', {})
+
+    for spec in specs_for_model(sender):
+        new_value = getattr(instance, spec.field) if spec.field else None
+        if created:
+            deltas[spec.name] += spec.matches(new_value)
+            continue
+        if not spec.field:
+            continue
+
+        old_value = snapshot.get(spec.field, _UNKNOWN)
+        if old_value is _UNKNOWN:
+            continue
+        deltas[spec.name] += spec.matches(new_value) - spec.matches(old_value)
+
+    apply_deltas(deltas)
+    _snapshot(sender, instance)
+
+
+def _on_delete(sender, instance, **kwargs):
+    deltas = Counter()
+    snapshot = getattr(instance, '_counter_snapshot', {})
+
+    for spec in specs_for_model(sender):
+        value = None
+        if spec.field:
+            value = snapshot.get(spec.field, _UNKNOWN)
+            if value is _UNKNOWN:
+                # The row is gone and cannot be loaded; reconcile() fixes the counter
+                continue
+        deltas[spec.name] -= spec.matches(value)
+
+    apply_deltas(deltas)
+
+
+def connect_counter_signals():
+    """Connect the counter handlers for every model with a counter"""
+    for model in {spec.model for spec in COUNTERS}:
+        uid = f'dashboard_counters_{model._meta.label_lower}'
+        if tracked_fields(model):
+            post_init.connect(_snapshot, sender=model, dispatch_uid=f'{uid}_init')
+            pre_save.connect(_fill_unknown_snapshot, sender=model, dispatch_uid=f'{uid}_pre_save')
+            pre_delete.connect(_fill_unknown_snapshot, sender=model, dispatch_uid=f'{uid}_pre_delete')
+        post_save.connect(_on_save, sender=model, dispatch_uid=f'{uid}_save')
+        post_delete.connect(_on_delete, sender=model, dispatch_uid=f'{uid}_delete')
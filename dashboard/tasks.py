@@ -0,0 +1,18 @@
+"""
+Celery tasks for the dashboard
+"""
+from celery import shared_task
+
+from .services import counters, rollups
+
+
+@shared_task(ignore_result=True)
+def refresh_daily_metrics():
+    """Refresh the days of the DailyMetric rollup changed since the last refresh"""
+    rollups.refresh_incremental()
+
+
+@shared_task(ignore_result=True)
+def reconcile_counters():
+    """Recount the KPI counters, correcting drift from writes that bypass signals"""
+    counters.reconcile()
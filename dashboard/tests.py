@@ -1,3 +1,108 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Account
+from leads.models import Lead
+from opportunities.models import Opportunity
+
+from .models import DailyMetric
+from .services import counters, query_plans, rollups
+from .tasks import reconcile_counters
+
+
+class DailyMetricRollupTests(TestCase):
+    def setUp(self):
+        self.account = Account.objects.create(name='Acme')
+        self.deal = Opportunity.objects.create(
+            name='Deal', account=self.account, amount=Decimal('1000.00'),
+            sales_stage='closed_won', expected_close_date=timezone.localdate(),
+        )
+        # Won a week ago
+        Opportunity.objects.filter(pk=self.deal.pk).update(updated_at=timezone.now() - timedelta(days=7))
+        rollups.backfill()
+
+    def won_totals(self):
+        totals = rollups.totals(timezone.localdate() - timedelta(days=30))
+        return totals['deals_won'], totals['revenue']
+
+    def test_editing_won_deal_moves_it_instead_of_counting_it_twice(self):
+        self.assertEqual(self.won_totals(), (1, Decimal('1000.00')))
+
+        self.deal.refresh_from_db()
+        self.deal.next_step = 'Send invoice'
+        self.deal.save()
+        rollups.refresh_incremental()
+
+        self.assertEqual(self.won_totals(), (1, Decimal('1000.00')))
+        self.assertEqual(DailyMetric.objects.get(deals_won=1).date, timezone.localdate())
+
+    def test_deal_moved_out_of_closed_won_is_removed(self):
+        self.deal.refresh_from_db()
+        self.deal.sales_stage = 'closed_lost'
+        self.deal.save()
+        rollups.refresh_incremental()
+
+        self.assertEqual(self.won_totals(), (0, Decimal('0')))
+
+    def test_stale_rollup_is_not_available(self):
+        self.assertTrue(rollups.rollup_available())
+
+        DailyMetric.objects.update(refreshed_at=timezone.now() - rollups.MAX_ROLLUP_AGE - timedelta(minutes=1))
+        self.assertFalse(rollups.rollup_available())
+
+        rollups.refresh_incremental()
+        self.assertTrue(rollups.rollup_available())
+
+
+class CounterSignalTests(TestCase):
+    def setUp(self):
+        Lead.objects.create(first_name='Ann', last_name='Lee', company='Acme', email='ann@example.com',
+                            status='converted')
+        counters.reconcile()
+
+    def test_scheduled_reconcile_corrects_bulk_writes(self):
+        Lead.objects.update(status='new')
+        self.assertEqual(counters.get_counts(['leads_converted']), {'leads_converted': 1})
+
+        reconcile_counters()
+
+        self.assertEqual(counters.get_counts(['leads_converted']), {'leads_converted': 0})
+        self.assertIn('reconcile-counters', settings.CELERY_BEAT_SCHEDULE)
+
+    def test_deleting_instance_with_deferred_fields(self):
+        Lead.objects.only('id').get().delete()
+
+        self.assertEqual(counters.get_counts(['leads', 'leads_converted']), {'leads': 0, 'leads_converted': 0})
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class AnalyticsBatchDataTests(TestCase):
+    def test_requires_login(self):
+        url = reverse('dashboard:analytics_batch')
+
+        response = self.client.get(url, {'types': 'sales_pipeline'})
+        self.assertEqual(response.status_code, 302)
+
+        self.client.force_login(User.objects.create_user('analyst'))
+        response = self.client.get(url, {'types': 'sales_pipeline'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('sales_pipeline', response.json())
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        user = User.objects.create_user('planner')
+        account = Account.objects.create(name='Acme')
+
+        results = query_plans.check_plans(user, account.id)
+
+        self.assertTrue(results)
+        for result in results:
+            with self.subTest(area=result.area, label=result.label, sql=result.sql):
+                self.assertEqual(result.full_scans, [], result.plan)
@@ -8,5 +8,6 @@ urlpatterns = [
     path('reports/', views.ReportsView.as_view(), name='reports'),
     path('analytics/', views.AnalyticsView.as_view(), name='analytics'),
     path('analytics/data/', views.analytics_data, name='analytics_data'),
+    path('analytics/batch/', views.analytics_batch_data, name='analytics_batch'),
     path('profile/', views.ProfileView.as_view(), name='profile'),
 ]
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Lead, FunnelStageHistory
+from .models import Lead, FunnelStageHistory, ScoringJob, CVRCacheEntry, ICPConfiguration
+from .services.funnel_transitions import advance_leads
 
 
 @admin.register(Lead)
@@ -42,6 +43,14 @@ class LeadAdmin(admin.ModelAdmin):
     )
     
     readonly_fields = ['funnel_stage_updated_at']
+    actions = ['advance_funnel_stage']
+    
+    @admin.action(description='Advance selected leads to the next funnel stage')
+    def advance_funnel_stage(self, request, queryset):
+        counts = advance_leads(queryset, user=request.user, notes='Advanced from the admin')
+        moved = sum(counts.values())
+        breakdown = ', '.join(f"{count} to {stage}" for stage, count in counts.items() if count)
+        self.message_user(request, f"Advanced {moved} leads" + (f" ({breakdown})" if breakdown else ''))
 
 
 @admin.register(FunnelStageHistory)
@@ -51,3 +60,27 @@ class FunnelStageHistoryAdmin(admin.ModelAdmin):
     search_fields = ['lead__first_name', 'lead__last_name', 'lead__company']
     ordering = ['-changed_at']
     readonly_fields = ['changed_at']
+
+
+@admin.register(ScoringJob)
+class ScoringJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'processed_count', 'total_leads', 'scored_count', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    ordering = ['-created_at']
+    readonly_fields = ['created_at', 'started_at', 'finished_at', 'updated_at', 'last_processed_id', 'celery_task_id']
+
+
+@admin.register(CVRCacheEntry)
+class CVRCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['cvr_number', 'found', 'fetched_at', 'etag']
+    list_filter = ['found', 'fetched_at']
+    search_fields = ['cvr_number']
+    ordering = ['-fetched_at']
+
+
+@admin.register(ICPConfiguration)
+class ICPConfigurationAdmin(admin.ModelAdmin):
+    list_display = ['version', 'is_active', 'min_employees', 'criteria_hash', 'created_by', 'created_at']
+    list_filter = ['is_active']
+    ordering = ['-version']
+    readonly_fields = ['version', 'criteria_hash', 'is_active', 'created_by', 'created_at']
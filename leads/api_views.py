@@ -5,16 +5,17 @@ import logging
 import json
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
-from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.utils import timezone
-from django.db import models
 
-from .models import Lead
-from .services.cvr_scoring import default_scorer, CVRLeadScorer, ICPCriteria
+from .models import Lead, ScoringJob
+from .services import icp_config, score_stats, scoring_jobs
+from .services.cvr_scoring import CVRLeadScorer, ICPCriteria
 from .services.cvr_client import cvr_client, CVRAPIError
 
 
@@ -51,7 +52,7 @@ class LeadScoreAPIView(BaseAPIView):
             cvr_number = data.get('cvr_number')
             
             # Score the lead
-            score_breakdown = default_scorer.score_and_update_lead(lead, cvr_number)
+            score_breakdown = icp_config.active_scorer().score_and_update_lead(lead, cvr_number)
             
             logger.info(f"Scored lead {lead.full_name}: {score_breakdown.total_score}/12")
             
@@ -107,7 +108,7 @@ class BulkLeadScoreAPIView(BaseAPIView):
                 return self.error_response("No valid leads found")
             
             # Score leads in bulk
-            score_results = default_scorer.bulk_score_leads(list(leads))
+            score_results = icp_config.active_scorer().bulk_score_leads(list(leads))
             
             # Prepare response
             results = []
@@ -218,16 +219,24 @@ class CVRDataAPIView(BaseAPIView):
 
 
 class ICPConfigAPIView(BaseAPIView):
-    """API view for managing ICP configuration"""
+    """
+    API view for managing ICP configuration
+    
+    Publishing criteria changes how every lead is scored, so it needs staff
+    status or the add_icpconfiguration permission and a CSRF token.
+    """
+    
+    @method_decorator(login_required)
+    @method_decorator(csrf_protect)
+    def dispatch(self, request, *args, **kwargs):
+        # Bypass BaseAPIView.dispatch, which is csrf_exempt
+        return View.dispatch(self, request, *args, **kwargs)
     
     def get(self, request):
         """Get current ICP configuration"""
-        icp = ICPCriteria()
+        configuration = icp_config.active_configuration()
         return self.json_response({
-            'min_employees': icp.min_employees,
-            'target_industries': icp.target_industries,
-            'target_cities': icp.target_cities,
-            'target_employee_levels': icp.target_employee_levels,
+            **icp_config.configuration_to_dict(configuration),
             'scoring_info': {
                 'min_score': 4,
                 'max_score': 12,
@@ -235,6 +244,30 @@ class ICPConfigAPIView(BaseAPIView):
                 'points_per_miss': 1
             }
         })
+    
+    def post(self, request):
+        """Publish new ICP criteria as the next configuration version"""
+        if not (request.user.is_staff or request.user.has_perm('leads.add_icpconfiguration')):
+            return self.error_response("You do not have permission to change the ICP configuration", 403)
+        
+        try:
+            data = json.loads(request.body) if request.body else {}
+            criteria = icp_config.criteria_from_dict(data)
+            configuration = icp_config.publish(criteria, user=request.user, notes=data.get('notes', ''))
+            
+            return self.json_response({
+                'success': True,
+                **icp_config.configuration_to_dict(configuration),
+                'leads_to_rescore': Lead.objects.exclude(icp_criteria_hash=configuration.criteria_hash).count()
+            })
+            
+        except json.JSONDecodeError:
+            return self.error_response("Invalid JSON in request body")
+        except icp_config.ICPConfigurationError as e:
+            return self.error_response(str(e))
+        except Exception as e:
+            logger.error(f"Error updating ICP configuration: {e}")
+            return self.error_response(f"Failed to update ICP configuration: {str(e)}", 500)
 
 
 class LeadScoreStatsAPIView(BaseAPIView):
@@ -243,41 +276,7 @@ class LeadScoreStatsAPIView(BaseAPIView):
     def get(self, request):
         """Get lead scoring statistics"""
         try:
-            from django.db.models import Avg, Count, Max, Min
-            
-            # Get scoring statistics
-            stats = Lead.objects.aggregate(
-                total_leads=Count('id'),
-                avg_score=Avg('icp_score'),
-                min_score=Min('icp_score'),
-                max_score=Max('icp_score'),
-                scored_leads=Count('id', filter=models.Q(icp_score__gt=4))
-            )
-            
-            # Get score distribution
-            score_distribution = {}
-            for score in range(4, 13):
-                count = Lead.objects.filter(icp_score=score).count()
-                score_distribution[str(score)] = count
-            
-            # Get top scoring leads
-            top_leads = Lead.objects.filter(icp_score__gte=10).order_by('-icp_score')[:10]
-            top_leads_data = [
-                {
-                    'id': lead.id,
-                    'name': lead.full_name,
-                    'company': lead.company,
-                    'score': lead.icp_score,
-                    'industry': lead.industry
-                }
-                for lead in top_leads
-            ]
-            
-            return self.json_response({
-                'statistics': stats,
-                'score_distribution': score_distribution,
-                'top_scoring_leads': top_leads_data
-            })
+            return self.json_response(score_stats.score_statistics())
             
         except Exception as e:
             logger.error(f"Error getting lead score stats: {e}")
@@ -323,6 +322,14 @@ class CVRLookupAPIView(BaseAPIView):
             return self.error_response("Internal server error", 500)
 
 
+class CVRCacheStatsAPIView(BaseAPIView):
+    """API view exposing CVR cache hit, miss and stale counters"""
+    
+    def get(self, request):
+        """Cache statistics for the worker serving the request"""
+        return self.json_response(cvr_client.get_cache_stats())
+
+
 class PopulateLeadFromCVRAPIView(BaseAPIView):
     """API view for populating lead data from CVR"""
     
@@ -431,41 +438,65 @@ class CreateLeadFromCVRAPIView(BaseAPIView):
             return self.error_response("Internal server error", 500)
 
 
+class ScoringJobAPIView(BaseAPIView):
+    """API view for polling a background scoring job"""
+    
+    def get(self, request, job_id):
+        """Get the status and progress of a scoring job"""
+        job = get_object_or_404(ScoringJob, pk=job_id)
+        return self.json_response(scoring_jobs.job_to_dict(job))
+
+
+class ScoringJobCancelAPIView(BaseAPIView):
+    """API view for cancelling a background scoring job"""
+    
+    def post(self, request, job_id):
+        """Request cancellation; a running job stops after its current batch"""
+        job = get_object_or_404(ScoringJob, pk=job_id)
+        job = scoring_jobs.cancel_job(job)
+        return self.json_response({'success': True, **scoring_jobs.job_to_dict(job)})
+
+
+class ScoringJobResumeAPIView(BaseAPIView):
+    """API view for resuming a cancelled or failed scoring job"""
+    
+    def post(self, request, job_id):
+        """Re-queue the job from its last processed lead"""
+        job = get_object_or_404(ScoringJob, pk=job_id)
+        try:
+            job = scoring_jobs.resume_job(job)
+        except scoring_jobs.ScoringJobError as e:
+            return self.error_response(str(e), 503)
+        return self.json_response({'success': True, **scoring_jobs.job_to_dict(job)}, status=202)
+
+
 # Standalone function views for simpler endpoints
 @login_required
 @require_http_methods(["POST"])
 @csrf_exempt
 def score_all_leads(request):
-    """Score all leads in the database"""
+    """Queue a background job scoring all unscored leads"""
     try:
-        # Get all leads without scores or with old scores
-        leads = Lead.objects.filter(icp_score__lte=4)
-        
-        if not leads.exists():
+        if not scoring_jobs.candidate_leads().exists():
             return JsonResponse({
                 'success': True,
                 'message': 'No leads need scoring',
                 'scored_count': 0
             })
         
-        # Score leads in batches
-        batch_size = 50
-        total_scored = 0
-        
-        for i in range(0, leads.count(), batch_size):
-            batch = list(leads[i:i + batch_size])
-            default_scorer.bulk_score_leads(batch)
-            total_scored += len(batch)
-            logger.info(f"Scored batch {i//batch_size + 1}: {len(batch)} leads")
+        job = scoring_jobs.start_job(user=request.user)
         
         return JsonResponse({
             'success': True,
-            'message': f'Successfully scored {total_scored} leads',
-            'scored_count': total_scored
-        })
+            'message': f'Scoring job {job.pk} is {job.status}',
+            'status_url': reverse('leads:api_score_job', kwargs={'job_id': job.pk}),
+            **scoring_jobs.job_to_dict(job)
+        }, status=202)
         
+    except scoring_jobs.ScoringJobError as e:
+        return JsonResponse({'error': str(e)}, status=503)
     except Exception as e:
-        logger.error(f"Error scoring all leads: {e}")
+        logger.error(f"Error queueing lead scoring job: {e}")
         return JsonResponse({
-            'error': f'Failed to score leads: {str(e)}'
+            'error': f'Failed to queue scoring job: {str(e)}'
         }, status=500)
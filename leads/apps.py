@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LeadsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "leads"
+
+    def ready(self):
+        from .signals import connect_score_stats_signals
+        connect_score_stats_signals()
@@ -0,0 +1,145 @@
+"""
+Benchmark in-memory ICP scoring throughput
+
+Usage: python manage.py benchmark_icp_scoring --leads 100000
+
+Compares the original per-lead scorer (linear term scans, one
+LeadScoreBreakdown per lead), the current CVRLeadScorer and the compiled
+matcher's columnar batch scoring. Leads are unsaved in-memory instances,
+so no database access or CVR lookups are involved.
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.models import Lead
+from leads.services.cvr_scoring import CVRLeadScorer, ICPCriteria, LeadScoreBreakdown
+
+
+INDUSTRIES = [
+    'Software Development', 'Retail Trade', 'FMCG Distribution', 'SaaS Platforms', 'Construction',
+    'Logistics', 'Healthcare', 'Financial Services', 'Information Technology', 'Agriculture',
+]
+TITLES = [
+    'Sales Manager', 'Developer', 'Chief Executive Officer', 'Head of Marketing', 'Accountant',
+    'VP Engineering', 'Consultant', 'Senior Director of Sales', 'Intern', 'Project Coordinator',
+]
+CITIES = ['Copenhagen', 'København K', 'Aarhus C', 'Odense', 'Aalborg', 'Esbjerg', 'Vejle', 'Randers']
+
+
+class LegacyScorer:
+    """The original scorer: lower-cases every term for every lead"""
+
+    def __init__(self, icp: ICPCriteria):
+        self.icp = icp
+
+    @staticmethod
+    def _contains_any(value, terms):
+        if not value:
+            return False
+        value_lower = value.lower()
+        for term in terms:
+            if term.lower() in value_lower:
+                return True
+        return False
+
+    def score(self, lead) -> LeadScoreBreakdown:
+        size = bool(lead.employees and lead.employees >= self.icp.min_employees)
+        industry = self._contains_any(lead.industry, self.icp.target_industries)
+        level = self._contains_any(lead.title, self.icp.target_employee_levels)
+        location = self._contains_any(lead.city, self.icp.target_cities)
+        scores = [3 if matched else 1 for matched in (size, industry, level, location)]
+        return LeadScoreBreakdown(
+            company_size_score=scores[0],
+            industry_score=scores[1],
+            employee_level_score=scores[2],
+            location_score=scores[3],
+            total_score=sum(scores),
+            company_size_match=size,
+            industry_match=industry,
+            employee_level_match=level,
+            location_match=location
+        )
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ICP scoring throughput (leads/sec) of the legacy, current and compiled scorers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--leads',
+            type=int,
+            default=100000,
+            help='Number of synthetic in-memory leads (default: 100000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Timed runs per implementation; the best is reported (default: 3)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the synthetic leads (default: 42)'
+        )
+
+    def handle(self, *args, **options):
+        if options['leads'] <= 0:
+            raise CommandError('--leads must be positive')
+
+        leads = self._make_leads(options['leads'], random.Random(options['seed']))
+        icp = ICPCriteria()
+        legacy = LegacyScorer(icp)
+        scorer = CVRLeadScorer(icp)
+
+        implementations = [
+            ('legacy per-lead', lambda: [legacy.score(lead).total_score for lead in leads]),
+            ('current per-lead', lambda: [scorer.score_with_cvr_data(lead, None).total_score for lead in leads]),
+            ('compiled batch', lambda: scorer.score_batch(leads)),
+            ('compiled batch + breakdowns', lambda: [
+                breakdown.total_score for breakdown in scorer.score_batch(leads, breakdowns=True)
+            ]),
+        ]
+
+        self.stdout.write(f"Scoring {len(leads)} leads, best of {options['repeat']} runs")
+
+        reference = None
+        baseline = None
+        for label, run in implementations:
+            best = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                totals = run()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+
+            if reference is None:
+                reference = totals
+            elif totals != reference:
+                raise CommandError(f'{label} produced different scores than the legacy scorer')
+
+            throughput = len(leads) / best if best else float('inf')
+            baseline = baseline or throughput
+            self.stdout.write(
+                f"  {label:<30} {best * 1000:9.1f} ms  {throughput:12,.0f} leads/sec  "
+                f"{throughput / baseline:5.1f}x"
+            )
+
+        self.stdout.write(self.style.SUCCESS('All implementations agree'))
+
+    def _make_leads(self, count, rng):
+        return [
+            Lead(
+                first_name='Lead',
+                last_name=str(i),
+                company=f'Company {i}',
+                title=rng.choice(TITLES),
+                industry=rng.choice(INDUSTRIES),
+                city=rng.choice(CITIES),
+                employees=rng.choice([None, 10, 50, 150, 250, 1000]),
+            )
+            for i in range(count)
+        ]
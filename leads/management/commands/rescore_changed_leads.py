@@ -0,0 +1,115 @@
+"""
+Management command to re-score only the leads whose ICP score is out of date
+
+A lead is out of date when it was never scored, was scored with criteria
+other than the active ICP configuration, or one of its scoring inputs
+(employees, industry, title, city, CVR number) changed since it was scored.
+Out-of-date leads that can be scored from the table and the CVR cache are
+rescored with a single UPDATE; only leads needing a CVR fetch go through
+the Python scoring pipeline.
+
+Changes to cached CVR company data alone do not mark a lead as out of date.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.models import Lead
+from leads.services.batching import keyset_batches
+from leads.services.cvr_scoring import LOAD_FIELDS
+from leads.services.db_scoring import needs_cvr_fetch, rescore_in_database, stale_leads
+from leads.services.icp_config import active_configuration, active_scorer, to_criteria
+
+
+class Command(BaseCommand):
+    help = 'Re-score leads whose ICP criteria or scoring inputs changed since they were last scored'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Leads per batch for leads scored in Python (default: 50)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=None,
+            help='Concurrent CVR lookups per batch (default: CVR_ENRICHMENT MAX_WORKERS)'
+        )
+        parser.add_argument(
+            '--rate-limit',
+            type=float,
+            default=None,
+            help='Max CVR API requests per second, 0 for unlimited (default: CVR_ENRICHMENT setting)'
+        )
+        parser.add_argument(
+            '--python-only',
+            action='store_true',
+            help='Score every out-of-date lead in Python instead of using a SQL UPDATE'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many leads are out of date without scoring them'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        configuration = active_configuration()
+        criteria_hash = configuration.criteria_hash
+        stale = stale_leads(criteria_hash)
+
+        self.stdout.write(f"Active ICP configuration: v{configuration.version} ({criteria_hash})")
+
+        total = stale.count()
+        if not total:
+            self.stdout.write(self.style.SUCCESS('All lead scores are up to date'))
+            return
+
+        never_scored = stale.filter(icp_scored_at__isnull=True).count()
+        other_criteria = stale.filter(icp_scored_at__isnull=False).exclude(icp_criteria_hash=criteria_hash).count()
+        self.stdout.write(f"{total} of {Lead.objects.count()} leads are out of date:")
+        self.stdout.write(f"- Never scored: {never_scored}")
+        self.stdout.write(f"- Scored with other criteria: {other_criteria}")
+        self.stdout.write(f"- Changed since scored: {total - never_scored - other_criteria}")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('\nDRY RUN MODE - No leads will be updated'))
+            return
+
+        python_leads = stale
+        if not options['python_only']:
+            updated = rescore_in_database(stale, to_criteria(configuration))
+            self.stdout.write(self.style.SUCCESS(f"\nRescored {updated} leads in the database"))
+            # The UPDATE skips leads needing a CVR fetch, so they are still out of date
+            python_leads = needs_cvr_fetch(stale)
+
+        remaining = python_leads.count()
+        if not remaining:
+            self.stdout.write(self.style.SUCCESS('Done'))
+            return
+
+        self.stdout.write(f"\nScoring {remaining} leads in Python in batches of {batch_size}...")
+
+        scorer = active_scorer()
+        processed = 0
+        scored = 0
+        errors = 0
+        for batch in keyset_batches(python_leads, batch_size, fields=LOAD_FIELDS):
+            try:
+                scorer.bulk_score_leads(
+                    batch,
+                    max_workers=options['concurrency'],
+                    rate_limit=options['rate_limit']
+                )
+                scored += len(batch)
+            except Exception as e:
+                errors += 1
+                self.stdout.write(self.style.ERROR(f"Error scoring leads {batch[0].id}-{batch[-1].id}: {e}"))
+
+            processed += len(batch)
+            self.stdout.write(f"Progress: {processed}/{remaining}")
+
+        self.stdout.write(self.style.SUCCESS(f"\nRe-scored {scored} leads in Python ({errors} failed batches)"))
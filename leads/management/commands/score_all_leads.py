@@ -2,9 +2,11 @@
 Management command to score all leads based on ICP criteria using CVR API
 """
 from django.core.management.base import BaseCommand, CommandError
-from django.db.models import Q
 from leads.models import Lead
-from leads.services.cvr_scoring import default_scorer, CVRLeadScorer, ICPCriteria
+from leads.services.batching import keyset_batches
+from leads.services.cvr_scoring import CVRLeadScorer, LOAD_FIELDS
+from leads.services.icp_config import active_criteria
+from leads.services.db_scoring import needs_cvr_fetch, rescore_in_database
 
 
 class Command(BaseCommand):
@@ -25,20 +27,37 @@ class Command(BaseCommand):
         parser.add_argument(
             '--min-employees',
             type=int,
-            default=200,
-            help='Minimum employee count for ICP match (default: 200)'
+            default=None,
+            help='Minimum employee count for ICP match (default: active ICP configuration)'
         )
         parser.add_argument(
             '--industries',
             nargs='+',
-            default=['FMCG', 'Retail', 'SaaS', 'Software', 'Technology'],
-            help='Target industries for ICP matching'
+            default=None,
+            help='Target industries for ICP matching (default: active ICP configuration)'
         )
         parser.add_argument(
             '--cities',
             nargs='+',
-            default=['Copenhagen', 'København', 'Aarhus', 'Århus'],
-            help='Target cities for ICP matching'
+            default=None,
+            help='Target cities for ICP matching (default: active ICP configuration)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=None,
+            help='Concurrent CVR lookups per batch (default: CVR_ENRICHMENT MAX_WORKERS)'
+        )
+        parser.add_argument(
+            '--rate-limit',
+            type=float,
+            default=None,
+            help='Max CVR API requests per second, 0 for unlimited (default: CVR_ENRICHMENT setting)'
+        )
+        parser.add_argument(
+            '--in-database',
+            action='store_true',
+            help='Rescore with a single SQL UPDATE; only leads needing a CVR fetch are scored in Python'
         )
         parser.add_argument(
             '--dry-run',
@@ -51,12 +70,14 @@ class Command(BaseCommand):
         force = options['force']
         dry_run = options['dry_run']
         
-        # Create custom ICP criteria if provided
-        icp_criteria = ICPCriteria(
-            min_employees=options['min_employees'],
-            target_industries=options['industries'],
-            target_cities=options['cities']
-        )
+        # Start from the active ICP configuration, overridden by any options given
+        icp_criteria = active_criteria()
+        if options['min_employees'] is not None:
+            icp_criteria.min_employees = options['min_employees']
+        if options['industries'] is not None:
+            icp_criteria.target_industries = options['industries']
+        if options['cities'] is not None:
+            icp_criteria.target_cities = options['cities']
         
         # Create scorer with custom criteria
         scorer = CVRLeadScorer(icp_criteria)
@@ -66,8 +87,8 @@ class Command(BaseCommand):
             leads_query = Lead.objects.all()
             self.stdout.write(f"Force mode: Will score all {leads_query.count()} leads")
         else:
-            # Only score leads that haven't been scored or have default score
-            leads_query = Lead.objects.filter(Q(icp_score__lte=4) | Q(icp_score__isnull=True))
+            # Only score leads that have never been scored
+            leads_query = Lead.objects.filter(icp_scored_at__isnull=True)
             self.stdout.write(f"Will score {leads_query.count()} unscored leads")
         
         if not leads_query.exists():
@@ -96,6 +117,19 @@ class Command(BaseCommand):
                 self.stdout.write(f"... and {leads_query.count() - 10} more")
             return
         
+        if options['in_database']:
+            updated = rescore_in_database(leads_query, icp_criteria)
+            self.stdout.write(self.style.SUCCESS(f"\nRescored {updated} leads in the database"))
+            
+            # The UPDATE skips leads needing a CVR fetch, so they still match leads_query
+            leads_query = needs_cvr_fetch(leads_query)
+            fetch_count = leads_query.count()
+            if not fetch_count:
+                self.stdout.write(self.style.SUCCESS('No leads need a CVR fetch'))
+                return
+            
+            self.stdout.write(f"{fetch_count} leads need fresh CVR data and are scored in Python")
+        
         # Process leads in batches
         total_leads = leads_query.count()
         processed = 0
@@ -104,15 +138,19 @@ class Command(BaseCommand):
         
         self.stdout.write(f"\nProcessing {total_leads} leads in batches of {batch_size}...")
         
-        for i in range(0, total_leads, batch_size):
-            batch = list(leads_query[i:i + batch_size])
-            batch_number = (i // batch_size) + 1
-            
+        # Walk the leads by id: scored leads drop out of the unscored filter,
+        # so offset slicing would skip leads
+        batches = keyset_batches(leads_query, batch_size, fields=LOAD_FIELDS)
+        for batch_number, batch in enumerate(batches, start=1):
             self.stdout.write(f"\nProcessing batch {batch_number}: {len(batch)} leads")
             
             try:
                 # Score the batch
-                score_results = scorer.bulk_score_leads(batch)
+                score_results = scorer.bulk_score_leads(
+                    batch,
+                    max_workers=options['concurrency'],
+                    rate_limit=options['rate_limit']
+                )
                 
                 # Count successful scores
                 batch_scored = sum(1 for result in score_results if result.total_score > 4)
@@ -1,7 +1,8 @@
 import random
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from leads.models import Lead, FunnelStageHistory
+from leads.models import Lead
+from leads.services.funnel_transitions import advance_leads, churn_leads
+from leads.services.sampling import sample_pks
 
 
 class Command(BaseCommand):
@@ -14,9 +15,16 @@ class Command(BaseCommand):
             default=20,
             help='Percentage of leads to move forward (default: 20%)',
         )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Random seed for a reproducible simulation',
+        )
 
     def handle(self, *args, **options):
         percentage = options['percentage']
+        rng = random.Random(options['seed'])
         
         self.stdout.write(f'Moving {percentage}% of leads forward in the funnel...')
         
@@ -43,24 +51,15 @@ class Command(BaseCommand):
             base_move_count = int(stage_count * percentage / 100)
             chance_adjusted_count = int(base_move_count * rules['chance'] / 100)
             
-            # Randomly select leads to move
-            leads_to_move = random.sample(
-                list(leads_in_stage), 
-                min(chance_adjusted_count, stage_count)
-            )
+            # Randomly select leads to move; only their ids are loaded
+            leads_to_move = sample_pks(leads_in_stage, min(chance_adjusted_count, stage_count), rng)
             
-            for lead in leads_to_move:
-                old_stage = lead.funnel_stage
-                if lead.move_to_next_stage():
-                    moved_count += 1
-                    self.stdout.write(
-                        f'  Moved {lead.full_name} from {old_stage} to {lead.funnel_stage}'
-                    )
-                    
+            moved = sum(advance_leads(leads_to_move, notes='Advanced by simulation').values())
+            moved_count += moved
             total_processed += len(leads_to_move)
             
             self.stdout.write(
-                f'Stage {current_stage}: {len(leads_to_move)}/{stage_count} leads moved'
+                f'Stage {current_stage}: {moved}/{stage_count} leads moved to {rules["next"]}'
             )
         
         # Randomly churn some leads
@@ -68,20 +67,8 @@ class Command(BaseCommand):
         churn_count = int(active_leads.count() * 0.02)  # 2% churn rate
         
         if churn_count > 0:
-            leads_to_churn = random.sample(list(active_leads), churn_count)
-            for lead in leads_to_churn:
-                old_stage = lead.funnel_stage
-                lead.funnel_stage = 'churned'
-                lead.churned_at = timezone.now()
-                lead.save()
-                
-                FunnelStageHistory.objects.create(
-                    lead=lead,
-                    from_stage=old_stage,
-                    to_stage='churned',
-                    notes='Automatically churned by simulation'
-                )
-                
+            leads_to_churn = sample_pks(active_leads, churn_count, rng)
+            churn_leads(leads_to_churn, notes='Automatically churned by simulation')
             self.stdout.write(f'Churned {churn_count} leads')
         
         self.stdout.write(
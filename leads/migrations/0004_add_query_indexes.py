@@ -0,0 +1,68 @@
+# Generated by Django 5.2.4 on 2026-10-17 05:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leads", "0003_add_cvr_fields"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="funnelstagehistory",
+            index=models.Index(
+                fields=["changed_at", "to_stage"], name="funnel_history_changed_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(fields=["-created_at"], name="lead_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["funnel_stage", "form_submitted_at"],
+                name="lead_stage_submitted_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["funnel_stage", "meeting_booked_at"],
+                name="lead_stage_booked_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["funnel_stage", "meeting_held_at"], name="lead_stage_held_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["funnel_stage", "pilot_signed_at"], name="lead_stage_pilot_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["funnel_stage", "deal_closed_at"], name="lead_stage_closed_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(fields=["icp_score"], name="lead_icp_score_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                condition=models.Q(("cvr_number__isnull", False)),
+                fields=["cvr_number"],
+                name="lead_cvr_number_idx",
+            ),
+        ),
+    ]
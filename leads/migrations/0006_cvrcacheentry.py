@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-17 05:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("leads", "0005_scoringjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CVRCacheEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("cvr_number", models.CharField(max_length=8, unique=True)),
+                (
+                    "found",
+                    models.BooleanField(
+                        default=True,
+                        help_text="False caches a 'company not found' answer",
+                    ),
+                ),
+                (
+                    "data",
+                    models.JSONField(
+                        blank=True, default=dict, help_text="CVRCompanyData fields"
+                    ),
+                ),
+                ("etag", models.CharField(blank=True, max_length=255)),
+                ("fetched_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "verbose_name": "CVR cache entry",
+                "verbose_name_plural": "CVR cache entries",
+            },
+        ),
+    ]
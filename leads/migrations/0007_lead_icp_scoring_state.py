@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("leads", "0006_cvrcacheentry"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lead",
+            name="icp_criteria_hash",
+            field=models.CharField(
+                blank=True,
+                help_text="Fingerprint of the ICP criteria used for icp_score",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="lead",
+            name="icp_scored_at",
+            field=models.DateTimeField(
+                blank=True, help_text="When icp_score was last computed", null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(fields=["icp_scored_at"], name="lead_icp_scored_at_idx"),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("leads", "0007_lead_icp_scoring_state"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ICPConfiguration",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.PositiveIntegerField(unique=True)),
+                ("min_employees", models.PositiveIntegerField(default=200)),
+                ("target_industries", models.JSONField(blank=True, default=list)),
+                ("target_cities", models.JSONField(blank=True, default=list)),
+                ("target_employee_levels", models.JSONField(blank=True, default=list)),
+                (
+                    "criteria_hash",
+                    models.CharField(
+                        help_text="ICPCriteria fingerprint stored on leads scored with this version",
+                        max_length=64,
+                    ),
+                ),
+                ("is_active", models.BooleanField(default=False)),
+                ("notes", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "ICP configuration",
+                "ordering": ["-version"],
+            },
+        ),
+        migrations.AddField(
+            model_name="lead",
+            name="icp_inputs_hash",
+            field=models.CharField(
+                blank=True,
+                help_text="Fingerprint of the lead fields icp_score was computed from",
+                max_length=32,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["icp_criteria_hash"], name="lead_icp_criteria_hash_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="icpconfiguration",
+            name="created_by",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="icp_configurations",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="icpconfiguration",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_active", True)),
+                fields=("is_active",),
+                name="icp_config_single_active",
+            ),
+        ),
+    ]
@@ -39,6 +39,14 @@ class Lead(models.Model):
         ('churned', 'Churned'),
     ]
     
+    # Stage a lead advances to from each open stage, and the timestamp it sets
+    STAGE_PROGRESSION = {
+        'form_submitted': ('meeting_booked', 'meeting_booked_at'),
+        'meeting_booked': ('meeting_held', 'meeting_held_at'),
+        'meeting_held': ('pilot_signed', 'pilot_signed_at'),
+        'pilot_signed': ('deal_closed', 'deal_closed_at'),
+    }
+    
     SALUTATIONS = [
         ('mr', 'Mr.'),
         ('mrs', 'Mrs.'),
@@ -96,6 +104,9 @@ class Lead(models.Model):
     cvr_last_updated = models.DateTimeField(null=True, blank=True, help_text="When CVR data was last fetched")
     icp_score = models.IntegerField(default=4, help_text="ICP matching score (4-12 points)")
     icp_score_breakdown = models.JSONField(default=dict, blank=True, help_text="Detailed ICP scoring breakdown")
+    icp_criteria_hash = models.CharField(max_length=64, blank=True, help_text="Fingerprint of the ICP criteria used for icp_score")
+    icp_scored_at = models.DateTimeField(null=True, blank=True, help_text="When icp_score was last computed")
+    icp_inputs_hash = models.CharField(max_length=32, blank=True, help_text="Fingerprint of the lead fields icp_score was computed from")
     
     # Communication preferences
     do_not_call = models.BooleanField(default=False)
@@ -111,6 +122,24 @@ class Lead(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='lead_created_idx'),
+            # Funnel reports filter on the current stage and stage timestamps
+            models.Index(fields=['funnel_stage', 'form_submitted_at'], name='lead_stage_submitted_idx'),
+            models.Index(fields=['funnel_stage', 'meeting_booked_at'], name='lead_stage_booked_idx'),
+            models.Index(fields=['funnel_stage', 'meeting_held_at'], name='lead_stage_held_idx'),
+            models.Index(fields=['funnel_stage', 'pilot_signed_at'], name='lead_stage_pilot_idx'),
+            models.Index(fields=['funnel_stage', 'deal_closed_at'], name='lead_stage_closed_idx'),
+            # Lead scoring
+            models.Index(fields=['icp_score'], name='lead_icp_score_idx'),
+            models.Index(fields=['icp_scored_at'], name='lead_icp_scored_at_idx'),
+            models.Index(fields=['icp_criteria_hash'], name='lead_icp_criteria_hash_idx'),
+            models.Index(
+                fields=['cvr_number'],
+                name='lead_cvr_number_idx',
+                condition=models.Q(cvr_number__isnull=False),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.company}"
@@ -123,16 +152,13 @@ class Lead(models.Model):
         return reverse('leads:detail', kwargs={'pk': self.pk})
     
     def move_to_next_stage(self):
-        """Move lead to the next funnel stage and update timestamp"""
-        stage_progression = {
-            'form_submitted': ('meeting_booked', 'meeting_booked_at'),
-            'meeting_booked': ('meeting_held', 'meeting_held_at'),
-            'meeting_held': ('pilot_signed', 'pilot_signed_at'),
-            'pilot_signed': ('deal_closed', 'deal_closed_at'),
-        }
+        """
+        Move lead to the next funnel stage and update timestamp
         
-        if self.funnel_stage in stage_progression:
-            next_stage, timestamp_field = stage_progression[self.funnel_stage]
+        For many leads use leads.services.funnel_transitions.advance_leads.
+        """
+        if self.funnel_stage in self.STAGE_PROGRESSION:
+            next_stage, timestamp_field = self.STAGE_PROGRESSION[self.funnel_stage]
             old_stage = self.funnel_stage
             self.funnel_stage = next_stage
             setattr(self, timestamp_field, timezone.now())
@@ -169,6 +195,106 @@ class FunnelStageHistory(models.Model):
     
     class Meta:
         ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['changed_at', 'to_stage'], name='funnel_history_changed_idx'),
+        ]
         
     def __str__(self):
         return f"{self.lead} moved from {self.from_stage} to {self.to_stage}"
+
+
+class ScoringJob(models.Model):
+    """Background ICP scoring run over the unscored leads"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('cancelled', 'Cancelled'),
+        ('failed', 'Failed'),
+    ]
+    ACTIVE_STATUSES = ('pending', 'running')
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    batch_size = models.PositiveIntegerField(default=50)
+    
+    # Progress
+    total_leads = models.PositiveIntegerField(default=0)
+    processed_count = models.PositiveIntegerField(default=0)
+    scored_count = models.PositiveIntegerField(default=0)
+    last_processed_id = models.BigIntegerField(default=0, help_text="Leads up to this id have been processed")
+    
+    cancel_requested = models.BooleanField(default=False)
+    error = models.TextField(blank=True)
+    celery_task_id = models.CharField(max_length=255, blank=True)
+    
+    # Tracking
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='scoring_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status'], name='scoring_job_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Scoring job {self.pk} ({self.status})"
+    
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+    
+    @property
+    def progress_percentage(self):
+        if not self.total_leads:
+            return 100.0 if self.status == 'completed' else 0.0
+        return round(min(self.processed_count, self.total_leads) / self.total_leads * 100, 1)
+
+
+class CVRCacheEntry(models.Model):
+    """Persistent CVR lookup result, shared by all workers and kept across restarts"""
+    cvr_number = models.CharField(max_length=8, unique=True)
+    found = models.BooleanField(default=True, help_text="False caches a 'company not found' answer")
+    data = models.JSONField(default=dict, blank=True, help_text="CVRCompanyData fields")
+    etag = models.CharField(max_length=255, blank=True)
+    fetched_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'CVR cache entry'
+        verbose_name_plural = 'CVR cache entries'
+    
+    def __str__(self):
+        return f"CVR {self.cvr_number} ({'found' if self.found else 'not found'})"
+
+
+class ICPConfiguration(models.Model):
+    """A published version of the ICP criteria; exactly one version is active"""
+    version = models.PositiveIntegerField(unique=True)
+    min_employees = models.PositiveIntegerField(default=200)
+    target_industries = models.JSONField(default=list, blank=True)
+    target_cities = models.JSONField(default=list, blank=True)
+    target_employee_levels = models.JSONField(default=list, blank=True)
+    criteria_hash = models.CharField(max_length=64, help_text="ICPCriteria fingerprint stored on leads scored with this version")
+    is_active = models.BooleanField(default=False)
+    notes = models.TextField(blank=True)
+    
+    # Tracking
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='icp_configurations')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-version']
+        verbose_name = 'ICP configuration'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['is_active'],
+                condition=models.Q(is_active=True),
+                name='icp_config_single_active',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"ICP configuration v{self.version}{' (active)' if self.is_active else ''}"
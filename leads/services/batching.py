@@ -0,0 +1,88 @@
+"""
+Keyset batch iteration over large querysets
+
+Offset pagination (``queryset[i:i + n]``) rescans every skipped row, so
+batch k costs O(k * n), and it skips rows when processing a batch removes
+leads from the filtered set (e.g. "unscored" leads once they are scored).
+These helpers instead page on the primary key: each batch is
+``filter(pk__gt=last_pk).order_by('pk')[:n]``, an index range scan whose
+cost does not depend on how far the walk has progressed, and rows leaving
+or entering the filter behind the cursor cannot shift later batches.
+
+Rows are fetched with ``iterator(chunk_size=...)`` so no queryset result
+cache is kept. ``fields`` restricts the loaded columns with ``only()``.
+"""
+from typing import Iterator, List, Optional, Sequence
+
+from django.db import connection
+from django.db.models import Model, QuerySet
+
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def _prepare(queryset: QuerySet, fields: Optional[Sequence[str]]) -> QuerySet:
+    queryset = queryset.order_by('pk')
+    if fields:
+        queryset = queryset.only('pk', *fields)
+    return queryset
+
+
+def keyset_batches(queryset: QuerySet, batch_size: int = DEFAULT_BATCH_SIZE,
+                   fields: Optional[Sequence[str]] = None, start_after=None) -> Iterator[List[Model]]:
+    """
+    Yield the rows of ``queryset`` in primary key order, ``batch_size`` at a time
+
+    Args:
+        queryset: Rows to walk; any ordering is replaced by the primary key
+        batch_size: Rows per batch
+        fields: Load only these fields (plus the primary key)
+        start_after: Resume after this primary key
+
+    The filter is re-evaluated for every batch, so rows updated by the
+    caller between batches are seen in their current state.
+    """
+    if batch_size <= 0:
+        raise ValueError('batch_size must be positive')
+
+    queryset = _prepare(queryset, fields)
+    last_pk = start_after
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        batch = list(page[:batch_size].iterator(chunk_size=batch_size))
+        if not batch:
+            return
+        last_pk = batch[-1].pk
+        yield batch
+
+
+def keyset_iterator(queryset: QuerySet, chunk_size: int = DEFAULT_BATCH_SIZE,
+                    fields: Optional[Sequence[str]] = None, start_after=None) -> Iterator[Model]:
+    """Yield the rows of ``queryset`` one by one, fetched in keyset batches"""
+    for batch in keyset_batches(queryset, chunk_size, fields, start_after):
+        yield from batch
+
+
+def keyset_pks(queryset: QuerySet, chunk_size: int = DEFAULT_BATCH_SIZE * 10) -> Iterator:
+    """Yield the primary keys of ``queryset`` in order without loading model instances"""
+    if chunk_size <= 0:
+        raise ValueError('chunk_size must be positive')
+
+    queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        pks = list(page[:chunk_size])
+        if not pks:
+            return
+        last_pk = pks[-1]
+        yield from pks
+
+
+def pk_chunks(pks: List) -> Iterator[List]:
+    """Split primary keys into ``pk__in`` lists within the database's bound parameter limit"""
+    max_params = connection.features.max_query_params
+    # Leave room for the other parameters of the query
+    size = max(max_params - 20, 1) if max_params else max(len(pks), 1)
+    for start in range(0, len(pks), size):
+        yield pks[start:start + size]
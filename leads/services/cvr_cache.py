@@ -0,0 +1,294 @@
+"""
+Two-tier cache for CVR lookups
+
+Tier one is a per-process LRU of CVRCompanyData. Tier two is the
+CVRCacheEntry table, which is shared by every worker and survives restarts.
+Entries carry the time they were fetched and the API's ETag, so they are
+classified on read as:
+
+- fresh: younger than the TTL (a shorter TTL for "not found" answers),
+- stale: past the TTL but inside the stale window; served as-is while the
+  client revalidates it in the background,
+- expired: too old to serve; the client refetches, sending the ETag so an
+  unchanged company costs a 304 rather than a full response.
+"""
+import logging
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import CVRCacheEntry
+
+if TYPE_CHECKING:
+    from .cvr_client import CVRCompanyData
+
+
+logger = logging.getLogger(__name__)
+
+
+FRESH = 'fresh'
+STALE = 'stale'
+EXPIRED = 'expired'
+MISS = 'miss'
+
+DEFAULT_CACHE_SETTINGS = {
+    'TTL': 86400,                  # 24 hours
+    'NEGATIVE_TTL': 3600,          # "not found" answers: 1 hour
+    'STALE_WHILE_REVALIDATE': 7 * 86400,
+    'MEMORY_SIZE': 2048,
+}
+
+
+@dataclass
+class CacheEntry:
+    """A cached lookup result; ``data`` is None for "company not found\""""
+    data: Optional['CVRCompanyData']
+    fetched_at: datetime
+    etag: str = ''
+
+    @property
+    def found(self) -> bool:
+        return self.data is not None
+
+
+@dataclass
+class CacheLookup:
+    """Result of a cache read: the entry (if any) and its freshness"""
+    state: str
+    entry: Optional[CacheEntry] = None
+
+    @property
+    def data(self) -> Optional['CVRCompanyData']:
+        return self.entry.data if self.entry else None
+
+    @property
+    def etag(self) -> str:
+        return self.entry.etag if self.entry else ''
+
+
+def _company_from_dict(data: Dict) -> 'CVRCompanyData':
+    # cvr_client imports this module, so resolve the dataclass lazily
+    from .cvr_client import CVRCompanyData
+
+    known = {field.name for field in fields(CVRCompanyData)}
+    return CVRCompanyData(**{key: value for key, value in data.items() if key in known})
+
+
+class CVRCache:
+    """In-process LRU in front of the persistent CVRCacheEntry table"""
+
+    def __init__(self, ttl: Optional[int] = None, negative_ttl: Optional[int] = None,
+                 stale_ttl: Optional[int] = None, memory_size: Optional[int] = None):
+        config = {**DEFAULT_CACHE_SETTINGS, **getattr(settings, 'CVR_CACHE', {})}
+        self.ttl = timedelta(seconds=config['TTL'] if ttl is None else ttl)
+        self.negative_ttl = timedelta(seconds=config['NEGATIVE_TTL'] if negative_ttl is None else negative_ttl)
+        self.stale_ttl = timedelta(
+            seconds=config['STALE_WHILE_REVALIDATE'] if stale_ttl is None else stale_ttl
+        )
+        self.memory_size = config['MEMORY_SIZE'] if memory_size is None else memory_size
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    # Freshness
+
+    def _state(self, entry: CacheEntry, now: datetime) -> str:
+        age = now - entry.fetched_at
+        if not entry.found:
+            # Negative answers are cheap to re-ask and never served stale
+            return FRESH if age < self.negative_ttl else EXPIRED
+        if age < self.ttl:
+            return FRESH
+        if age < self.ttl + self.stale_ttl:
+            return STALE
+        return EXPIRED
+
+    # Tier one: in-process LRU
+
+    def _memory_get(self, cvr_number: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._memory.get(cvr_number)
+            if entry is not None:
+                self._memory.move_to_end(cvr_number)
+            return entry
+
+    def _memory_set(self, cvr_number: str, entry: CacheEntry) -> None:
+        if self.memory_size <= 0:
+            return
+        with self._lock:
+            self._memory[cvr_number] = entry
+            self._memory.move_to_end(cvr_number)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    # Tier two: CVRCacheEntry table
+
+    def _db_get(self, cvr_number: str) -> Optional[CacheEntry]:
+        row = CVRCacheEntry.objects.filter(cvr_number=cvr_number).first()
+        if row is None:
+            return None
+        data = _company_from_dict(row.data) if row.found else None
+        return CacheEntry(data=data, fetched_at=row.fetched_at, etag=row.etag)
+
+    def _db_set(self, cvr_number: str, entry: CacheEntry) -> None:
+        try:
+            CVRCacheEntry.objects.update_or_create(
+                cvr_number=cvr_number,
+                defaults={
+                    'found': entry.found,
+                    'data': entry.data.to_dict() if entry.data else {},
+                    'etag': entry.etag,
+                    'fetched_at': entry.fetched_at,
+                }
+            )
+        except DatabaseError as e:
+            # The memory tier still holds the entry; losing the write only costs a refetch
+            logger.warning(f"Could not persist CVR cache entry {cvr_number}: {e}")
+            self._incr('write_errors')
+
+    # Public API
+
+    def get(self, cvr_number: str) -> CacheLookup:
+        """Look up a CVR number in memory, then in the table"""
+        now = timezone.now()
+
+        entry = self._memory_get(cvr_number)
+        if entry is not None and self._state(entry, now) == FRESH:
+            self._record_hit('memory_hits', entry)
+            return CacheLookup(FRESH, entry)
+
+        return self._classify(cvr_number, entry, self._db_get(cvr_number), now)
+
+    def _classify(self, cvr_number: str, entry: Optional[CacheEntry],
+                  db_entry: Optional[CacheEntry], now: datetime) -> CacheLookup:
+        """Pick the newer of the memory and table entries and count the outcome"""
+        if db_entry is not None and (entry is None or db_entry.fetched_at >= entry.fetched_at):
+            entry = db_entry
+            self._memory_set(cvr_number, entry)
+            tier = 'db_hits'
+        else:
+            tier = 'memory_hits'
+
+        if entry is None:
+            self._incr('misses')
+            return CacheLookup(MISS)
+
+        state = self._state(entry, now)
+        if state == FRESH:
+            self._record_hit(tier, entry)
+        elif state == STALE:
+            self._incr('stale_hits')
+        else:
+            self._incr('misses')
+        return CacheLookup(state, entry)
+
+    def get_many(self, cvr_numbers: Iterable[str]) -> Dict[str, CacheLookup]:
+        """Batched ``get``: one table query for everything not fresh in memory"""
+        now = timezone.now()
+        results = {}
+        memory_entries = {}
+
+        for cvr_number in cvr_numbers:
+            entry = self._memory_get(cvr_number)
+            if entry is not None and self._state(entry, now) == FRESH:
+                self._record_hit('memory_hits', entry)
+                results[cvr_number] = CacheLookup(FRESH, entry)
+            else:
+                memory_entries[cvr_number] = entry
+
+        rows = CVRCacheEntry.objects.filter(cvr_number__in=list(memory_entries)) if memory_entries else []
+        db_entries = {
+            row.cvr_number: CacheEntry(
+                data=_company_from_dict(row.data) if row.found else None,
+                fetched_at=row.fetched_at,
+                etag=row.etag
+            )
+            for row in rows
+        }
+
+        for cvr_number, entry in memory_entries.items():
+            results[cvr_number] = self._classify(cvr_number, entry, db_entries.get(cvr_number), now)
+
+        return results
+
+    def set(self, cvr_number: str, data: Optional['CVRCompanyData'], etag: str = '') -> CacheEntry:
+        """Store a lookup result; ``data=None`` records "not found\""""
+        entry = CacheEntry(data=data, fetched_at=timezone.now(), etag=etag or '')
+        self._memory_set(cvr_number, entry)
+        self._db_set(cvr_number, entry)
+        return entry
+
+    def touch(self, cvr_number: str, entry: CacheEntry) -> CacheEntry:
+        """Mark an entry as revalidated (the API answered 304 Not Modified)"""
+        return self.set(cvr_number, entry.data, entry.etag)
+
+    def servable_q(self, prefix: str = '') -> Q:
+        """
+        Filter for CVRCacheEntry rows that can be served without a refetch
+
+        Positive entries are servable while fresh or stale, negative ones
+        only while fresh. ``prefix`` is prepended to the field names for use
+        across a relation.
+        """
+        now = timezone.now()
+        return (
+            Q(**{f'{prefix}found': True, f'{prefix}fetched_at__gte': now - self.ttl - self.stale_ttl}) |
+            Q(**{f'{prefix}found': False, f'{prefix}fetched_at__gte': now - self.negative_ttl})
+        )
+
+    def invalidate(self, cvr_number: str) -> None:
+        with self._lock:
+            self._memory.pop(cvr_number, None)
+        CVRCacheEntry.objects.filter(cvr_number=cvr_number).delete()
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+    # Statistics
+
+    def _incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    def _record_hit(self, tier: str, entry: CacheEntry) -> None:
+        self._incr(tier)
+        if not entry.found:
+            self._incr('negative_hits')
+
+    def record(self, name: str) -> None:
+        """Count an event reported by the client (refreshes, 304s, errors)"""
+        self._incr(name)
+
+    def stats(self) -> Dict[str, float]:
+        """Counters for this process since it started"""
+        with self._lock:
+            stats = dict(self._stats)
+            memory_entries = len(self._memory)
+
+        hits = stats.get('memory_hits', 0) + stats.get('db_hits', 0)
+        lookups = hits + stats.get('stale_hits', 0) + stats.get('misses', 0)
+        return {
+            'memory_hits': stats.get('memory_hits', 0),
+            'db_hits': stats.get('db_hits', 0),
+            'negative_hits': stats.get('negative_hits', 0),
+            'stale_hits': stats.get('stale_hits', 0),
+            'misses': stats.get('misses', 0),
+            'refreshes': stats.get('refreshes', 0),
+            'not_modified': stats.get('not_modified', 0),
+            'fetch_errors': stats.get('fetch_errors', 0),
+            'coalesced': stats.get('coalesced', 0),
+            'write_errors': stats.get('write_errors', 0),
+            'hit_rate': round((hits + stats.get('stale_hits', 0)) / lookups, 3) if lookups else 0.0,
+            'memory_entries': memory_entries,
+            'memory_size': self.memory_size,
+            'persistent_entries': CVRCacheEntry.objects.count(),
+        }
@@ -4,10 +4,15 @@ Integrates with cvrapi.dk to get company information for lead scoring
 """
 import requests
 import logging
-from typing import Dict, Optional, Any
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Any, Tuple
 from dataclasses import dataclass, asdict
 from django.conf import settings
-from django.core.cache import cache
+from django.db import close_old_connections
+
+from .cvr_cache import CVRCache, CacheEntry, FRESH, STALE
 
 
 logger = logging.getLogger(__name__)
@@ -42,6 +47,59 @@ class CVRAPIError(Exception):
     pass
 
 
+class CVRNotFoundError(CVRAPIError):
+    """The CVR API has no company for the requested number"""
+    pass
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket
+
+    Allows ``rate`` acquisitions per second on average with bursts of up to
+    ``burst`` calls. A rate of 0 or None disables throttling.
+    """
+
+    def __init__(self, rate: Optional[float], burst: Optional[int] = None):
+        self.rate = rate or 0
+        self.capacity = burst or max(1, int(self.rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a call is allowed"""
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+FOUND = 'found'
+NOT_FOUND = 'not_found'
+NOT_MODIFIED = 'not_modified'
+FETCH_ERROR = 'error'
+
+
+@dataclass
+class FetchResult:
+    """Outcome of one API request for a company"""
+    outcome: str
+    data: Optional[CVRCompanyData] = None
+    etag: str = ''
+
+
 class CVRAPIClient:
     """
     Client for interacting with cvrapi.dk
@@ -51,9 +109,8 @@ class CVRAPIClient:
     """
     
     BASE_URL = "https://cvrapi.dk/api"
-    CACHE_TTL = 86400  # 24 hours
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, cache: Optional[CVRCache] = None):
         self.api_key = api_key or getattr(settings, 'CVR_API_KEY', None)
         if not self.api_key:
             logger.warning("CVR_API_KEY not set in settings. CVR lookups will be limited.")
@@ -63,26 +120,48 @@ class CVRAPIClient:
             'User-Agent': 'CRM-LeadScoring/1.0',
             'Accept': 'application/json'
         })
+        
+        self.cache = cache or CVRCache()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cvr-refresh')
+        self._refresh_lock = threading.Lock()
+        self._refreshing = set()
+        self._inflight_lock = threading.Lock()
+        self._inflight = {}
     
-    def _make_request(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Make HTTP request to CVR API"""
+    def _make_request(self, endpoint: str, params: Dict[str, Any],
+                      etag: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Make HTTP request to CVR API
+        
+        Sends ``If-None-Match`` when an ETag is given. Returns (data, etag),
+        where data is None if the API answered 304 Not Modified.
+        """
         url = f"{self.BASE_URL}/{endpoint}"
         
         # Add API key if available
         if self.api_key:
             params['token'] = self.api_key
         
+        headers = {'If-None-Match': etag} if etag else None
+        
         try:
-            response = self.session.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, headers=headers, timeout=10)
+            if response.status_code == 304:
+                return None, etag
+            if response.status_code == 404:
+                raise CVRNotFoundError(f"CVR API Error: {response.status_code} not found")
             response.raise_for_status()
             
             data = response.json()
             
             # Check for API errors
             if 'error' in data:
-                raise CVRAPIError(f"CVR API Error: {data.get('error', 'Unknown error')}")
+                error = str(data.get('error', 'Unknown error'))
+                if 'NOT_FOUND' in error.upper():
+                    raise CVRNotFoundError(f"CVR API Error: {error}")
+                raise CVRAPIError(f"CVR API Error: {error}")
             
-            return data
+            return data, response.headers.get('ETag', '')
             
         except requests.RequestException as e:
             logger.error(f"CVR API request failed: {e}")
@@ -91,10 +170,19 @@ class CVRAPIClient:
             logger.error(f"Invalid JSON response from CVR API: {e}")
             raise CVRAPIError("Invalid response format from CVR API")
     
+    @staticmethod
+    def clean_cvr_number(cvr_number: str) -> Optional[str]:
+        """Strip formatting from a CVR number; None if it is not 8 digits"""
+        cvr_clean = ''.join(filter(str.isdigit, cvr_number or ''))
+        return cvr_clean if len(cvr_clean) == 8 else None
+    
     def lookup_by_cvr(self, cvr_number: str) -> Optional[CVRCompanyData]:
         """
         Look up company by CVR number
         
+        Served from the two-tier cache when possible. Stale entries are
+        returned immediately and refreshed in the background.
+        
         Args:
             cvr_number: 8-digit CVR number
             
@@ -102,37 +190,188 @@ class CVRAPIClient:
             CVRCompanyData object or None if not found
         """
         # Clean CVR number
-        cvr_clean = ''.join(filter(str.isdigit, cvr_number))
-        if len(cvr_clean) != 8:
+        cvr_clean = self.clean_cvr_number(cvr_number)
+        if not cvr_clean:
             logger.warning(f"Invalid CVR number format: {cvr_number}")
             return None
         
         # Check cache first
-        cache_key = f"cvr_data_{cvr_clean}"
-        cached_data = cache.get(cache_key)
-        if cached_data:
+        cached = self.cache.get(cvr_clean)
+        if cached.state == FRESH:
             logger.info(f"Using cached CVR data for {cvr_clean}")
-            return CVRCompanyData(**cached_data)
+            return cached.data
+        if cached.state == STALE:
+            logger.info(f"Using stale CVR data for {cvr_clean}, revalidating")
+            self._refresh_in_background(cvr_clean, cached.entry)
+            return cached.data
+        
+        return self._fetch(cvr_clean, cached.entry)
+    
+    def lookup_many(self, cvr_numbers: Iterable[str], max_workers: Optional[int] = None,
+                    rate_limiter: Optional['RateLimiter'] = None) -> Dict[str, Optional[CVRCompanyData]]:
+        """
+        Look up several companies at once
         
+        CVR numbers are cleaned and deduplicated, cached entries are read in
+        one pass over both cache tiers, and the rest are fetched concurrently.
+        A number already being fetched by another thread is waited on rather
+        than requested twice.
+        
+        Args:
+            cvr_numbers: CVR numbers in any format; invalid ones are skipped
+            max_workers: Concurrent API requests (default: CVR_ENRICHMENT MAX_WORKERS)
+            rate_limiter: Optional RateLimiter every API request must pass
+            
+        Returns:
+            {cleaned CVR number: CVRCompanyData or None if not found}
+        """
+        cleaned = []
+        for cvr_number in cvr_numbers:
+            cvr_clean = self.clean_cvr_number(cvr_number)
+            if cvr_clean:
+                cleaned.append(cvr_clean)
+            else:
+                logger.warning(f"Invalid CVR number format: {cvr_number}")
+        unique = list(dict.fromkeys(cleaned))
+        
+        results = {}
+        to_fetch = []
+        for cvr_clean, cached in self.cache.get_many(unique).items():
+            if cached.state == FRESH:
+                results[cvr_clean] = cached.data
+            elif cached.state == STALE:
+                self._refresh_in_background(cvr_clean, cached.entry)
+                results[cvr_clean] = cached.data
+            else:
+                to_fetch.append((cvr_clean, cached.entry))
+        
+        if to_fetch:
+            workers = min(max_workers or getattr(settings, 'CVR_ENRICHMENT', {}).get('MAX_WORKERS', 8),
+                          len(to_fetch))
+            logger.info(f"Fetching {len(to_fetch)} of {len(unique)} CVR records with {workers} workers")
+            
+            # Worker threads only talk to the API; results are stored on this
+            # thread so cache writes never contend for the database. (Stale
+            # entries are revalidated by _refresh, which does write from its
+            # own thread.)
+            def fetch(item):
+                cvr_clean, previous = item
+                if rate_limiter:
+                    rate_limiter.acquire()
+                return self._fetch_once(cvr_clean, previous)
+            
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cvr-lookup') as executor:
+                futures = [executor.submit(fetch, item) for item in to_fetch]
+            
+            for (cvr_clean, previous), future in zip(to_fetch, futures):
+                try:
+                    leader, result = future.result()
+                except Exception as e:
+                    # One failed lookup must not lose the rest of the batch
+                    logger.error(f"Failed to lookup CVR {cvr_clean}: {e}")
+                    self.cache.record('fetch_errors')
+                    results[cvr_clean] = None
+                    continue
+                results[cvr_clean] = self._store(cvr_clean, previous, result) if leader else result.data
+        
+        return {cvr_clean: results.get(cvr_clean) for cvr_clean in unique}
+    
+    def _fetch_once(self, cvr_clean: str, previous: Optional[CacheEntry] = None) -> Tuple[bool, FetchResult]:
+        """
+        Request a company, coalescing concurrent requests for the same number
+        
+        The first caller performs the request; callers arriving while it is
+        in flight wait for and share its result. Returns (leader, result) so
+        only the caller that made the request stores it.
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(cvr_clean)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[cvr_clean] = future
+        
+        if not leader:
+            self.cache.record('coalesced')
+            return False, future.result()
+        
+        try:
+            result = self._request_company(cvr_clean, previous)
+            future.set_result(result)
+            return True, result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(cvr_clean, None)
+    
+    def _request_company(self, cvr_clean: str, previous: Optional[CacheEntry] = None) -> FetchResult:
+        """Fetch a company from the API without touching the cache"""
         try:
             logger.info(f"Fetching CVR data for {cvr_clean}")
-            data = self._make_request('', {'vat': cvr_clean, 'format': 'json'})
+            data, etag = self._make_request(
+                '', {'vat': cvr_clean, 'format': 'json'},
+                etag=previous.etag if previous and previous.found else None
+            )
             
-            if not data or 'name' not in data:
-                logger.warning(f"No company data found for CVR {cvr_clean}")
-                return None
+            if data is None:
+                return FetchResult(NOT_MODIFIED, previous.data, etag)
             
-            # Parse the response
-            company_data = self._parse_cvr_response(data, cvr_clean)
-            
-            # Cache the result
-            cache.set(cache_key, company_data.to_dict(), self.CACHE_TTL)
+            if 'name' not in data:
+                raise CVRNotFoundError(f"No company data in response for CVR {cvr_clean}")
             
-            return company_data
+            # Parse the response
+            return FetchResult(FOUND, self._parse_cvr_response(data, cvr_clean), etag)
             
+        except CVRNotFoundError:
+            logger.warning(f"No company data found for CVR {cvr_clean}")
+            return FetchResult(NOT_FOUND)
         except CVRAPIError as e:
             logger.error(f"Failed to lookup CVR {cvr_clean}: {e}")
-            return None
+            return FetchResult(FETCH_ERROR)
+    
+    def _store(self, cvr_clean: str, previous: Optional[CacheEntry], result: FetchResult) -> Optional[CVRCompanyData]:
+        """Record a fetch result in the cache and return the company data"""
+        if result.outcome == NOT_MODIFIED:
+            self.cache.record('not_modified')
+            self.cache.touch(cvr_clean, previous)
+        elif result.outcome == FETCH_ERROR:
+            self.cache.record('fetch_errors')
+        else:
+            self.cache.set(cvr_clean, result.data, result.etag)
+        return result.data
+    
+    def _fetch(self, cvr_clean: str, previous: Optional[CacheEntry] = None) -> Optional[CVRCompanyData]:
+        """Fetch a company (coalesced) and store the answer in the cache"""
+        leader, result = self._fetch_once(cvr_clean, previous)
+        if leader:
+            return self._store(cvr_clean, previous, result)
+        return result.data
+    
+    def _refresh_in_background(self, cvr_clean: str, entry: CacheEntry) -> None:
+        """Revalidate a stale entry once, off the request thread"""
+        with self._refresh_lock:
+            if cvr_clean in self._refreshing:
+                return
+            self._refreshing.add(cvr_clean)
+        
+        self._refresh_executor.submit(self._refresh, cvr_clean, entry)
+    
+    def _refresh(self, cvr_clean: str, entry: CacheEntry) -> None:
+        try:
+            self.cache.record('refreshes')
+            self._fetch(cvr_clean, entry)
+        except Exception as e:
+            logger.error(f"Background refresh of CVR {cvr_clean} failed: {e}")
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(cvr_clean)
+            close_old_connections()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit, miss and stale counters for the CVR cache in this process"""
+        return self.cache.stats()
     
     def search_by_name(self, company_name: str, limit: int = 10) -> list[CVRCompanyData]:
         """
@@ -147,23 +386,19 @@ class CVRAPIClient:
         """
         try:
             logger.info(f"Searching companies by name: {company_name}")
-            data = self._make_request('search', {
+            data, _etag = self._make_request('search', {
                 'search': company_name,
                 'limit': limit,
                 'format': 'json'
             })
             
-            results = []
             companies = data.get('hits', [])
             
-            for company in companies:
-                if 'vat' in company:
-                    # Get full data for each company
-                    full_data = self.lookup_by_cvr(company['vat'])
-                    if full_data:
-                        results.append(full_data)
+            # Get full data for every hit in one batched lookup
+            cvr_numbers = [str(company['vat']) for company in companies if 'vat' in company]
+            full_data = self.lookup_many(cvr_numbers)
             
-            return results
+            return [company for company in full_data.values() if company]
             
         except CVRAPIError as e:
             logger.error(f"Failed to search companies by name {company_name}: {e}")
@@ -241,7 +476,7 @@ class CVRAPIClient:
     def get_api_usage(self) -> Dict[str, Any]:
         """Get API usage statistics (if supported by the API)"""
         try:
-            data = self._make_request('usage', {})
+            data, _etag = self._make_request('usage', {})
             return data
         except CVRAPIError:
             return {}
@@ -1,15 +1,18 @@
 """
 Lead Scoring Service using CVR API data and ICP criteria
 """
+import hashlib
+import json
 import logging
 from typing import Dict, Any, Optional, List
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from datetime import datetime
 from django.utils import timezone
 from decimal import Decimal
 
 from ..models import Lead
 from .cvr_client import cvr_client, CVRCompanyData, CVRAPIError
+from .icp_matcher import CompiledICPMatcher, columns_for
 
 
 logger = logging.getLogger(__name__)
@@ -34,6 +37,11 @@ class ICPCriteria:
                 'VP', 'Vice President', 'CEO', 'CTO', 'CFO', 'COO',
                 'Head of', 'Chief', 'Executive', 'Principal'
             ]
+    
+    def fingerprint(self) -> str:
+        """Stable hash of the criteria, stored on each lead scored with them"""
+        payload = json.dumps(asdict(self), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
 
 
 @dataclass
@@ -65,7 +73,11 @@ class LeadScoreBreakdown:
     
     def get_score_grade(self) -> str:
         """Get letter grade based on score"""
-        percentage = self.get_score_percentage()
+        return self.grade_for_percentage(self.get_score_percentage())
+    
+    @staticmethod
+    def grade_for_percentage(percentage: float) -> str:
+        """Letter grade for a score percentage (see get_score_percentage)"""
         if percentage >= 90:
             return 'A+'
         elif percentage >= 80:
@@ -104,12 +116,42 @@ class LeadScoreBreakdown:
         }
 
 
+# Lead fields written by every scoring run
+SCORE_FIELDS = ('icp_score', 'icp_score_breakdown', 'icp_criteria_hash', 'icp_inputs_hash', 'icp_scored_at')
+
+# Lead fields a score is computed from, fingerprinted in icp_inputs_hash
+INPUT_FIELDS = ('employees', 'industry', 'title', 'city', 'cvr_number')
+INPUTS_SEPARATOR = '|'
+
+# Lead fields read or written while scoring a batch; batch scorers load only
+# these. bulk_update reads every updated field of every lead in the batch, so
+# a field left deferred here costs one query per lead.
+LOAD_FIELDS = INPUT_FIELDS + (
+    'first_name', 'last_name', 'company', 'description', 'website', 'phone', 'cvr_last_updated'
+)
+
+
+def inputs_fingerprint(lead: Lead) -> str:
+    """
+    MD5 of the lead's scoring inputs
+    
+    Must match db_scoring.inputs_hash_expression, which computes the same
+    value in SQL to find leads whose inputs changed since they were scored.
+    """
+    values = [getattr(lead, name) for name in INPUT_FIELDS]
+    payload = INPUTS_SEPARATOR.join('' if value is None else str(value) for value in values)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+
 class CVRLeadScorer:
     """Service for scoring leads using CVR API data and ICP criteria"""
     
     def __init__(self, icp_criteria: Optional[ICPCriteria] = None):
         self.icp = icp_criteria or ICPCriteria()
         self.client = cvr_client
+        self._matcher = None
+        self._matcher_icp = None
+        self._criteria_hash = ''
     
     def score_lead(self, lead: Lead, cvr_number: Optional[str] = None) -> LeadScoreBreakdown:
         """
@@ -122,25 +164,13 @@ class CVRLeadScorer:
         Returns:
             LeadScoreBreakdown with detailed scoring information
         """
-        logger.info(f"Scoring lead: {lead.full_name} from {lead.company}")
-        
-        # Initialize scores (1 point baseline for each criteria)
-        company_size_score = 1
-        industry_score = 1
-        employee_level_score = 1
-        location_score = 1
-        
-        # Initialize match flags
-        company_size_match = False
-        industry_match = False
-        employee_level_match = False
-        location_match = False
+        logger.debug(f"Scoring lead: {lead.full_name} from {lead.company}")
         
         cvr_data = None
         
         # Try to get CVR data if we have a CVR number
-        if cvr_number or self._extract_cvr_from_lead(lead):
-            cvr_to_use = cvr_number or self._extract_cvr_from_lead(lead)
+        cvr_to_use = cvr_number or self._extract_cvr_from_lead(lead)
+        if cvr_to_use:
             try:
                 cvr_data = self.client.lookup_by_cvr(cvr_to_use)
                 if cvr_data:
@@ -148,100 +178,165 @@ class CVRLeadScorer:
             except CVRAPIError as e:
                 logger.warning(f"Failed to get CVR data for {lead.company}: {e}")
         
-        # Score company size
-        employee_count = self._get_employee_count(lead, cvr_data)
-        if employee_count and employee_count >= self.icp.min_employees:
-            company_size_score = 3
-            company_size_match = True
-            logger.info(f"Company size match: {employee_count} employees >= {self.icp.min_employees}")
+        return self.score_with_cvr_data(lead, cvr_data)
+    
+    def score_with_cvr_data(self, lead: Lead, cvr_data: Optional[CVRCompanyData]) -> LeadScoreBreakdown:
+        """
+        Score a lead against ICP criteria using already fetched CVR data
         
-        # Score industry
+        Args:
+            lead: Lead instance to score
+            cvr_data: CVR company data, or None if unavailable
+            
+        Returns:
+            LeadScoreBreakdown with detailed scoring information
+        """
+        matcher = self.matcher
+        employee_count = self._get_employee_count(lead, cvr_data)
         industry = self._get_industry(lead, cvr_data)
-        if industry and self._matches_target_industry(industry):
-            industry_score = 3
-            industry_match = True
-            logger.info(f"Industry match: {industry}")
-        
-        # Score employee level (job title)
-        if self._matches_target_employee_level(lead.title):
-            employee_level_score = 3
-            employee_level_match = True
-            logger.info(f"Employee level match: {lead.title}")
-        
-        # Score location
         location = self._get_location(lead, cvr_data)
-        if location and self._matches_target_location(location):
-            location_score = 3
-            location_match = True
-            logger.info(f"Location match: {location}")
         
-        # Calculate total score
-        total_score = company_size_score + industry_score + employee_level_score + location_score
+        company_size_match = matcher.matches_company_size(employee_count)
+        industry_match = matcher.matches_industry(industry)
+        employee_level_match = matcher.matches_employee_level(lead.title)
+        location_match = matcher.matches_location(location)
         
-        logger.info(f"Lead {lead.full_name} scored {total_score}/12")
+        # 3 points for each matched criterion, 1 point baseline otherwise
+        company_size_score = 3 if company_size_match else 1
+        industry_score = 3 if industry_match else 1
+        employee_level_score = 3 if employee_level_match else 1
+        location_score = 3 if location_match else 1
         
-        return LeadScoreBreakdown(
+        score_breakdown = LeadScoreBreakdown(
             company_size_score=company_size_score,
             industry_score=industry_score,
             employee_level_score=employee_level_score,
             location_score=location_score,
-            total_score=total_score,
+            total_score=company_size_score + industry_score + employee_level_score + location_score,
             company_size_match=company_size_match,
             industry_match=industry_match,
             employee_level_match=employee_level_match,
             location_match=location_match,
             cvr_data=cvr_data
         )
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"Lead {lead.full_name} scored {score_breakdown.total_score}/12 "
+                f"(size={employee_count}, industry={industry}, title={lead.title}, location={location})"
+            )
+        
+        return score_breakdown
+    
+    def score_batch(self, leads: List[Lead], cvr_data: Optional[List[Optional[CVRCompanyData]]] = None,
+                    breakdowns: bool = False):
+        """
+        Score many leads in memory with the compiled matcher
+        
+        Args:
+            leads: Leads to score
+            cvr_data: Optional CVR data per lead, parallel to ``leads``
+            breakdowns: Return LeadScoreBreakdown objects instead of totals
+            
+        Returns:
+            List of total scores, or of LeadScoreBreakdown if requested
+        """
+        columns = self.matcher.score_columns(*columns_for(leads, cvr_data))
+        if not breakdowns:
+            return columns.total_score
+        return [
+            columns.breakdown(index, cvr_data[index] if cvr_data else None)
+            for index in range(len(columns))
+        ]
     
     def score_and_update_lead(self, lead: Lead, cvr_number: Optional[str] = None) -> LeadScoreBreakdown:
-        """Score a lead and update the lead_score field in the database"""
+        """Score a lead and save the ICP score fields to the database"""
         score_breakdown = self.score_lead(lead, cvr_number)
         
-        # Update the lead with the new score
-        lead.lead_score = score_breakdown.total_score
+        updated_fields = self.apply_score(lead, score_breakdown)
+        lead.save(update_fields=updated_fields + ['updated_at'])
+        logger.info(f"Updated lead {lead.full_name} with score {score_breakdown.total_score}")
+        
+        return score_breakdown
+    
+    def apply_score(self, lead: Lead, score_breakdown: LeadScoreBreakdown) -> List[str]:
+        """
+        Copy a score (and missing CVR company fields) onto a lead without saving
+        
+        Returns:
+            Names of the fields that were set
+        """
+        breakdown = score_breakdown.to_dict()
+        breakdown.pop('cvr_data', None)
+        
+        lead.icp_score = score_breakdown.total_score
+        lead.icp_score_breakdown = breakdown
+        lead.icp_criteria_hash = self.criteria_hash
+        lead.icp_scored_at = score_breakdown.scoring_timestamp or timezone.now()
+        updated_fields = list(SCORE_FIELDS)
         
         # Update other fields if we have CVR data
         if score_breakdown.cvr_data:
             cvr_data = score_breakdown.cvr_data
+            lead.cvr_last_updated = lead.icp_scored_at
+            updated_fields.append('cvr_last_updated')
             if not lead.employees and cvr_data.employee_count:
                 lead.employees = cvr_data.employee_count
+                updated_fields.append('employees')
             if not lead.industry and cvr_data.industry_text:
                 lead.industry = cvr_data.industry_text
+                updated_fields.append('industry')
             if not lead.website and cvr_data.website:
                 lead.website = cvr_data.website
+                updated_fields.append('website')
             if not lead.phone and cvr_data.phone:
                 lead.phone = cvr_data.phone
+                updated_fields.append('phone')
         
-        lead.save()
-        logger.info(f"Updated lead {lead.full_name} with score {score_breakdown.total_score}")
+        # Fingerprint after the CVR fill-in, so copied values don't look like edits
+        lead.icp_inputs_hash = inputs_fingerprint(lead)
         
-        return score_breakdown
+        return updated_fields
     
-    def bulk_score_leads(self, leads: List[Lead]) -> List[LeadScoreBreakdown]:
-        """Score multiple leads in bulk"""
-        results = []
-        for lead in leads:
-            try:
-                score_breakdown = self.score_and_update_lead(lead)
-                results.append(score_breakdown)
-            except Exception as e:
-                logger.error(f"Failed to score lead {lead.full_name}: {e}")
-                # Create a minimal score breakdown for failed leads
-                results.append(LeadScoreBreakdown(
-                    company_size_score=1,
-                    industry_score=1,
-                    employee_level_score=1,
-                    location_score=1,
-                    total_score=4,
-                    company_size_match=False,
-                    industry_match=False,
-                    employee_level_match=False,
-                    location_match=False
-                ))
-        return results
+    def bulk_score_leads(self, leads: List[Lead], max_workers: Optional[int] = None,
+                         rate_limit: Optional[float] = None) -> List[LeadScoreBreakdown]:
+        """
+        Score multiple leads in bulk
+        
+        CVR lookups are deduplicated and fetched concurrently, and all score
+        updates are written back with a single bulk_update. See
+        CVREnrichmentPipeline for details.
+        """
+        from .cvr_enrichment import CVREnrichmentPipeline
+        
+        pipeline = CVREnrichmentPipeline(self, max_workers=max_workers, rate_limit=rate_limit)
+        return pipeline.run(leads)
+    
+    @staticmethod
+    def default_breakdown() -> LeadScoreBreakdown:
+        """Minimal score breakdown used for leads that failed to score"""
+        return LeadScoreBreakdown(
+            company_size_score=1,
+            industry_score=1,
+            employee_level_score=1,
+            location_score=1,
+            total_score=4,
+            company_size_match=False,
+            industry_match=False,
+            employee_level_match=False,
+            location_match=False
+        )
     
     def _extract_cvr_from_lead(self, lead: Lead) -> Optional[str]:
-        """Try to extract CVR number from lead data"""
+        """
+        Try to extract CVR number from lead data
+        
+        The stored ``cvr_number`` wins over an 8-digit number found in the
+        company name, description or website.
+        """
+        if lead.cvr_number:
+            return lead.cvr_number
+        
         # Look in company name, description, or other fields for CVR pattern
         import re
         cvr_pattern = r'\b\d{8}\b'  # 8-digit number pattern
@@ -272,38 +367,41 @@ class CVRLeadScorer:
             return cvr_data.city
         return lead.city
     
+    @property
+    def matcher(self) -> CompiledICPMatcher:
+        """
+        Matcher compiled from the ICP criteria
+        
+        Recompiled when ``icp`` is replaced; call ``refresh_matcher`` after
+        modifying the criteria in place.
+        """
+        if self._matcher is None or self._matcher_icp is not self.icp:
+            self.refresh_matcher()
+        return self._matcher
+    
+    def refresh_matcher(self) -> None:
+        self._matcher = CompiledICPMatcher(self.icp)
+        self._matcher_icp = self.icp
+        self._criteria_hash = self.icp.fingerprint()
+    
+    @property
+    def criteria_hash(self) -> str:
+        """Fingerprint of the criteria the matcher was compiled from"""
+        if self._matcher is None or self._matcher_icp is not self.icp:
+            self.refresh_matcher()
+        return self._criteria_hash
+    
     def _matches_target_industry(self, industry: str) -> bool:
         """Check if industry matches target industries"""
-        if not industry:
-            return False
-        
-        industry_lower = industry.lower()
-        for target in self.icp.target_industries:
-            if target.lower() in industry_lower:
-                return True
-        return False
+        return self.matcher.matches_industry(industry)
     
     def _matches_target_employee_level(self, title: str) -> bool:
         """Check if job title indicates manager+ level"""
-        if not title:
-            return False
-        
-        title_lower = title.lower()
-        for level in self.icp.target_employee_levels:
-            if level.lower() in title_lower:
-                return True
-        return False
+        return self.matcher.matches_employee_level(title)
     
     def _matches_target_location(self, location: str) -> bool:
         """Check if location matches target cities"""
-        if not location:
-            return False
-        
-        location_lower = location.lower()
-        for city in self.icp.target_cities:
-            if city.lower() in location_lower:
-                return True
-        return False
+        return self.matcher.matches_location(location)
 
 
 def populate_lead_from_cvr(lead: Lead, cvr_number: str) -> bool:
@@ -422,7 +520,7 @@ def create_lead_from_cvr(cvr_number: str, assigned_to, created_by, **extra_field
         
         # Score the lead
         scoring_service = CVRLeadScorer()
-        scoring_service.score_lead(lead, cvr_number)
+        scoring_service.score_and_update_lead(lead, cvr_number)
         
         logger.info(f"Successfully created lead {lead.id} from CVR data")
         return lead
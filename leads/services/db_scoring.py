@@ -0,0 +1,256 @@
+"""
+Database-side ICP scoring
+
+The ICP score depends only on a lead's employee count, industry, job title
+and city, with CVR company data taking precedence when available. For a
+re-score after the criteria change, this module translates ICPCriteria into
+``Case``/``When`` expressions over those columns (and the cached CVR data in
+CVRCacheEntry) and rescores every lead with one ``UPDATE`` statement.
+
+Leads with a CVR number but no servable cache entry cannot be scored in SQL
+because their company data has to be fetched first. Neither can leads
+without a CVR number whose company name, description or website holds an
+8-digit number, which CVRLeadScorer looks up as their CVR number.
+``needs_cvr_fetch`` selects both for the Python scoring path.
+
+``stale_leads`` finds the leads whose stored score is out of date by
+comparing the stored criteria and input fingerprints with the current ones.
+
+Matching uses ``icontains``. On SQLite, LIKE only folds ASCII case, so
+non-ASCII terms (e.g. "København") are matched case-sensitively there.
+"""
+import logging
+from functools import reduce
+from operator import add, or_
+from typing import Dict, Iterable, Optional
+
+from django.db.models import (
+    Case, When, Value, F, Func, Q, Exists, OuterRef, Subquery, QuerySet, BooleanField, IntegerField, CharField
+)
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, Coalesce, Concat, JSONObject, MD5, NullIf
+from django.db.models.lookups import Exact, GreaterThan, GreaterThanOrEqual, IContains
+from django.utils import timezone
+
+from ..models import CVRCacheEntry, Lead
+from . import score_stats
+from .cvr_scoring import ICPCriteria, LeadScoreBreakdown, INPUT_FIELDS, INPUTS_SEPARATOR
+
+
+logger = logging.getLogger(__name__)
+
+
+MATCH_POINTS = 3
+BASE_POINTS = 1
+CRITERIA = ('company_size', 'industry', 'employee_level', 'location')
+MIN_SCORE = BASE_POINTS * len(CRITERIA)
+MAX_SCORE = MATCH_POINTS * len(CRITERIA)
+
+# Fields CVRLeadScorer._extract_cvr_from_lead searches for an 8-digit CVR
+# number when a lead has none stored. The pattern approximates its r'\b\d{8}\b'
+# in syntax every backend's regex lookup accepts; it may also match next to a
+# non-ASCII letter, which only sends such a lead to the Python path.
+CVR_TEXT_FIELDS = ('company', 'description', 'website')
+CVR_TEXT_PATTERN = r'(^|[^0-9A-Za-z_])[0-9]{8}([^0-9A-Za-z_]|$)'
+
+
+def _cvr_value(key: str):
+    """Text of a CVRCompanyData field from the lead's cached CVR entry (NULL if missing or empty)"""
+    value = CVRCacheEntry.objects.filter(
+        cvr_number=OuterRef('cvr_number'), found=True
+    ).annotate(value=NullIf(KT(f'data__{key}'), Value(''), output_field=CharField())).values('value')[:1]
+    return Subquery(value, output_field=CharField())
+
+
+def effective_fields():
+    """
+    Expressions for the inputs the scorer uses: CVR data first, then the lead
+
+    Mirrors CVRLeadScorer._get_employee_count/_get_industry/_get_location.
+    """
+    employees = Coalesce(
+        NullIf(Cast(_cvr_value('employee_count'), IntegerField()), Value(0)),
+        F('employees'),
+        output_field=IntegerField()
+    )
+    industry = Coalesce(_cvr_value('industry_text'), F('industry'), output_field=CharField())
+    city = Coalesce(_cvr_value('city'), F('city'), output_field=CharField())
+    return employees, industry, F('title'), city
+
+
+class JSONBoolean(Func):
+    """
+    JSON true/false for a condition
+
+    SQLite has no boolean type, so a plain condition would be stored in a
+    JSON object as 1/0.
+    """
+    template = '%(expressions)s'
+    output_field = BooleanField()
+
+    def __init__(self, condition):
+        if condition is None:
+            expression = Value(False)
+        else:
+            expression = Case(When(condition, then=Value(True)), default=Value(False), output_field=BooleanField())
+        super().__init__(expression)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template="JSON(CASE WHEN %(expressions)s THEN 'true' ELSE 'false' END)",
+            **extra_context
+        )
+
+
+def _criterion(condition) -> Case:
+    """MATCH_POINTS when ``condition`` holds, BASE_POINTS otherwise"""
+    if condition is None:
+        return Value(BASE_POINTS)
+    return Case(When(condition, then=Value(MATCH_POINTS)), default=Value(BASE_POINTS),
+                output_field=IntegerField())
+
+
+def _contains_any(expression, terms: Iterable[str]):
+    lookups = [Q(IContains(expression, term)) for term in terms if term]
+    return reduce(or_, lookups) if lookups else None
+
+
+def criterion_conditions(icp: ICPCriteria) -> Dict[str, Optional[Q]]:
+    """Condition under which each criterion matches, None if it can never match"""
+    employees, industry, title, city = effective_fields()
+
+    size_condition = Q(GreaterThan(employees, 0)) & Q(GreaterThanOrEqual(employees, icp.min_employees))
+    return {
+        'company_size': size_condition,
+        'industry': _contains_any(industry, icp.target_industries),
+        'employee_level': _contains_any(title, icp.target_employee_levels),
+        'location': _contains_any(city, icp.target_cities),
+    }
+
+
+def criterion_expressions(icp: ICPCriteria) -> Dict[str, Case]:
+    """SQL expression for each criterion's 1 or 3 points, keyed like LeadScoreBreakdown"""
+    return {f'{name}_score': _criterion(condition) for name, condition in criterion_conditions(icp).items()}
+
+
+def icp_score_expression(icp: ICPCriteria):
+    """SQL expression computing the 4-12 point ICP score of a lead"""
+    return reduce(add, criterion_expressions(icp).values())
+
+
+def _by_total(total, value_for) -> Case:
+    """Case mapping every possible total score to ``value_for(total)``"""
+    totals = range(MIN_SCORE, MAX_SCORE + 1, MATCH_POINTS - BASE_POINTS)
+    return Case(*[When(Q(Exact(total, score)), then=Value(value_for(score))) for score in totals])
+
+
+def _percentage(total_score: int) -> float:
+    # Same arithmetic as LeadScoreBreakdown.get_score_percentage
+    return ((total_score - MIN_SCORE) / (MAX_SCORE - MIN_SCORE)) * 100
+
+
+def breakdown_expression(icp: ICPCriteria, scored_at=None) -> JSONObject:
+    """
+    SQL expression building the stored icp_score_breakdown
+
+    Holds the same keys as the breakdown the Python scorer stores, i.e.
+    LeadScoreBreakdown.to_dict() without ``cvr_data``.
+    """
+    conditions = criterion_conditions(icp)
+    scores = {f'{name}_score': _criterion(condition) for name, condition in conditions.items()}
+    total = reduce(add, scores.values())
+    scored_at = scored_at or timezone.now()
+    return JSONObject(
+        **scores,
+        total_score=total,
+        max_possible_score=Value(MAX_SCORE),
+        min_possible_score=Value(MIN_SCORE),
+        score_percentage=_by_total(total, _percentage),
+        score_grade=_by_total(total, lambda score: LeadScoreBreakdown.grade_for_percentage(_percentage(score))),
+        **{f'{name}_match': JSONBoolean(condition) for name, condition in conditions.items()},
+        scoring_timestamp=Value(scored_at.isoformat()),
+    )
+
+
+def inputs_hash_expression() -> MD5:
+    """SQL expression for the current icp_inputs_hash of a lead (see cvr_scoring.inputs_fingerprint)"""
+    parts = []
+    for name in INPUT_FIELDS:
+        if parts:
+            parts.append(Value(INPUTS_SEPARATOR))
+        parts.append(Coalesce(Cast(name, CharField()), Value(''), output_field=CharField()))
+    return MD5(Concat(*parts, output_field=CharField()))
+
+
+def stale_leads(criteria_hash: str, queryset: QuerySet = None) -> QuerySet:
+    """
+    Leads whose stored score is out of date
+    
+    That is, leads never scored, scored with other criteria, or whose input
+    fields changed since they were scored. Everything is compared in SQL.
+    """
+    queryset = Lead.objects.all() if queryset is None else queryset
+    return queryset.alias(current_inputs_hash=inputs_hash_expression()).filter(
+        Q(icp_scored_at__isnull=True) |
+        ~Q(icp_criteria_hash=criteria_hash) |
+        ~Q(icp_inputs_hash=F('current_inputs_hash'))
+    )
+
+
+def _has_servable_cvr_entry(cache=None) -> Exists:
+    from .cvr_client import cvr_client
+
+    cache = cache or cvr_client.cache
+    return Exists(CVRCacheEntry.objects.filter(cache.servable_q(), cvr_number=OuterRef('cvr_number')))
+
+
+def _without_cvr_number() -> Q:
+    return Q(cvr_number__isnull=True) | Q(cvr_number='')
+
+
+def _cvr_number_in_text() -> Q:
+    """Leads with an 8-digit number in a field searched for a CVR number"""
+    return reduce(or_, (Q(**{f'{name}__regex': CVR_TEXT_PATTERN}) for name in CVR_TEXT_FIELDS))
+
+
+def needs_cvr_fetch(queryset: QuerySet, cache=None) -> QuerySet:
+    """
+    Leads whose company data has to come from the CVR client
+
+    That is, leads with a CVR number that is not servable from the cache,
+    and leads without one whose text holds a CVR number to look up.
+    """
+    return queryset.filter(
+        (~_without_cvr_number() & ~Q(_has_servable_cvr_entry(cache))) |
+        (_without_cvr_number() & _cvr_number_in_text())
+    )
+
+
+def scorable_in_database(queryset: QuerySet, cache=None) -> QuerySet:
+    """Leads whose score can be computed from the table and cache alone"""
+    return queryset.filter(
+        (_without_cvr_number() & ~_cvr_number_in_text()) | Q(_has_servable_cvr_entry(cache))
+    )
+
+
+def rescore_in_database(queryset: QuerySet, icp: ICPCriteria, cache=None) -> int:
+    """
+    Rescore the leads in ``queryset`` with a single UPDATE
+
+    Leads that need a CVR fetch are skipped. Returns the number of leads
+    updated.
+    """
+    now = timezone.now()
+    updated = scorable_in_database(queryset, cache).update(
+        icp_score=icp_score_expression(icp),
+        icp_score_breakdown=breakdown_expression(icp, now),
+        icp_criteria_hash=icp.fingerprint(),
+        icp_inputs_hash=inputs_hash_expression(),
+        icp_scored_at=now,
+        updated_at=now
+    )
+    score_stats.invalidate()
+
+    logger.info(f"Rescored {updated} leads in the database")
+    return updated
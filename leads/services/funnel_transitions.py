@@ -0,0 +1,131 @@
+"""
+Bulk funnel stage transitions
+
+``Lead.move_to_next_stage`` saves every field of the lead and inserts a
+history row, two or more queries per lead. The functions here move any
+number of leads with one ``UPDATE`` per source stage (split only where the
+database limits bound parameters, as SQLite does) and insert all
+FunnelStageHistory rows with ``bulk_create``, inside one transaction.
+
+The stage of every selected lead is read once, with the rows locked,
+before anything is updated, so each lead moves exactly one stage per call.
+
+Like any ``QuerySet.update``, these bypass ``Lead.save()`` and its signals.
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Union
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from ..models import Lead, FunnelStageHistory
+from .batching import pk_chunks
+
+
+logger = logging.getLogger(__name__)
+
+
+HISTORY_BATCH_SIZE = 1000
+
+LeadSelection = Union[QuerySet, Iterable[int], Iterable[Lead]]
+
+
+def _lead_ids(leads: LeadSelection) -> List[int]:
+    """Distinct lead ids of a queryset, or of a list of ids or leads"""
+    if isinstance(leads, QuerySet):
+        return list(leads.order_by().values_list('pk', flat=True).distinct())
+    return sorted({lead.pk if isinstance(lead, Lead) else int(lead) for lead in leads})
+
+
+def _ids_by_stage(ids: List[int], stages: Iterable[str]) -> Dict[str, List[int]]:
+    """Current stage of each lead, locking the rows until the transaction ends"""
+    stages = list(stages)
+    by_stage = {stage: [] for stage in stages}
+    for chunk in pk_chunks(ids):
+        rows = (
+            Lead.objects.select_for_update()
+            .filter(pk__in=chunk, funnel_stage__in=stages)
+            .order_by()
+            .values_list('pk', 'funnel_stage')
+        )
+        for pk, stage in rows:
+            by_stage[stage].append(pk)
+    return by_stage
+
+
+def _move(ids: List[int], from_stage: str, to_stage: str, timestamp_field: str, now,
+          user: Optional[User], notes: str) -> int:
+    """Move leads currently in ``from_stage`` and record their history"""
+    moved = 0
+    for chunk in pk_chunks(ids):
+        moved += Lead.objects.filter(pk__in=chunk, funnel_stage=from_stage).update(
+            funnel_stage=to_stage,
+            funnel_stage_updated_at=now,
+            updated_at=now,
+            **{timestamp_field: now}
+        )
+
+    FunnelStageHistory.objects.bulk_create(
+        [
+            FunnelStageHistory(lead_id=pk, from_stage=from_stage, to_stage=to_stage, changed_by=user, notes=notes)
+            for pk in ids
+        ],
+        batch_size=HISTORY_BATCH_SIZE
+    )
+    return moved
+
+
+def advance_leads(leads: LeadSelection, user: Optional[User] = None, notes: str = '') -> Dict[str, int]:
+    """
+    Advance each lead one funnel stage
+
+    Args:
+        leads: A Lead queryset, or an iterable of lead ids or Lead instances
+        user: Recorded as ``changed_by`` on the history rows
+        notes: Recorded on the history rows
+
+    Returns:
+        Number of leads moved into each stage, e.g. {'meeting_booked': 12, ...}.
+        Leads in a closed stage (deal_closed, churned) are left unchanged.
+    """
+    ids = _lead_ids(leads)
+    now = timezone.now()
+    counts = {to_stage: 0 for to_stage, _ in Lead.STAGE_PROGRESSION.values()}
+    if not ids:
+        return counts
+
+    with transaction.atomic():
+        by_stage = _ids_by_stage(ids, Lead.STAGE_PROGRESSION)
+        for from_stage, (to_stage, timestamp_field) in Lead.STAGE_PROGRESSION.items():
+            if by_stage[from_stage]:
+                counts[to_stage] = _move(by_stage[from_stage], from_stage, to_stage, timestamp_field, now, user, notes)
+
+    logger.info(f"Advanced {sum(counts.values())} of {len(ids)} leads: {counts}")
+    return counts
+
+
+def churn_leads(leads: LeadSelection, user: Optional[User] = None, notes: str = '') -> Dict[str, int]:
+    """
+    Move leads to the churned stage
+
+    Returns:
+        Number of leads churned from each stage. Leads already churned are
+        left unchanged.
+    """
+    ids = _lead_ids(leads)
+    now = timezone.now()
+    open_stages = [stage for stage, _ in Lead.FUNNEL_STAGE_CHOICES if stage != 'churned']
+    counts = {stage: 0 for stage in open_stages}
+    if not ids:
+        return counts
+
+    with transaction.atomic():
+        by_stage = _ids_by_stage(ids, open_stages)
+        for from_stage, stage_ids in by_stage.items():
+            if stage_ids:
+                counts[from_stage] = _move(stage_ids, from_stage, 'churned', 'churned_at', now, user, notes)
+
+    logger.info(f"Churned {sum(counts.values())} of {len(ids)} leads")
+    return counts
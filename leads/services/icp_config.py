@@ -0,0 +1,167 @@
+"""
+Versioned ICP configuration
+
+The ICP criteria live in ICPConfiguration rows. Publishing new criteria
+creates a new version and makes it the active one; older versions are kept
+for reference. Every lead stores the fingerprint of the criteria it was
+scored with (``icp_criteria_hash``), so after a change only leads scored
+with other criteria, or whose own fields changed, need re-scoring (see
+``db_scoring.stale_leads``).
+
+When no configuration exists yet, version 1 is created from
+``settings.LEAD_SCORING['ICP_CRITERIA']``.
+"""
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+
+from ..models import ICPConfiguration
+from .cvr_scoring import CVRLeadScorer, ICPCriteria
+
+
+logger = logging.getLogger(__name__)
+
+
+class ICPConfigurationError(Exception):
+    """Raised when submitted ICP criteria are invalid"""
+    pass
+
+
+def criteria_from_settings() -> ICPCriteria:
+    """ICPCriteria from settings.LEAD_SCORING, falling back to the ICPCriteria defaults"""
+    config = getattr(settings, 'LEAD_SCORING', {}).get('ICP_CRITERIA', {})
+    defaults = ICPCriteria()
+    return ICPCriteria(
+        min_employees=config.get('MIN_EMPLOYEES', defaults.min_employees),
+        target_industries=list(config.get('TARGET_INDUSTRIES', defaults.target_industries)),
+        target_cities=list(config.get('TARGET_CITIES', defaults.target_cities)),
+        target_employee_levels=list(config.get('TARGET_EMPLOYEE_LEVELS', defaults.target_employee_levels)),
+    )
+
+
+def to_criteria(configuration: ICPConfiguration) -> ICPCriteria:
+    return ICPCriteria(
+        min_employees=configuration.min_employees,
+        target_industries=list(configuration.target_industries),
+        target_cities=list(configuration.target_cities),
+        target_employee_levels=list(configuration.target_employee_levels),
+    )
+
+
+def active_configuration() -> ICPConfiguration:
+    """The active configuration, creating version 1 from settings if there is none"""
+    configuration = ICPConfiguration.objects.filter(is_active=True).first()
+    if configuration is not None:
+        return configuration
+
+    try:
+        return publish(criteria_from_settings(), notes='Initial version from settings.LEAD_SCORING')
+    except IntegrityError:
+        # Another process published concurrently
+        return ICPConfiguration.objects.get(is_active=True)
+
+
+def active_criteria() -> ICPCriteria:
+    return to_criteria(active_configuration())
+
+
+def publish(criteria: ICPCriteria, user=None, notes: str = '') -> ICPConfiguration:
+    """
+    Make ``criteria`` the active configuration
+
+    Creates a new version unless the criteria equal the active ones, in
+    which case the active version is returned unchanged.
+    """
+    criteria_hash = criteria.fingerprint()
+
+    with transaction.atomic():
+        current = ICPConfiguration.objects.select_for_update().filter(is_active=True).first()
+        if current is not None and current.criteria_hash == criteria_hash:
+            return current
+
+        version = (ICPConfiguration.objects.aggregate(latest=Max('version'))['latest'] or 0) + 1
+        if current is not None:
+            current.is_active = False
+            current.save(update_fields=['is_active'])
+
+        configuration = ICPConfiguration.objects.create(
+            version=version,
+            min_employees=criteria.min_employees,
+            target_industries=criteria.target_industries,
+            target_cities=criteria.target_cities,
+            target_employee_levels=criteria.target_employee_levels,
+            criteria_hash=criteria_hash,
+            is_active=True,
+            notes=notes,
+            created_by=user
+        )
+
+    logger.info(f"Published ICP configuration v{configuration.version} ({criteria_hash})")
+    return configuration
+
+
+def criteria_from_dict(data: Dict[str, Any], base: Optional[ICPCriteria] = None) -> ICPCriteria:
+    """
+    Validate submitted criteria, taking missing keys from ``base``
+
+    Raises:
+        ICPConfigurationError: If a value has the wrong type
+    """
+    base = base or active_criteria()
+
+    min_employees = data.get('min_employees', base.min_employees)
+    if isinstance(min_employees, bool) or not isinstance(min_employees, int) or min_employees < 0:
+        raise ICPConfigurationError('min_employees must be a non-negative integer')
+
+    lists = {}
+    for key in ('target_industries', 'target_cities', 'target_employee_levels'):
+        value = data.get(key, getattr(base, key))
+        if not isinstance(value, list) or not all(isinstance(term, str) for term in value):
+            raise ICPConfigurationError(f'{key} must be a list of strings')
+        lists[key] = [term.strip() for term in value if term.strip()]
+
+    return ICPCriteria(min_employees=min_employees, **lists)
+
+
+def configuration_to_dict(configuration: ICPConfiguration) -> Dict[str, Any]:
+    """JSON representation used by the ICP configuration API"""
+    return {
+        'version': configuration.version,
+        'criteria_hash': configuration.criteria_hash,
+        'min_employees': configuration.min_employees,
+        'target_industries': configuration.target_industries,
+        'target_cities': configuration.target_cities,
+        'target_employee_levels': configuration.target_employee_levels,
+        'notes': configuration.notes,
+        'created_by': configuration.created_by.username if configuration.created_by else None,
+        'created_at': configuration.created_at.isoformat() if configuration.created_at else None,
+    }
+
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+
+def active_scorer() -> CVRLeadScorer:
+    """
+    Process-wide scorer for the active configuration
+
+    The compiled matcher is reused until another version is activated.
+    Then a new scorer replaces it; a scorer that was handed out is never
+    changed, so callers still using it keep scoring with one consistent
+    set of criteria.
+    """
+    global _scorer
+
+    configuration = active_configuration()
+    with _scorer_lock:
+        if _scorer is None or _scorer.criteria_hash != configuration.criteria_hash:
+            scorer = CVRLeadScorer(to_criteria(configuration))
+            # Compile before publishing, so no caller compiles it lazily
+            scorer.refresh_matcher()
+            _scorer = scorer
+        return _scorer
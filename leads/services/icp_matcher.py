@@ -0,0 +1,145 @@
+"""
+Compiled ICP matcher
+
+ICPCriteria term lists (industries, employee levels, cities) are compiled
+once into a single case-insensitive alternation regex per list, so each
+field is matched with one regex search instead of lower-casing the input
+and every term per lead. Batches are scored column by column from plain
+lists; LeadScoreBreakdown objects are only built on request.
+
+Columns are matched per distinct value, which makes repetitive fields such
+as city and job title nearly free on large batches.
+
+Matching keeps the semantics of the original scorer: a field matches when
+any term occurs anywhere in it, ignoring case.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable, List, Optional, Pattern, Sequence
+
+if TYPE_CHECKING:
+    from .cvr_client import CVRCompanyData
+    from .cvr_scoring import ICPCriteria, LeadScoreBreakdown
+
+
+MATCH_POINTS = 3
+BASE_POINTS = 1
+
+
+def compile_terms(terms: Iterable[str]) -> Optional[Pattern]:
+    """Compile terms into one case-insensitive substring regex (None if empty)"""
+    unique = sorted({term for term in terms if term is not None}, key=len, reverse=True)
+    if not unique:
+        return None
+    return re.compile('|'.join(re.escape(term) for term in unique), re.IGNORECASE)
+
+
+def _matcher(pattern: Optional[Pattern]):
+    if pattern is None:
+        return lambda value: False
+    search = pattern.search
+    return lambda value: bool(value) and search(value) is not None
+
+
+def _match_column(match, values: Sequence[Optional[str]]) -> List[bool]:
+    """Apply ``match`` to a column, evaluating each distinct value once"""
+    results = {value: match(value) for value in set(values)}
+    return [results[value] for value in values]
+
+
+@dataclass
+class ScoreColumns:
+    """Per-criterion match flags and totals for a batch, one entry per lead"""
+    company_size_match: List[bool] = field(default_factory=list)
+    industry_match: List[bool] = field(default_factory=list)
+    employee_level_match: List[bool] = field(default_factory=list)
+    location_match: List[bool] = field(default_factory=list)
+    total_score: List[int] = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.total_score)
+
+    def breakdown(self, index: int, cvr_data: Optional['CVRCompanyData'] = None) -> 'LeadScoreBreakdown':
+        """Build the LeadScoreBreakdown for one lead of the batch"""
+        from .cvr_scoring import LeadScoreBreakdown
+
+        points = lambda matched: MATCH_POINTS if matched else BASE_POINTS
+        return LeadScoreBreakdown(
+            company_size_score=points(self.company_size_match[index]),
+            industry_score=points(self.industry_match[index]),
+            employee_level_score=points(self.employee_level_match[index]),
+            location_score=points(self.location_match[index]),
+            total_score=self.total_score[index],
+            company_size_match=self.company_size_match[index],
+            industry_match=self.industry_match[index],
+            employee_level_match=self.employee_level_match[index],
+            location_match=self.location_match[index],
+            cvr_data=cvr_data
+        )
+
+
+class CompiledICPMatcher:
+    """ICPCriteria compiled for fast repeated matching"""
+
+    def __init__(self, icp: 'ICPCriteria'):
+        self.min_employees = icp.min_employees
+        self.industry_pattern = compile_terms(icp.target_industries or [])
+        self.employee_level_pattern = compile_terms(icp.target_employee_levels or [])
+        self.location_pattern = compile_terms(icp.target_cities or [])
+
+        self.matches_industry = _matcher(self.industry_pattern)
+        self.matches_employee_level = _matcher(self.employee_level_pattern)
+        self.matches_location = _matcher(self.location_pattern)
+
+    def matches_company_size(self, employees: Optional[int]) -> bool:
+        return bool(employees) and employees >= self.min_employees
+
+    def score_columns(self, employees: Sequence[Optional[int]], industries: Sequence[Optional[str]],
+                      titles: Sequence[Optional[str]], cities: Sequence[Optional[str]]) -> ScoreColumns:
+        """
+        Score a batch given as parallel columns
+
+        Each argument holds one value per lead (CVR values already merged in,
+        see ``columns_for``). Returns flags and totals as lists.
+        """
+        min_employees = self.min_employees
+        size = [bool(value) and value >= min_employees for value in employees]
+        industry = _match_column(self.matches_industry, industries)
+        level = _match_column(self.matches_employee_level, titles)
+        location = _match_column(self.matches_location, cities)
+
+        base = 4 * BASE_POINTS
+        bonus = MATCH_POINTS - BASE_POINTS
+        total = [
+            base + bonus * (a + b + c + d)
+            for a, b, c, d in zip(size, industry, level, location)
+        ]
+        return ScoreColumns(size, industry, level, location, total)
+
+    def score_totals(self, employees, industries, titles, cities) -> List[int]:
+        """Only the total score per lead"""
+        return self.score_columns(employees, industries, titles, cities).total_score
+
+
+def columns_for(leads: Sequence, cvr_data: Optional[Sequence[Optional['CVRCompanyData']]] = None):
+    """
+    (employees, industries, titles, cities) columns for a batch of leads
+
+    ``cvr_data`` is parallel to ``leads``; CVR values take precedence over
+    the lead's own fields, as in CVRLeadScorer.
+    """
+    if cvr_data is None:
+        return (
+            [lead.employees for lead in leads],
+            [lead.industry for lead in leads],
+            [lead.title for lead in leads],
+            [lead.city for lead in leads],
+        )
+
+    employees, industries, titles, cities = [], [], [], []
+    for lead, company in zip(leads, cvr_data):
+        employees.append(company.employee_count if company and company.employee_count else lead.employees)
+        industries.append(company.industry_text if company and company.industry_text else lead.industry)
+        titles.append(lead.title)
+        cities.append(company.city if company and company.city else lead.city)
+    return employees, industries, titles, cities
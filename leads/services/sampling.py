@@ -0,0 +1,111 @@
+"""
+Uniform random samples of primary keys
+
+``random.sample(list(queryset), k)`` loads every row to pick a few. These
+helpers return ``k`` primary keys drawn uniformly from a queryset while
+holding only O(k) keys in memory:
+
+- id-range sampling: when the matching rows are dense in their id range,
+  random candidate ids are drawn from [min(pk), max(pk)] and checked with
+  ``pk__in`` queries; a few queries of roughly k / density ids each.
+- reservoir sampling: otherwise the ids are streamed with keyset pagination
+  (``values_list('pk')``) through a size-k reservoir.
+
+Both require integer primary keys.
+"""
+import logging
+import math
+import random
+from typing import List, Optional
+
+from django.db.models import Count, Max, Min, QuerySet
+
+from .batching import keyset_pks, pk_chunks
+
+
+logger = logging.getLogger(__name__)
+
+
+# Use id-range sampling when at least this fraction of the id range matches
+MIN_RANGE_DENSITY = 0.05
+# Extra candidates per round to absorb misses
+OVERSAMPLE = 1.25
+MAX_RANGE_ROUNDS = 8
+
+
+def reservoir_sample_pks(queryset: QuerySet, k: int, rng: Optional[random.Random] = None) -> List:
+    """Sample ``k`` primary keys by streaming every matching id through a reservoir"""
+    rng = rng or random
+    reservoir = []
+    for seen, pk in enumerate(keyset_pks(queryset)):
+        if seen < k:
+            reservoir.append(pk)
+        else:
+            slot = rng.randrange(seen + 1)
+            if slot < k:
+                reservoir[slot] = pk
+    return reservoir
+
+
+def _range_sample_pks(queryset: QuerySet, k: int, low: int, high: int, density: float,
+                      rng) -> Optional[List]:
+    """
+    Sample by probing random ids in [low, high]
+
+    Candidates are drawn without replacement and hits are kept in draw
+    order, so the first k hits are a uniform sample. Returns None if the
+    range turns out too sparse to finish in MAX_RANGE_ROUNDS.
+    """
+    span = high - low + 1
+    tried = set()
+    sample = []
+
+    for _ in range(MAX_RANGE_ROUNDS):
+        wanted = math.ceil((k - len(sample)) / density * OVERSAMPLE)
+        untried = span - len(tried)
+        candidates = []
+        while len(candidates) < min(wanted, untried):
+            candidate = rng.randrange(low, high + 1)
+            if candidate not in tried:
+                tried.add(candidate)
+                candidates.append(candidate)
+
+        hits = set()
+        for chunk in pk_chunks(candidates):
+            hits.update(queryset.filter(pk__in=chunk).order_by().values_list('pk', flat=True))
+
+        sample.extend(candidate for candidate in candidates if candidate in hits)
+        if len(sample) >= k or len(tried) >= span:
+            return sample[:k]
+
+    return None
+
+
+def sample_pks(queryset: QuerySet, k: int, rng: Optional[random.Random] = None) -> List:
+    """
+    Uniform random sample of ``k`` primary keys from ``queryset``
+
+    Returns every primary key (in random order) if the queryset has k or
+    fewer rows. Pass ``rng`` (a random.Random) for reproducible samples.
+    """
+    rng = rng or random
+    if k <= 0:
+        return []
+
+    queryset = queryset.order_by()
+    bounds = queryset.aggregate(total=Count('pk'), low=Min('pk'), high=Max('pk'))
+    total = bounds['total']
+    if total <= k:
+        pks = list(keyset_pks(queryset))
+        rng.shuffle(pks)
+        return pks
+
+    low, high = bounds['low'], bounds['high']
+    density = total / (high - low + 1)
+    if density >= MIN_RANGE_DENSITY:
+        sample = _range_sample_pks(queryset, k, low, high, density, rng)
+        if sample is not None:
+            return sample
+        logger.debug("Id-range sampling did not converge, falling back to a reservoir")
+
+    return reservoir_sample_pks(queryset, k, rng)
@@ -0,0 +1,160 @@
+"""
+Lead score analytics
+
+Everything except the top-lead list is derived from one grouped query:
+lead counts per (icp_score, lead_source, assigned_to). The number of groups
+is bounded by scores x sources x owners rather than by the number of leads,
+so the histogram, percentiles, grade counts and per-source/per-owner
+breakdowns are computed from a few hundred rows at most.
+
+Results are kept in the Django cache. Score writes invalidate them: the
+scoring write paths call ``invalidate()`` and lead saves and deletes are
+handled by signals (see leads.signals). The timeout bounds staleness for
+writes that bypass both, and for per-process caches such as LocMemCache.
+"""
+import logging
+import math
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from ..models import Lead
+from .cvr_scoring import LeadScoreBreakdown
+
+
+logger = logging.getLogger(__name__)
+
+
+CACHE_KEY = 'leads:score_statistics'
+CACHE_TIMEOUT = 300
+
+MIN_SCORE = 4
+MAX_SCORE = 12
+HIGH_FIT_SCORE = 10
+PERCENTILES = (25, 50, 75, 90)
+GRADES = ('A+', 'A', 'B+', 'B', 'C+', 'C', 'D', 'F')
+TOP_LEADS = 10
+
+
+def grade_for_score(score: int) -> str:
+    """Letter grade for an ICP score, as LeadScoreBreakdown.get_score_grade"""
+    percentage = (score - MIN_SCORE) / (MAX_SCORE - MIN_SCORE) * 100
+    return LeadScoreBreakdown.grade_for_percentage(percentage)
+
+
+def _percentile(histogram: Dict[int, int], total: int, percentile: int) -> Optional[int]:
+    """Nearest-rank percentile of the scores in ``histogram``"""
+    if not total:
+        return None
+    rank = max(1, math.ceil(percentile / 100 * total))
+    seen = 0
+    for score in sorted(histogram):
+        seen += histogram[score]
+        if seen >= rank:
+            return score
+    return None
+
+
+def _summary(histogram: Counter) -> Dict[str, Any]:
+    count = sum(histogram.values())
+    total = sum(score * n for score, n in histogram.items())
+    return {
+        'count': count,
+        'avg_score': round(total / count, 2) if count else None,
+        'high_fit': sum(n for score, n in histogram.items() if score >= HIGH_FIT_SCORE),
+    }
+
+
+def _top_leads() -> List[Dict[str, Any]]:
+    top_leads = Lead.objects.filter(icp_score__gte=HIGH_FIT_SCORE).order_by('-icp_score')[:TOP_LEADS]
+    return [
+        {
+            'id': lead.id,
+            'name': lead.full_name,
+            'company': lead.company,
+            'score': lead.icp_score,
+            'industry': lead.industry
+        }
+        for lead in top_leads
+    ]
+
+
+def compute_statistics() -> Dict[str, Any]:
+    """Compute the statistics from the database, bypassing the cache"""
+    rows = (
+        Lead.objects
+        .order_by()
+        .values('icp_score', 'lead_source', 'assigned_to', 'assigned_to__username')
+        .annotate(count=Count('id'))
+    )
+
+    histogram = Counter()
+    by_source = defaultdict(Counter)
+    by_owner = defaultdict(Counter)
+    owner_names = {}
+    for row in rows:
+        score, count = row['icp_score'], row['count']
+        histogram[score] += count
+        by_source[row['lead_source'] or ''][score] += count
+        by_owner[row['assigned_to']][score] += count
+        owner_names[row['assigned_to']] = row['assigned_to__username']
+
+    total_leads = sum(histogram.values())
+    grades = Counter()
+    for score, count in histogram.items():
+        grades[grade_for_score(score)] += count
+
+    source_labels = dict(Lead.LEAD_SOURCE)
+    scores = sorted(set(range(MIN_SCORE, MAX_SCORE + 1)) | set(histogram))
+
+    return {
+        'statistics': {
+            'total_leads': total_leads,
+            'avg_score': _summary(histogram)['avg_score'],
+            'min_score': min(histogram) if histogram else None,
+            'max_score': max(histogram) if histogram else None,
+            'scored_leads': sum(n for score, n in histogram.items() if score > MIN_SCORE),
+        },
+        'score_distribution': {str(score): histogram.get(score, 0) for score in scores},
+        'percentiles': {
+            f'p{percentile}': _percentile(histogram, total_leads, percentile) for percentile in PERCENTILES
+        },
+        'grade_distribution': {grade: grades.get(grade, 0) for grade in GRADES},
+        'by_source': sorted(
+            (
+                {'source': source, 'label': source_labels.get(source, source) or 'Unknown', **_summary(counts)}
+                for source, counts in by_source.items()
+            ),
+            key=lambda item: -item['count']
+        ),
+        'by_owner': sorted(
+            (
+                {'owner_id': owner, 'owner': owner_names[owner] or 'Unassigned', **_summary(counts)}
+                for owner, counts in by_owner.items()
+            ),
+            key=lambda item: -item['count']
+        ),
+        'top_scoring_leads': _top_leads(),
+        'generated_at': timezone.now().isoformat(),
+    }
+
+
+def score_statistics(use_cache: bool = True) -> Dict[str, Any]:
+    """Lead score statistics, served from the cache when possible"""
+    if use_cache:
+        statistics = cache.get(CACHE_KEY)
+        if statistics is not None:
+            return statistics
+
+    statistics = compute_statistics()
+    cache.set(CACHE_KEY, statistics, CACHE_TIMEOUT)
+    return statistics
+
+
+def invalidate() -> None:
+    """Drop the cached statistics once the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete(CACHE_KEY))
@@ -0,0 +1,176 @@
+"""
+Background ICP scoring jobs
+
+A ScoringJob walks the unscored leads in primary key order, scoring one
+batch at a time through the bulk enrichment pipeline. Progress is saved
+after every batch together with the last processed lead id, so a job that
+was cancelled, failed or lost its worker resumes where it stopped instead
+of starting over. Jobs run on Celery (see leads.tasks).
+"""
+import logging
+from datetime import timedelta
+from typing import Dict, Any, Optional
+
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from ..models import Lead, ScoringJob
+from .batching import keyset_batches
+from .cvr_scoring import LOAD_FIELDS
+from .icp_config import active_scorer
+
+
+logger = logging.getLogger(__name__)
+
+
+PROGRESS_FIELDS = ['processed_count', 'scored_count', 'last_processed_id', 'updated_at']
+
+# An active job without progress for this long is assumed to have lost its worker
+STALE_AFTER = timedelta(minutes=15)
+
+
+class ScoringJobError(Exception):
+    """Raised when a scoring job cannot be queued"""
+    pass
+
+
+def candidate_leads() -> QuerySet:
+    """Leads a scoring job processes: those that have never been scored"""
+    return Lead.objects.filter(icp_scored_at__isnull=True)
+
+
+def active_job() -> Optional[ScoringJob]:
+    return ScoringJob.objects.filter(status__in=ScoringJob.ACTIVE_STATUSES).first()
+
+
+def is_stale(job: ScoringJob) -> bool:
+    return job.is_active and job.updated_at < timezone.now() - STALE_AFTER
+
+
+def _enqueue(job: ScoringJob) -> ScoringJob:
+    from ..tasks import run_scoring_job
+
+    try:
+        result = run_scoring_job.delay(job.pk)
+    except Exception as e:
+        logger.error(f"Could not queue scoring job {job.pk}: {e}")
+        _finish(job, 'failed', error=f"Could not queue job: {e}")
+        raise ScoringJobError(f"Could not queue scoring job: {e}")
+
+    job.celery_task_id = result.id or ''
+    job.save(update_fields=['celery_task_id', 'updated_at'])
+    return job
+
+
+def start_job(user=None, batch_size: int = 50) -> ScoringJob:
+    """Create a scoring job and queue it, or return the job already running"""
+    existing = active_job()
+    if existing:
+        return resume_job(existing) if is_stale(existing) else existing
+
+    job = ScoringJob.objects.create(created_by=user, batch_size=batch_size)
+    logger.info(f"Queued scoring job {job.pk}")
+    return _enqueue(job)
+
+
+def resume_job(job: ScoringJob) -> ScoringJob:
+    """Re-queue a cancelled, failed or stale job from its last processed lead"""
+    if job.status == 'completed' or (job.is_active and not is_stale(job)):
+        return job
+
+    job.status = 'pending'
+    job.cancel_requested = False
+    job.error = ''
+    job.finished_at = None
+    job.save(update_fields=['status', 'cancel_requested', 'error', 'finished_at', 'updated_at'])
+    logger.info(f"Resuming scoring job {job.pk} after lead {job.last_processed_id}")
+    return _enqueue(job)
+
+
+def cancel_job(job: ScoringJob) -> ScoringJob:
+    """
+    Cancel a job
+
+    A pending job is cancelled immediately; a running job stops after the
+    batch it is currently scoring.
+    """
+    if job.status == 'pending':
+        _finish(job, 'cancelled')
+    elif job.status == 'running':
+        job.cancel_requested = True
+        job.save(update_fields=['cancel_requested', 'updated_at'])
+    return job
+
+
+def _finish(job: ScoringJob, status: str, error: str = '') -> None:
+    job.status = status
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+
+
+def _cancel_requested(job: ScoringJob) -> bool:
+    return ScoringJob.objects.filter(pk=job.pk, cancel_requested=True).exists()
+
+
+def run_job(job_id: int, scorer=None) -> Optional[ScoringJob]:
+    """Process a job until it completes, is cancelled or fails"""
+    scorer = scorer or active_scorer()
+    job = ScoringJob.objects.filter(pk=job_id).first()
+    if job is None:
+        logger.warning(f"Scoring job {job_id} does not exist")
+        return None
+    if not job.is_active:
+        logger.info(f"Scoring job {job_id} is {job.status}, nothing to do")
+        return job
+
+    remaining = candidate_leads().filter(id__gt=job.last_processed_id)
+    job.status = 'running'
+    job.started_at = job.started_at or timezone.now()
+    job.total_leads = job.processed_count + remaining.count()
+    job.save(update_fields=['status', 'started_at', 'total_leads', 'updated_at'])
+
+    batches = keyset_batches(
+        candidate_leads(), job.batch_size, fields=LOAD_FIELDS, start_after=job.last_processed_id
+    )
+    try:
+        for batch in batches:
+            if _cancel_requested(job):
+                logger.info(f"Scoring job {job.pk} cancelled after lead {job.last_processed_id}")
+                _finish(job, 'cancelled')
+                return job
+
+            results = scorer.bulk_score_leads(batch)
+
+            job.processed_count += len(batch)
+            job.scored_count += sum(1 for result in results if result.total_score > 4)
+            job.last_processed_id = batch[-1].pk
+            job.save(update_fields=PROGRESS_FIELDS)
+            logger.info(f"Scoring job {job.pk}: {job.processed_count}/{job.total_leads} leads processed")
+
+    except Exception as e:
+        logger.error(f"Scoring job {job.pk} failed after lead {job.last_processed_id}: {e}")
+        _finish(job, 'failed', error=str(e))
+        return job
+
+    _finish(job, 'completed')
+    logger.info(f"Scoring job {job.pk} completed: {job.scored_count}/{job.processed_count} leads scored")
+    return job
+
+
+def job_to_dict(job: ScoringJob) -> Dict[str, Any]:
+    """JSON representation used by the job status API"""
+    return {
+        'job_id': job.pk,
+        'status': job.status,
+        'total_leads': job.total_leads,
+        'processed_count': job.processed_count,
+        'scored_count': job.scored_count,
+        'progress_percentage': job.progress_percentage,
+        'last_processed_id': job.last_processed_id,
+        'cancel_requested': job.cancel_requested,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,17 @@
+"""
+Signal handlers for the leads app
+"""
+from django.db.models.signals import post_save, post_delete
+
+from .models import Lead
+from .services import score_stats
+
+
+def _invalidate_score_statistics(sender, instance, **kwargs):
+    score_stats.invalidate()
+
+
+def connect_score_stats_signals():
+    """Drop the cached score statistics whenever a lead is saved or deleted"""
+    post_save.connect(_invalidate_score_statistics, sender=Lead, dispatch_uid='lead_score_stats_save')
+    post_delete.connect(_invalidate_score_statistics, sender=Lead, dispatch_uid='lead_score_stats_delete')
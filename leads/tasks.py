@@ -0,0 +1,12 @@
+"""
+Celery tasks for lead scoring
+"""
+from celery import shared_task
+
+from .services.scoring_jobs import run_job
+
+
+@shared_task(ignore_result=True)
+def run_scoring_job(job_id):
+    """Score the unscored leads for a ScoringJob, resuming from its last processed lead"""
+    run_job(job_id)
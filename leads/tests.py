@@ -1,3 +1,219 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Permission, User
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Lead
+from .services import db_scoring, icp_config
+from .services.cvr_cache import CVRCache
+from .services.cvr_client import CVRAPIClient, CVRCompanyData, FetchResult, FOUND
+from .services.cvr_enrichment import CVREnrichmentPipeline
+from .services.cvr_scoring import CVRLeadScorer, ICPCriteria, LOAD_FIELDS
+
+
+def company(cvr_number, **fields):
+    data = {
+        'cvr_number': cvr_number,
+        'company_name': f'Company {cvr_number}',
+        'industry_code': '620100',
+        'industry_text': 'Computer programming',
+        'employee_count': 25,
+        'annual_revenue': None,
+        'address': 'Main Street 1',
+        'city': 'Copenhagen',
+        'postal_code': '1000',
+        'phone': None,
+        'email': None,
+        'website': None,
+        'status': 'active',
+        'established_date': None,
+        'legal_form': 'ApS',
+    }
+    data.update(fields)
+    return CVRCompanyData(**data)
+
+
+class LookupManyTests(TestCase):
+    def setUp(self):
+        self.client = CVRAPIClient(api_key='test', cache=CVRCache(memory_size=0))
+
+    def test_duplicates_are_requested_once(self):
+        with mock.patch.object(self.client, '_request_company',
+                               side_effect=lambda cvr, previous=None: FetchResult(FOUND, company(cvr))) as request:
+            results = self.client.lookup_many(['12345678', '1234 5678', '87654321', '12345678', 'bad'])
+
+        self.assertEqual(list(results), ['12345678', '87654321'])
+        self.assertEqual(sorted(call.args[0] for call in request.call_args_list), ['12345678', '87654321'])
+
+    def test_unexpected_error_only_fails_its_own_lookup(self):
+        def request(cvr, previous=None):
+            if cvr == '11111111':
+                raise RuntimeError('connection reset')
+            return FetchResult(FOUND, company(cvr))
+
+        with mock.patch.object(self.client, '_request_company', side_effect=request):
+            results = self.client.lookup_many(['11111111', '22222222'])
+
+        self.assertIsNone(results['11111111'])
+        self.assertEqual(results['22222222'].company_name, 'Company 22222222')
+        self.assertEqual(self.client.get_cache_stats()['fetch_errors'], 1)
+
+
+class DatabaseScoringTests(TestCase):
+    def setUp(self):
+        self.cache = CVRCache(memory_size=0)
+        self.cache.set('12345678', company('12345678', employee_count=500, city='Copenhagen'))
+        self.scorer = CVRLeadScorer(ICPCriteria())
+
+    def lead(self, **fields):
+        data = {'first_name': 'Ann', 'last_name': 'Lee', 'company': 'Acme', 'email': 'ann@example.com',
+                'title': 'Director', 'city': 'Odense', 'employees': 10}
+        data.update(fields)
+        return Lead.objects.create(**data)
+
+    def python_score(self, lead):
+        cvr_number = self.scorer._extract_cvr_from_lead(lead)
+        cvr_data = self.cache.get(cvr_number).data if cvr_number else None
+        return self.scorer.score_with_cvr_data(lead, cvr_data).total_score
+
+    def test_cvr_number_in_text_is_scored_in_python(self):
+        in_text = self.lead(company='Acme ApS 12345678')
+        in_website = self.lead(website='https://example.com/cvr/87654321')
+        long_number = self.lead(description='Order 123456789')
+
+        self.assertQuerySetEqual(
+            db_scoring.needs_cvr_fetch(Lead.objects.order_by('pk'), self.cache), [in_text, in_website]
+        )
+        self.assertQuerySetEqual(db_scoring.scorable_in_database(Lead.objects.all(), self.cache), [long_number])
+
+    def test_database_and_python_scores_agree(self):
+        leads = [
+            self.lead(),
+            self.lead(cvr_number='12345678'),
+            self.lead(cvr_number='12345678', company='Acme 87654321'),
+            self.lead(industry='Software', city='Aarhus', employees=300),
+        ]
+        expected = {lead.pk: self.python_score(lead) for lead in leads}
+
+        updated = db_scoring.rescore_in_database(Lead.objects.all(), self.scorer.icp, self.cache)
+
+        self.assertEqual(updated, len(leads))
+        self.assertEqual(dict(Lead.objects.values_list('pk', 'icp_score')), expected)
+
+    def test_database_breakdown_matches_python_breakdown(self):
+        for fields in ({}, {'cvr_number': '12345678'}, {'industry': 'Software', 'employees': 300}):
+            lead = self.lead(**fields)
+            cvr_data = self.cache.get(lead.cvr_number).data if lead.cvr_number else None
+            self.scorer.apply_score(lead, self.scorer.score_with_cvr_data(lead, cvr_data))
+
+            db_scoring.rescore_in_database(Lead.objects.filter(pk=lead.pk), self.scorer.icp, self.cache)
+            stored = Lead.objects.get(pk=lead.pk).icp_score_breakdown
+
+            with self.subTest(**fields):
+                self.assertEqual(stored.keys(), lead.icp_score_breakdown.keys())
+                self.assertIsInstance(stored['industry_match'], bool)
+                self.assertEqual({**stored, 'scoring_timestamp': None},
+                                 {**lead.icp_score_breakdown, 'scoring_timestamp': None})
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ICPConfigAPITests(TestCase):
+    def setUp(self):
+        self.client = Client(enforce_csrf_checks=True)
+        self.url = reverse('leads:api_icp_config')
+        self.user = User.objects.create_user('analyst')
+
+    def publish(self, csrf=True):
+        headers = {}
+        if csrf:
+            self.client.cookies['csrftoken'] = 'a' * 32
+            headers['HTTP_X_CSRFTOKEN'] = 'a' * 32
+        return self.client.post(self.url, {'min_employees': 50}, content_type='application/json', **headers)
+
+    def test_publishing_needs_permission(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.publish().status_code, 403)
+
+        self.user.user_permissions.add(Permission.objects.get(codename='add_icpconfiguration'))
+        response = self.publish()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['min_employees'], 50)
+
+    def test_publishing_needs_csrf_token(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+
+        self.assertEqual(self.publish(csrf=False).status_code, 403)
+        self.assertEqual(self.publish().status_code, 200)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+class EnrichmentPipelineTests(TestCase):
+    def setUp(self):
+        self.client = CVRAPIClient(api_key='test', cache=CVRCache(memory_size=0))
+        self.pipeline = CVREnrichmentPipeline(CVRLeadScorer(ICPCriteria()), client=self.client, max_workers=1)
+
+    def queries_to_score(self, leads_without_cvr):
+        Lead.objects.all().delete()
+        Lead.objects.create(first_name='Ann', last_name='Lee', company='Acme', email='ann@example.com',
+                            cvr_number='12345678')
+        for n in range(leads_without_cvr):
+            Lead.objects.create(first_name='Bo', last_name=str(n), company='Beta', email=f'bo{n}@example.com')
+        leads = list(Lead.objects.only(*LOAD_FIELDS).order_by('pk'))
+
+        with mock.patch.object(self.client, 'lookup_many',
+                               return_value={'12345678': company('12345678', employee_count=500)}):
+            with CaptureQueriesContext(connection) as queries:
+                results = self.pipeline.run(leads)
+
+        self.assertEqual(len(results), leads_without_cvr + 1)
+        self.assertIsNotNone(Lead.objects.get(cvr_number='12345678').cvr_last_updated)
+        return len(queries)
+
+    def test_mixed_batch_has_no_per_lead_queries(self):
+        self.assertEqual(self.queries_to_score(5), self.queries_to_score(1))
+
+    def test_batch_scores_match_per_lead_scores(self):
+        scorer = self.pipeline.scorer
+        leads = [
+            Lead(first_name='Ann', last_name='Lee', company='Acme', title='Director', city='Aarhus', employees=300),
+            Lead(first_name='Bo', last_name='Berg', company='Beta', title='Intern', industry='Retail'),
+            Lead(first_name='Cy', last_name='Dahl', company='Gamma', cvr_number='12345678', city='Odense'),
+        ]
+        cvr_data = [None, None, company('12345678', employee_count=500, city='Copenhagen')]
+
+        expected = [scorer.score_with_cvr_data(lead, data).to_dict() for lead, data in zip(leads, cvr_data)]
+        actual = [breakdown.to_dict() for breakdown in self.pipeline.score(leads, cvr_data)]
+
+        for breakdown in expected + actual:
+            breakdown.pop('scoring_timestamp')
+        self.assertEqual(actual, expected)
+
+    def test_lead_that_fails_to_score_only_fails_itself(self):
+        good = Lead(first_name='Ann', last_name='Lee', company='Acme', employees=300)
+        bad = Lead(first_name='Bo', last_name='Berg', company='Beta', employees='many')
+
+        breakdowns = self.pipeline.score([good, bad], [None, None])
+
+        self.assertEqual(breakdowns[0].company_size_score, 3)
+        self.assertIsNone(breakdowns[1])
+
+
+class ActiveScorerTests(TestCase):
+    def test_publishing_replaces_the_scorer_instead_of_changing_it(self):
+        scorer = icp_config.active_scorer()
+        criteria = scorer.icp
+        matcher = scorer.matcher
+
+        icp_config.publish(ICPCriteria(min_employees=5))
+        current = icp_config.active_scorer()
+
+        self.assertIsNot(current, scorer)
+        self.assertEqual(current.icp.min_employees, 5)
+        self.assertIs(scorer.icp, criteria)
+        self.assertIs(scorer.matcher, matcher)
+        self.assertIs(icp_config.active_scorer(), current)
@@ -20,9 +20,13 @@ urlpatterns = [
     path('api/icp-config/', api_views.ICPConfigAPIView.as_view(), name='api_icp_config'),
     path('api/score-stats/', api_views.LeadScoreStatsAPIView.as_view(), name='api_score_stats'),
     path('api/score-all/', api_views.score_all_leads, name='api_score_all'),
+    path('api/score-jobs/<int:job_id>/', api_views.ScoringJobAPIView.as_view(), name='api_score_job'),
+    path('api/score-jobs/<int:job_id>/cancel/', api_views.ScoringJobCancelAPIView.as_view(), name='api_score_job_cancel'),
+    path('api/score-jobs/<int:job_id>/resume/', api_views.ScoringJobResumeAPIView.as_view(), name='api_score_job_resume'),
     
     # New CVR Data Population API endpoints
     path('api/cvr-lookup/', api_views.CVRLookupAPIView.as_view(), name='api_cvr_lookup'),
+    path('api/cvr-cache-stats/', api_views.CVRCacheStatsAPIView.as_view(), name='api_cvr_cache_stats'),
     path('api/<int:lead_id>/populate-cvr/', api_views.PopulateLeadFromCVRAPIView.as_view(), name='api_populate_cvr'),
     path('api/create-from-cvr/', api_views.CreateLeadFromCVRAPIView.as_view(), name='api_create_from_cvr'),
 ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-17 05:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("contacts", "0001_initial"),
+        ("opportunities", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="opportunity",
+            index=models.Index(
+                fields=["sales_stage", "updated_at"], name="opp_stage_updated_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="opportunity",
+            index=models.Index(fields=["-created_at"], name="opp_created_idx"),
+        ),
+    ]
@@ -63,6 +63,10 @@ class Opportunity(models.Model):
     class Meta:
         ordering = ['-expected_close_date']
         verbose_name_plural = 'Opportunities'
+        indexes = [
+            models.Index(fields=['sales_stage', 'updated_at'], name='opp_stage_updated_idx'),
+            models.Index(fields=['-created_at'], name='opp_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.account}"
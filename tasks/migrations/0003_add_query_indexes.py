@@ -0,0 +1,79 @@
+# Generated by Django 5.2.4 on 2026-10-17 05:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("contacts", "0001_initial"),
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("leads", "0004_add_query_indexes"),
+        ("opportunities", "0002_add_query_indexes"),
+        ("tasks", "0002_alter_meeting_options_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="call",
+            index=models.Index(
+                fields=["scheduled_datetime"], name="call_scheduled_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="call",
+            index=models.Index(
+                fields=["assigned_to", "scheduled_datetime"],
+                name="call_owner_scheduled_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="call",
+            index=models.Index(fields=["created_at"], name="call_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="meeting",
+            index=models.Index(fields=["start_datetime"], name="meeting_start_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="meeting",
+            index=models.Index(
+                fields=["assigned_to", "start_datetime"], name="meeting_owner_start_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="meeting",
+            index=models.Index(fields=["created_at"], name="meeting_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(fields=["due_date"], name="task_due_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["assigned_to", "status", "due_date"],
+                name="task_owner_status_due_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["content_type", "object_id"], name="task_related_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(fields=["created_at"], name="task_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(("status__in", ["not_started", "in_progress"])),
+                fields=["assigned_to", "due_date"],
+                name="task_open_owner_due_idx",
+            ),
+        ),
+    ]
@@ -53,6 +53,19 @@ class Task(models.Model):
     
     class Meta:
         ordering = ['due_date']
+        indexes = [
+            models.Index(fields=['due_date'], name='task_due_date_idx'),
+            models.Index(fields=['assigned_to', 'status', 'due_date'], name='task_owner_status_due_idx'),
+            models.Index(fields=['content_type', 'object_id'], name='task_related_idx'),
+            models.Index(fields=['created_at'], name='task_created_idx'),
+            # Open tasks per owner (used by PostgreSQL; SQLite cannot match
+            # the parameterised status filter against a partial index)
+            models.Index(
+                fields=['assigned_to', 'due_date'],
+                name='task_open_owner_due_idx',
+                condition=models.Q(status__in=['not_started', 'in_progress']),
+            ),
+        ]
     
     def __str__(self):
         return self.subject
@@ -126,6 +139,11 @@ class Call(models.Model):
     
     class Meta:
         ordering = ['-scheduled_datetime']
+        indexes = [
+            models.Index(fields=['scheduled_datetime'], name='call_scheduled_idx'),
+            models.Index(fields=['assigned_to', 'scheduled_datetime'], name='call_owner_scheduled_idx'),
+            models.Index(fields=['created_at'], name='call_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.subject} - {self.get_call_type_display()}"
@@ -212,6 +230,11 @@ class Meeting(models.Model):
     
     class Meta:
         ordering = ['-start_datetime']
+        indexes = [
+            models.Index(fields=['start_datetime'], name='meeting_start_idx'),
+            models.Index(fields=['assigned_to', 'start_datetime'], name='meeting_owner_start_idx'),
+            models.Index(fields=['created_at'], name='meeting_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.subject} - {self.start_datetime.strftime('%Y-%m-%d %H:%M')}"